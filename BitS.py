@@ -1,8 +1,31 @@
 # Python imports
+import array
+import binascii
+import collections
+import copyreg
+import enum
+import functools
+import gc
+import hashlib
+import heapq
+import inspect
+import itertools
+import json
+import marshal
+import math
 import operator
+import os
+import pickle
+import random
+import re
+import struct
+import sys
+import time
+import types
+import zlib
+from multiprocessing import shared_memory
 
 
-# todo potential good use cases for dataclasses
 class Biterator:
 
     def __init__(self, data: bytes):
@@ -40,339 +63,4277 @@ class Biterator:
             yield "0" * (8 - len(bin_val)) + bin_val
 
 
-class BitField:
+class BitPattern:
+    """
+    A BitPattern is a run of bits, such as a sync word or preamble, which can be located
+    at any bit offset within a buffer rather than only on byte boundaries.
+    """
+
+    def __init__(self, pattern, size: int = None):
+        """
+        Brief:
+            Precomputes one byte level search per bit alignment (0 - 7) so that searches run over
+            the raw bytes instead of a string expansion of them.
+
+        Params:
+            pattern:    an int, a binary string such as "0b1010", bytes, or anything with an int value
+                        and a size such as a BitField or a BitStruct
+            size:       the width of the pattern in bits. Required for int patterns.
+        """
+        if isinstance(pattern, str):
+            if pattern.startswith("0b"):
+                pattern = pattern[2:]
+            if size is None:
+                size = len(pattern)
+            value = int(pattern, 2) if pattern else 0
+        elif isinstance(pattern, (bytes, bytearray, memoryview)):
+            pattern = bytes(pattern)
+            if size is None:
+                size = len(pattern) * 8
+            value = int.from_bytes(pattern, 'big')
+        elif isinstance(pattern, int):
+            if size is None:
+                raise ValueError("An int BitPattern requires a size in bits")
+            value = pattern
+        else:
+            if size is None:
+                size = pattern.size
+            value = int(pattern)
+
+        if size < 1:
+            raise ValueError("A BitPattern must be at least 1 bit wide")
+        if value.bit_length() > size:
+            raise ValueError(f"{value} is too large for the pattern size: {size} bits")
 
-    def __init__(self, size: int, name: str = "", value: int = 0):
+        self.__value = value
         self.__size = size
-        self.__name = name
-        self._value = value
+        self.__searches = [self.__compile(shift) for shift in range(8)]
 
     def __int__(self):
         return self.value
 
-    def __index__(self):
-        """
-        Brief:
-            Enables type conversions such as __hex__
-        """
-        return operator.index(int(self))
-
-    def __str__(self):
-        return f"{self.name}:\t{self.value}"
+    def __len__(self):
+        return self.size
 
-    def __bytes__(self):
+    def __compile(self, shift: int):
         """
-        Creates a bytearray of the appropriate size. Unclear what this might be used for.
+        Brief:
+            Builds a bytes regex matching the pattern when it starts `shift` bits into a byte.
+            Bytes fully covered by the pattern become literals, partially covered bytes become
+            a character class of every byte value which agrees with the pattern under the mask.
         """
-        intVal = int(self)
-        bytes_needed, rem = divmod(self.size, 8)
-        if rem:
-            bytes_needed += 1
-        return intVal.to_bytes(bytes_needed, 'big')
+        span = (shift + self.size + 7) // 8
+        pad = span * 8 - shift - self.size
+        value = self.value << pad
+        mask = ((1 << self.size) - 1) << pad
+        regex = b""
+        for byte_idx in reversed(range(span)):
+            byte_mask = (mask >> (8 * byte_idx)) & 0xFF
+            byte_val = (value >> (8 * byte_idx)) & 0xFF
+            if byte_mask == 0xFF:
+                regex += re.escape(bytes([byte_val]))
+            else:
+                members = bytes(b for b in range(256) if b & byte_mask == byte_val)
+                regex += b"[" + b"".join(re.escape(bytes([b])) for b in members) + b"]"
+        return span, re.compile(regex)
 
     @property
     def value(self):
-        return self._value
+        return self.__value
 
     @value.setter
     def value(self, new_value):
-        if len(bin(new_value)[2:]) > self.size:
-            raise ValueError(f"{new_value} is too large for the field size: {self.size} bits")
-        self._value = new_value
-
-    @property
-    def name(self):
-        return self.__name
-
-    @name.setter
-    def name(self, new_name):
-        raise AttributeError("name field cannot be modified")
+        raise AttributeError("Cannot modify BitPattern's value")
 
     @property
     def size(self):
         return self.__size
 
     @size.setter
-    def size(self, new_size):
-        raise AttributeError("size field cannot be modified")
-
-    def to_dict(self):
-        return {self.name: self.value}
+    def size(self, new_value):
+        raise AttributeError("Cannot modify BitPattern's size")
 
-    def to_bin(self):
+    @property
+    def span(self):
         """
-        __bin__ cannot be overloaded in the same way as other methods. Treat this function as if you could.
+        The largest number of bytes a single occurrence of the pattern can touch
         """
-        binStr = bin(self.value)[2:]
-        while len(binStr) < self.size:
-            binStr = '0' + binStr
-        return binStr
+        return self.__searches[7][0]
 
+    def to_bin(self):
+        binStr = bin(self.value)[2:]
+        return "0" * (self.size - len(binStr)) + binStr
 
-class BitStruct:
+    def iter_find(self, data: bytes, start: int = 0):
+        """
+        Brief:
+            A generator yielding the bit offset of every occurrence of the pattern in data, in
+            ascending order. Overlapping occurrences are all reported.
 
-    def __init__(self, bitfields: list[BitField], name: str = ""):
-        self.__fields = bitfields
-        self.__name = name
-        self.__size = sum([field.size for field in bitfields])
-        self.__idx = 0
+        Params:
+            data:   the buffer to search
+            start:  the first bit offset which may be reported
+        """
+        yield from heapq.merge(*[
+            self.__iter_shift(data, shift, start) for shift in range(8)
+        ])
 
-    def __str__(self):
-        print_width = max([len(field.name) for field in self.fields])
-        retStr = f"\t{self.name}:\n"
-        for field in self.fields:
-            padding = " " * (print_width - len(field.name) + 4)
-            retStr += f"\t\t{field.name}:{padding}{field.value}\n"
-        return retStr
+    def __iter_shift(self, data, shift: int, start: int):
+        _, regex = self.__searches[shift]
+        pos = max(0, -(-(start - shift) // 8))
+        while True:
+            match = regex.search(data, pos)
+            if match is None:
+                return
+            pos = match.start()
+            yield pos * 8 + shift
+            pos += 1
 
-    def __int__(self):
-        binstr = self.to_bin()
-        return int(binstr, 2)
+    def find_all(self, data: bytes, start: int = 0) -> list[int]:
+        """
+        Returns the bit offsets of every occurrence of the pattern in data
+        """
+        return list(self.iter_find(data, start))
 
-    def __index__(self):
+    def find(self, data: bytes, start: int = 0) -> int:
         """
-        Brief:
-            Enables type conversions such as __hex__
+        Returns the lowest bit offset (at or after start) of the pattern within data, or -1
         """
-        return operator.index(int(self))
+        return next(self.iter_find(data, start), -1)
 
-    def __bytes__(self):
+    def find_in_stream(self, stream, chunk_size: int = 1 << 20):
         """
-        Creates a bytearray of the appropriate size. Unclear what this might be used for.
+        Brief:
+            A generator yielding the absolute bit offset of every occurrence of the pattern in a
+            binary stream. Only chunk_size bytes (plus a few carried over) are held at a time.
+
+        Params:
+            stream:     any object with a read(n) method returning bytes
+            chunk_size: the number of bytes read per call
         """
-        intVal = int(self)
-        bytes_needed, rem = divmod(self.size, 8)
-        if rem:
-            bytes_needed += 1
-        return intVal.to_bytes(bytes_needed, 'big')
+        carry = self.span - 1
+        buffer = b""
+        base = 0
+        last = -1
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                return
+            buffer += chunk
+            for offset in self.iter_find(buffer):
+                offset += base * 8
+                if offset > last:
+                    last = offset
+                    yield offset
+            if len(buffer) > carry:
+                base += len(buffer) - carry
+                buffer = buffer[len(buffer) - carry:]
 
-    def __iter__(self):
-        self.__idx = 0
-        return self
 
-    def __next__(self):
-        idx = self.idx
-        if idx >= len(self.fields):
-            raise StopIteration
-        self.__idx += 1
-        return self.fields[idx]
+def _extract_bits(data: bytes, bit_offset: int, size: int) -> int:
+    """
+    Brief:
+        Returns the unsigned integer held in `size` bits of data, starting `bit_offset` bits in
+    """
+    start = bit_offset // 8
+    end = (bit_offset + size + 7) // 8
+    value = int.from_bytes(data[start:end], 'big')
+    return (value >> (end * 8 - bit_offset - size)) & ((1 << size) - 1)
 
-    def __getitem__(self, item):
-        return self.fields[item]
 
-    @property
-    def fields(self):
-        return self.__fields
+_REVERSED_BYTES = bytes(int(f"{byte:08b}"[::-1], 2) for byte in range(256))
 
-    @fields.setter
-    def fields(self, new_val):
-        raise AttributeError("Cannot modify BitStruct's fields")
 
-    @property
-    def name(self):
-        return self.__name
+def _reverse_bits(value: int, size: int) -> int:
+    """
+    Returns value with the order of its `size` bits reversed
+    """
+    nbytes = (size + 7) // 8
+    reversed_bytes = value.to_bytes(nbytes, 'big').translate(_REVERSED_BYTES)[::-1]
+    return int.from_bytes(reversed_bytes, 'big') >> (nbytes * 8 - size)
 
-    @name.setter
-    def name(self, new_val):
-        raise AttributeError("Cannot modify BitStruct's name")
 
-    @property
-    def size(self):
-        return self.__size
+def _swap_bytes(value: int, size: int) -> int:
+    """
+    Returns value with the order of its size // 8 bytes reversed
+    """
+    return int.from_bytes(value.to_bytes(size // 8, 'little'), 'big')
 
-    @size.setter
-    def size(self, new_val):
-        raise AttributeError("Cannot modify BitStruct's size")
 
-    @property
-    def idx(self):
-        return self.__idx
+class Crc:
+    """
+    A table-driven CRC. Reflected algorithms process each byte least significant bit first, like
+    CRC-32; others process it most significant bit first, like CRC-16/CCITT. Coverage which ends
+    part way through a byte feeds the trailing bits one at a time, in struct order.
+    """
 
-    @idx.setter
-    def idx(self, new_value):
-        raise AttributeError("Cannot modify BitStruct's index")
+    def __init__(self, width: int, poly: int, init: int = 0, reflect: bool = False, xorout: int = 0,
+                 name: str = ""):
+        if width < 8:
+            raise ValueError(f"CRC width must be at least 8 bits, was {width}")
+        self.width = width
+        self.poly = poly
+        self.init = init
+        self.reflect = reflect
+        self.xorout = xorout
+        self.name = name
+        self.__mask = (1 << width) - 1
+        table = []
+        if reflect:
+            self.__poly = _reverse_bits(poly, width)
+            self.__start = _reverse_bits(init, width)
+            for byte in range(256):
+                register = byte
+                for _ in range(8):
+                    register = (register >> 1) ^ self.__poly if register & 1 else register >> 1
+                table.append(register)
+        else:
+            self.__poly = poly
+            self.__start = init
+            top = 1 << (width - 1)
+            for byte in range(256):
+                register = byte << (width - 8)
+                for _ in range(8):
+                    register = ((register << 1) ^ poly if register & top else register << 1) & self.__mask
+                table.append(register)
+        self.__table = tuple(table)
+        # zlib and binascii implement these two in C
+        self.__update = self.__update_table
+        if (width, poly, reflect) == (32, 0x04C11DB7, True):
+            self.__update = self.__update_zlib
+        elif (width, poly, reflect) == (16, 0x1021, False):
+            self.__update = self.__update_hqx
 
-    def to_bin(self):
-        retStr = ""
-        for field in self.fields:
-            binStr = bin(field.value)[2:]
-            while len(binStr) < field.size:
-                binStr = '0' + binStr
-            retStr += binStr
-        return retStr
+    def __reduce__(self):
+        return Crc, (self.width, self.poly, self.init, self.reflect, self.xorout, self.name)
 
-    def to_dict(self):
-        return {self.name: {field.name: field.value for field in self}}
+    def __eq__(self, other):
+        if not isinstance(other, Crc):
+            return NotImplemented
+        return self.__key() == other.__key()
 
-    def from_bin(self, binstring: str = ""):
+    def __hash__(self):
+        return hash(self.__key())
+
+    def __key(self):
+        return self.width, self.poly, self.init, self.reflect, self.xorout
+
+    def __repr__(self):
+        return (f"Crc(width={self.width}, poly=0x{self.poly:X}, init=0x{self.init:X}, reflect={self.reflect}, "
+                f"xorout=0x{self.xorout:X})")
+
+    def __update_table(self, register: int, data) -> int:
+        table = self.__table
+        if self.reflect:
+            for byte in bytes(data):
+                register = (register >> 8) ^ table[(register ^ byte) & 0xFF]
+            return register
+        mask = self.__mask
+        shift = self.width - 8
+        for byte in bytes(data):
+            register = ((register << 8) & mask) ^ table[((register >> shift) ^ byte) & 0xFF]
+        return register
+
+    def __update_zlib(self, register: int, data) -> int:
+        return zlib.crc32(data, register ^ 0xFFFFFFFF) ^ 0xFFFFFFFF
+
+    def __update_hqx(self, register: int, data) -> int:
+        return binascii.crc_hqx(data, register)
+
+    def __update_bits(self, register: int, value: int, count: int) -> int:
+        for idx in range(count - 1, -1, -1):
+            bit = (value >> idx) & 1
+            if self.reflect:
+                register = (register >> 1) ^ self.__poly if (register ^ bit) & 1 else register >> 1
+            else:
+                top = ((register >> (self.width - 1)) ^ bit) & 1
+                register = ((register << 1) & self.__mask) ^ (self.__poly if top else 0)
+        return register
+
+    def compute(self, data: bytes) -> int:
         """
-        This class is meant to represent a struct of bit fields. It requires bits to populate.
+        Returns the CRC of a bytes-like object
         """
-        if binstring.startswith("0b"):
-            binstring = binstring[2:]
+        return self.__update(self.__start, data) ^ self.xorout
 
-        if len(binstring) < self.size:
-            raise ValueError("Not enough bins to fill the BitStruct")
-
-        for field in self.fields:
-            int_val = int(binstring[:field.size], 2)
-            field.value = int_val
-            binstring = binstring[field.size:]
+    def compute_bits(self, value: int, size: int) -> int:
+        """
+        Returns the CRC of the `size` bit stream held in value, most significant bit first
+        """
+        nbytes, rem = divmod(size, 8)
+        register = self.__update(self.__start, (value >> rem).to_bytes(nbytes, 'big'))
+        if rem:
+            register = self.__update_bits(register, value & ((1 << rem) - 1), rem)
+        return register ^ self.xorout
 
-    def from_bytes(self, bytestring: bytes):
+    def compute_many(self, buffers) -> list:
         """
-        Populates the bit struct from a bytearray
+        Returns the CRC of each bytes-like object in buffers
         """
-        if len(bytestring) < self.size // 8:
-            raise ValueError("Not enough bytes to fill the BitStruct")
+        update = self.__update
+        start = self.__start
+        xorout = self.xorout
+        return [update(start, data) ^ xorout for data in buffers]
 
-        data = Biterator(bytestring)
-        available_bins = next(data)
 
-        for field in self.fields:
-            while len(available_bins) < field.size:
-                available_bins += next(data)
-            int_val = int(available_bins[:field.size], 2)
-            field.value = int_val
-            available_bins = available_bins[field.size:]
+CRC16_CCITT = Crc(16, 0x1021, init=0xFFFF, name="CRC-16/CCITT-FALSE")
+CRC16_XMODEM = Crc(16, 0x1021, name="CRC-16/XMODEM")
+CRC16_ARC = Crc(16, 0x8005, reflect=True, name="CRC-16/ARC")
+CRC32 = Crc(32, 0x04C11DB7, init=0xFFFFFFFF, reflect=True, xorout=0xFFFFFFFF, name="CRC-32")
 
 
-class BitCollection:
+class FieldEncoding:
     """
-    A BitCollection is defined as an ordered collection of BitStructs
+    Describes how a field's value is laid out in its bits when it is not a plain unsigned,
+    big endian, most significant bit first integer.
+
+    Decoding the raw bits applies, in order:
+        bit_order "lsb":    the first bit of the field is the least significant bit of the value
+        byteorder "little": the first byte of the field is the least significant byte of the value
+        signed:             the value is two's complement
+    Encoding applies the inverse, in reverse order.
     """
+    __slots__ = ("size", "signed", "byteorder", "bit_order")
 
-    def __init__(self, bitstructs: list[BitStruct], name: str = ""):
-        self.__structs = bitstructs
-        self.__name = name
-        self.__size = sum([struct.size for struct in self.structs])
-        self.__idx = 0
+    def __init__(self, size: int, signed: bool = False, byteorder: str = "big", bit_order: str = "msb"):
+        if byteorder not in ("big", "little"):
+            raise ValueError(f"byteorder must be 'big' or 'little', was {byteorder!r}")
+        if bit_order not in ("msb", "lsb"):
+            raise ValueError(f"bit_order must be 'msb' or 'lsb', was {bit_order!r}")
+        if byteorder == "little" and size % 8:
+            raise ValueError(f"little endian fields must be a whole number of bytes, was {size} bits")
+        self.size = size
+        self.signed = signed
+        self.byteorder = byteorder
+        self.bit_order = bit_order
 
-    def __iter__(self):
-        self.__idx = 0
-        return self
+    def __key(self):
+        return self.size, self.signed, self.byteorder, self.bit_order
 
-    def __next__(self):
-        idx = self.idx
-        if idx >= len(self.structs):
-            raise StopIteration
-        self.__idx += 1
-        return self.structs[idx]
+    def __eq__(self, other):
+        return isinstance(other, FieldEncoding) and self.__key() == other.__key()
 
-    def __str__(self):
-        retStr = f"{self.name}:\n"
-        for struct in self.structs:
-            retStr += str(struct)
-        return retStr
+    def __hash__(self):
+        return hash(self.__key())
 
-    def __int__(self):
-        binstr = self.to_bin()
-        return int(binstr, 2)
+    def __repr__(self):
+        return (
+            f"FieldEncoding(size={self.size}, signed={self.signed}, "
+            f"byteorder={self.byteorder!r}, bit_order={self.bit_order!r})"
+        )
 
-    def __bytes__(self):
-        intVal = int(self)
-        bytes_needed, rem = divmod(self.size, 8)
-        if rem:
-            bytes_needed += 1
-        # int.to_bytes requires a byteorder param
-        return intVal.to_bytes(bytes_needed, byteorder='big')
+    @property
+    def plain(self):
+        return not self.signed and self.byteorder == "big" and self.bit_order == "msb"
 
-    def __index__(self):
+    def check(self, value):
+        if self.signed:
+            limit = 1 << (self.size - 1)
+            if value >= limit:
+                raise ValueError(f"{value} is too large for the field size: {self.size} bits")
+            if value < -limit:
+                raise ValueError(f"{value} is too small for the field size: {self.size} bits")
+        elif value >> self.size:
+            raise ValueError(f"{value} is too large for the field size: {self.size} bits")
+
+    def decode(self, raw: int):
         """
-        Brief:
-            Enables type conversions such as __hex__
+        Returns the value held by the raw (as stored) bits
         """
-        return operator.index(int(self))
+        if self.bit_order == "lsb":
+            raw = _reverse_bits(raw, self.size)
+        if self.byteorder == "little":
+            raw = _swap_bytes(raw, self.size)
+        if self.signed:
+            half = 1 << (self.size - 1)
+            raw = (raw ^ half) - half
+        return raw
 
-    def __len__(self):
-        return len(self.structs)
+    def encode(self, value) -> int:
+        """
+        Returns the raw (as stored) bits for a value, raising ValueError when it does not fit
+        """
+        self.check(value)
+        raw = value & ((1 << self.size) - 1)
+        if self.byteorder == "little":
+            raw = _swap_bytes(raw, self.size)
+        if self.bit_order == "lsb":
+            raw = _reverse_bits(raw, self.size)
+        return raw
 
-    def __getitem__(self, item):
-        return self.structs[item]
+    def decode_source(self, raw: str, codec: str = None) -> str:
+        """
+        Returns a python expression decoding the raw bits held by the expression `raw`, for use
+        in generated code where this encoding is bound to the name `codec`
+        """
+        if self.bit_order == "lsb":
+            raw = f"_reverse_bits({raw}, {self.size})"
+        if self.byteorder == "little":
+            raw = f"_swap_bytes({raw}, {self.size})"
+        if self.signed:
+            half = 1 << (self.size - 1)
+            raw = f"((({raw}) ^ {half}) - {half})"
+        return raw
 
-    @property
-    def structs(self):
-        return self.__structs
 
-    @structs.setter
-    def structs(self, new_value):
-        raise AttributeError(f"Cannot modify BitCollection's substructs")
+class EnumEncoding:
+    """
+    Decodes a small code field through a lookup table, such as an enum.Enum class, a dict of
+    {code: label} or a sequence of labels indexed by code. Fields of up to LOOKUP_BITS bits get a
+    precomputed tuple covering every code, so decoding is a single index.
 
-    @property
-    def name(self):
-        return self.__name
+    Codes missing from the table are handled according to `unknown`:
+        "raise":    decoding raises ValueError
+        "raw":      the raw int is returned
+        "default":  `default` is returned
+    """
+    LOOKUP_BITS = 16
+    __cache = {}
 
-    @name.setter
-    def name(self, new_value):
-        raise AttributeError("Cannot modify BitCollection's name")
+    def __init__(self, size: int, table, unknown: str = "raise", default=None):
+        if unknown not in ("raise", "raw", "default"):
+            raise ValueError(f"unknown must be 'raise', 'raw' or 'default', was {unknown!r}")
+        if isinstance(table, type) and issubclass(table, enum.Enum):
+            members = {member.value: member for member in table}
+            self.name = table.__name__
+            self.__table = table
+        elif isinstance(table, dict):
+            members = dict(table)
+            self.name = "lookup"
+        else:
+            members = dict(enumerate(table))
+            self.name = "lookup"
+        for code in members:
+            if type(code) is not int or code < 0 or code >> size:
+                raise ValueError(f"{code!r} is not a valid code for a {size} bit field")
+        if self.name == "lookup":
+            self.__table = members
 
-    @property
-    def size(self):
-        return self.__size
+        self.size = size
+        self.unknown = unknown
+        self.default = default
+        self.members = members
+        self.codes = {label: code for code, label in members.items()}
+        self.__key = (size, tuple(sorted(members.items(), key=lambda item: item[0])), unknown, default)
+        self.lookup = None
+        if size <= self.LOOKUP_BITS and unknown != "raise":
+            self.lookup = tuple(
+                self.__missing(code) if code not in members else members[code] for code in range(1 << size)
+            )
 
-    @size.setter
-    def size(self, new_value):
-        raise AttributeError("Cannot modify BitCollection's size")
+    @classmethod
+    def of(cls, size: int, table, unknown: str = "raise", default=None):
+        """
+        Returns a shared EnumEncoding, building the lookup tables only the first time a table is seen
+        """
+        items = table if isinstance(table, type) else tuple(table.items() if isinstance(table, dict) else table)
+        key = (size, items, unknown, default)
+        encoding = cls.__cache.get(key)
+        if encoding is None:
+            encoding = cls.__cache[key] = cls(size, table, unknown, default)
+        return encoding
 
-    @property
-    def idx(self):
-        return self.__idx
+    def __reduce__(self):
+        # the lookup tables are rebuilt rather than pickled
+        return EnumEncoding.of, (self.size, self.__table, self.unknown, self.default)
 
-    @idx.setter
-    def idx(self, new_value):
-        raise AttributeError("Cannot modify BitCollection's index")
+    def __eq__(self, other):
+        return isinstance(other, EnumEncoding) and self.__key == other.__key
 
-    def to_bin(self):
-        binstr = ""
-        for struct in self.structs:
-            binstr += struct.to_bin()
-        return binstr
+    def __hash__(self):
+        return hash(self.__key)
 
-    def to_dict(self):
-        """
-        Creates a dictionary representation of the struct.
+    def __repr__(self):
+        return f"EnumEncoding(size={self.size}, table={self.name}, unknown={self.unknown!r})"
 
-        It's possible that a BitCollection might contain multiple structs
-        of the same name.
-        """
-        return {
-            self.name: [
-                struct.to_dict() for struct in self
-            ]
-        }
+    def __missing(self, code: int):
+        if self.unknown == "raw":
+            return code
+        if self.unknown == "default":
+            return self.default
+        raise ValueError(f"{code} is not a known code of {self.name}")
 
-    def from_bin(self, binstring: str):
+    def check(self, value):
         """
-        Because this is a collection of bit structs it does make sense that someone
-        might want to populate it with bits rather than bytes.
+        Accepts anything decoding can produce: members, raw codes when unknown is "raw" and the
+        default when unknown is "default"
         """
-        if binstring.startswith("0b"):
+        if value in self.codes:
+            return
+        if self.unknown == "raw" and type(value) is int and 0 <= value and not value >> self.size:
+            return
+        if self.unknown == "default" and value == self.default:
+            return
+        raise ValueError(f"{value!r} is not a member of {self.name}")
+
+    def decode(self, raw: int):
+        if self.lookup is not None:
+            return self.lookup[raw]
+        if raw in self.members:
+            return self.members[raw]
+        return self.__missing(raw)
+
+    def encode(self, value) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            if self.unknown != "raw":
+                raise ValueError(f"{value!r} is not a member of {self.name}")
+            self.check(value)
+            code = value
+        return code
+
+    def take(self, raws) -> list:
+        """
+        Decodes many raw codes at once
+        """
+        if self.lookup is not None:
+            return list(map(self.lookup.__getitem__, raws))
+        return [self.decode(raw) for raw in raws]
+
+    def decode_source(self, raw: str, codec: str) -> str:
+        if self.lookup is not None:
+            return f"{codec}.lookup[{raw}]"
+        return f"{codec}.decode({raw})"
+
+
+class FixedPointEncoding:
+    """
+    A scaled integer field: value = raw * scale + offset, where raw is optionally two's complement.
+    Encoding rounds to the nearest representable value and raises ValueError when out of range.
+    """
+
+    def __init__(self, size: int, scale: float, offset: float = 0.0, signed: bool = False):
+        if scale == 0:
+            raise ValueError("scale cannot be 0")
+        self.size = size
+        self.scale = scale
+        self.offset = offset
+        self.signed = signed
+        if signed:
+            self.minimum = -(1 << (size - 1))
+            self.maximum = (1 << (size - 1)) - 1
+        else:
+            self.minimum = 0
+            self.maximum = (1 << size) - 1
+
+    @classmethod
+    def q(cls, size: int, fraction_bits: int, signed: bool = True):
+        """
+        Returns the encoding of a Q format number with `fraction_bits` of its `size` bits after the binary point
+        """
+        return cls(size, scale=2.0 ** -fraction_bits, signed=signed)
+
+    def __key(self):
+        return self.size, self.scale, self.offset, self.signed
+
+    def __eq__(self, other):
+        return isinstance(other, FixedPointEncoding) and self.__key() == other.__key()
+
+    def __hash__(self):
+        return hash(self.__key())
+
+    def __repr__(self):
+        return (f"FixedPointEncoding(size={self.size}, scale={self.scale!r}, offset={self.offset!r}, "
+                f"signed={self.signed})")
+
+    def __to_int(self, value) -> int:
+        scaled = (value - self.offset) / self.scale
+        if not math.isfinite(scaled):
+            if scaled != scaled:
+                raise ValueError(f"{value} cannot be stored in the field size: {self.size} bits")
+            if scaled > 0:
+                raise ValueError(f"{value} is too large for the field size: {self.size} bits")
+            raise ValueError(f"{value} is too small for the field size: {self.size} bits")
+        scaled = round(scaled)
+        if scaled > self.maximum:
+            raise ValueError(f"{value} is too large for the field size: {self.size} bits")
+        if scaled < self.minimum:
+            raise ValueError(f"{value} is too small for the field size: {self.size} bits")
+        return scaled
+
+    def check(self, value):
+        self.__to_int(value)
+
+    def decode(self, raw: int) -> float:
+        if self.signed:
+            half = 1 << (self.size - 1)
+            raw = (raw ^ half) - half
+        return raw * self.scale + self.offset
+
+    def encode(self, value) -> int:
+        return self.__to_int(value) & ((1 << self.size) - 1)
+
+    def take(self, raws) -> list:
+        """
+        Decodes many raw values at once
+        """
+        scale = self.scale
+        offset = self.offset
+        if self.signed:
+            half = 1 << (self.size - 1)
+            return [((raw ^ half) - half) * scale + offset for raw in raws]
+        return [raw * scale + offset for raw in raws]
+
+    def decode_source(self, raw: str, codec: str = None) -> str:
+        if self.signed:
+            half = 1 << (self.size - 1)
+            raw = f"(({raw}) ^ {half}) - {half}"
+        source = f"(({raw}) * {self.scale!r})"
+        if self.offset:
+            source = f"({source} + {self.offset!r})"
+        return source
+
+
+class FloatEncoding:
+    """
+    An IEEE 754 half (16 bit), single (32 bit) or double (64 bit) float stored in a field.
+    Half floats decode through a precomputed table of all 65536 values.
+    """
+    _FORMATS = {16: ("e", "H"), 32: ("f", "I"), 64: ("d", "Q")}
+    __half_lookup = None
+
+    def __init__(self, size: int, byteorder: str = "big"):
+        if size not in self._FORMATS:
+            raise ValueError(f"float fields must be 16, 32 or 64 bits, was {size}")
+        if byteorder not in ("big", "little"):
+            raise ValueError(f"byteorder must be 'big' or 'little', was {byteorder!r}")
+        self.size = size
+        self.byteorder = byteorder
+        float_code, self.int_code = self._FORMATS[size]
+        self.struct = struct.Struct((">" if byteorder == "big" else "<") + float_code)
+        self.lookup = None
+        if size == 16:
+            self.lookup = self.__halves(byteorder)
+
+    @classmethod
+    def __halves(cls, byteorder):
+        if cls.__half_lookup is None:
+            cls.__half_lookup = {}
+        if byteorder not in cls.__half_lookup:
+            cls.__half_lookup[byteorder] = struct.unpack(
+                f"{'>' if byteorder == 'big' else '<'}65536e",
+                b"".join(raw.to_bytes(2, 'big') for raw in range(1 << 16))
+            )
+        return cls.__half_lookup[byteorder]
+
+    def __key(self):
+        return self.size, self.byteorder
+
+    def __reduce__(self):
+        return FloatEncoding, (self.size, self.byteorder)
+
+    def __eq__(self, other):
+        return isinstance(other, FloatEncoding) and self.__key() == other.__key()
+
+    def __hash__(self):
+        return hash(self.__key())
+
+    def __repr__(self):
+        return f"FloatEncoding(size={self.size}, byteorder={self.byteorder!r})"
+
+    def check(self, value):
+        self.encode(value)
+
+    def decode(self, raw: int) -> float:
+        if self.lookup is not None:
+            return self.lookup[raw]
+        return self.struct.unpack(raw.to_bytes(self.size // 8, 'big'))[0]
+
+    def encode(self, value) -> int:
+        try:
+            packed = self.struct.pack(value)
+        except (OverflowError, struct.error):
+            raise ValueError(f"{value} is too large for the field size: {self.size} bits") from None
+        return int.from_bytes(packed, 'big')
+
+    def take(self, raws) -> list:
+        """
+        Decodes many raw values at once by reinterpreting them as a native float array
+        """
+        if self.lookup is not None:
+            return list(map(self.lookup.__getitem__, raws))
+        ints = array.array(self.int_code, raws)
+        if self.byteorder == "little":
+            ints.byteswap()
+        floats = array.array(self.struct.format[-1])
+        floats.frombytes(ints.tobytes())
+        return floats.tolist()
+
+    def decode_source(self, raw: str, codec: str) -> str:
+        if self.lookup is not None:
+            return f"{codec}.lookup[{raw}]"
+        return f"{codec}.decode({raw})"
+
+
+def _typecode(size: int, signed: bool = False) -> str:
+    """
+    Returns the smallest array.array typecode holding `size` bit integers, or None past 64 bits
+    """
+    for code in "bhilq" if signed else "BHILQ":
+        if array.array(code).itemsize * 8 >= size:
+            return code
+    return None
+
+
+class ArrayEncoding:
+    """
+    A field holding `count` packed `width` bit integers, the first one most significant. The samples
+    decode in bulk into an array.array: byte sized widths are a single frombytes, other widths are
+    sliced from the field's bytes with precomputed offsets.
+    """
+
+    def __init__(self, count: int, width: int, signed: bool = False):
+        if count < 1 or width < 1:
+            raise ValueError(f"array fields need at least 1 element of at least 1 bit, was {count} x {width}")
+        if width > 64:
+            raise ValueError(f"array elements can be at most 64 bits, was {width}")
+        self.count = count
+        self.width = width
+        self.signed = signed
+        self.size = count * width
+        if signed:
+            self.minimum = -(1 << (width - 1))
+            self.maximum = (1 << (width - 1)) - 1
+        else:
+            self.minimum = 0
+            self.maximum = (1 << width) - 1
+        self.typecode = _typecode(width, signed)
+        self.aligned = array.array(self.typecode).itemsize * 8 == width
+        pad = -self.size % 8
+        self.__spans = []
+        for idx in range(count):
+            start = pad + idx * width
+            end = start + width
+            self.__spans.append((start // 8, (end + 7) // 8, -end % 8))
+
+    def __key(self):
+        return self.count, self.width, self.signed
+
+    def __reduce__(self):
+        return ArrayEncoding, self.__key()
+
+    def __eq__(self, other):
+        return isinstance(other, ArrayEncoding) and self.__key() == other.__key()
+
+    def __hash__(self):
+        return hash(self.__key())
+
+    def __repr__(self):
+        return f"ArrayEncoding(count={self.count}, width={self.width}, signed={self.signed})"
+
+    def check(self, value):
+        if len(value) != self.count:
+            raise ValueError(f"the field holds {self.count} values, got {len(value)}")
+        largest = max(value)
+        if largest > self.maximum:
+            raise ValueError(f"{largest} is too large for the field size: {self.width} bits")
+        smallest = min(value)
+        if smallest < self.minimum:
+            raise ValueError(f"{smallest} is too small for the field size: {self.width} bits")
+
+    def decode(self, raw: int) -> array.array:
+        data = raw.to_bytes((self.size + 7) // 8, 'big')
+        if self.aligned:
+            values = array.array(self.typecode)
+            values.frombytes(data)
+            if sys.byteorder == "little" and values.itemsize > 1:
+                values.byteswap()
+            return values
+        mask = self.maximum - self.minimum
+        from_bytes = int.from_bytes
+        values = [(from_bytes(data[start:end], 'big') >> shift) & mask for start, end, shift in self.__spans]
+        if self.signed:
+            half = 1 << (self.width - 1)
+            values = [(value ^ half) - half for value in values]
+        return array.array(self.typecode, values)
+
+    def encode(self, value) -> int:
+        self.check(value)
+        if self.aligned:
+            values = array.array(self.typecode, value)
+            if sys.byteorder == "little" and values.itemsize > 1:
+                values.byteswap()
+            return int.from_bytes(values.tobytes(), 'big')
+        mask = self.maximum - self.minimum
+        width = self.width
+        return int("".join([format(element & mask, f"0{width}b") for element in value]), 2)
+
+    def take(self, raws) -> list:
+        """
+        Decodes many raw values at once
+        """
+        return [self.decode(raw) for raw in raws]
+
+
+class StructEncoding:
+    """
+    A field holding a nested struct: a @bitrecord class, or a BitStruct subclass which can be built
+    without arguments. Decoding creates a new instance of it.
+    """
+
+    def __init__(self, struct_type):
+        self.struct_type = struct_type
+        self.is_record = isinstance(struct_type, type) and issubclass(struct_type, BitRecord)
+        self.size = struct_type.size if self.is_record else struct_type().size
+        self.name = getattr(struct_type, "__name__", repr(struct_type))
+
+    def __reduce__(self):
+        return StructEncoding, (self.struct_type,)
+
+    def __eq__(self, other):
+        return isinstance(other, StructEncoding) and self.struct_type is other.struct_type
+
+    def __hash__(self):
+        return hash(self.struct_type)
+
+    def __repr__(self):
+        return f"StructEncoding({self.name})"
+
+    def check(self, value):
+        if not isinstance(value, self.struct_type):
+            raise ValueError(f"{value!r} is not a {self.name}")
+        if value.size != self.size:
+            raise ValueError(f"{value.size} bit {self.name} does not fit the field size: {self.size} bits")
+
+    def decode(self, raw: int):
+        if self.is_record:
+            return self.struct_type.unpack_int(raw)
+        struct = self.struct_type()
+        struct.from_int(raw)
+        return struct
+
+    def encode(self, value) -> int:
+        self.check(value)
+        return int(value)
+
+    def take(self, raws) -> list:
+        """
+        Decodes many raw values at once
+        """
+        return [self.decode(raw) for raw in raws]
+
+
+def _field_encoding(size: int, signed: bool = False, byteorder: str = "big", bit_order: str = "msb", encoding=None):
+    """
+    Returns the encoding to store for a field, None when it is plain unsigned big endian
+    """
+    if encoding is not None:
+        if encoding.size != size:
+            raise ValueError(f"encoding is for {encoding.size} bits, the field is {size} bits")
+        return encoding
+    encoding = FieldEncoding(size, signed, byteorder, bit_order)
+    return None if encoding.plain else encoding
+
+
+class BitField:
+
+    def __init__(self, size: int, name: str = "", value: int = 0, signed: bool = False,
+                 byteorder: str = "big", bit_order: str = "msb", encoding=None):
+        """
+        Params:
+            size:       the number of bits in the field
+            name:       the name of the field
+            value:      the initial value
+            signed:     the value is stored as two's complement
+            byteorder:  "little" when the least significant byte of the value is stored first
+            bit_order:  "lsb" when the least significant bit of the value is stored first
+            encoding:   a prebuilt encoding, such as a FieldEncoding, used instead of the three above
+        """
+        self.__size = size
+        self.__name = name
+        self.__encoding = _field_encoding(size, signed, byteorder, bit_order, encoding)
+        self._value = value
+        # the structs holding this field, told whenever the value changes so they can drop their cached images
+        self._owners = ()
+
+    def __int__(self):
+        return self.value
+
+    def __eq__(self, other):
+        if not isinstance(other, BitField):
+            return NotImplemented
+        return (self.name, self.size, self.encoding, self.raw) == (other.name, other.size, other.encoding, other.raw)
+
+    def __hash__(self):
+        return hash((self.name, self.size, self.raw))
+
+    def __getstate__(self):
+        # the owning struct sets itself again when it is rebuilt
+        state = self.__dict__.copy()
+        state["_owners"] = ()
+        return state
+
+    def __index__(self):
+        """
+        Brief:
+            Enables type conversions such as __hex__
+        """
+        return operator.index(int(self))
+
+    def __str__(self):
+        return f"{self.name}:\t{self.value}"
+
+    def __bytes__(self):
+        """
+        Creates a bytearray of the appropriate size holding the field's raw bits. Unclear what this might be used for.
+        """
+        intVal = self.raw
+        bytes_needed, rem = divmod(self.size, 8)
+        if rem:
+            bytes_needed += 1
+        return intVal.to_bytes(bytes_needed, 'big')
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, new_value):
+        if self.__encoding is not None:
+            self.__encoding.check(new_value)
+        elif new_value < 0 or new_value.bit_length() > self.size:
+            raise ValueError(f"{new_value} is too large for the field size: {self.size} bits")
+        self._value = new_value
+        for owner in self._owners:
+            owner._invalidate()
+
+    @property
+    def raw(self):
+        """
+        The field's bits as they are stored, as an unsigned int
+        """
+        if self.__encoding is None:
+            return self._value
+        return self.__encoding.encode(self._value)
+
+    @raw.setter
+    def raw(self, new_raw):
+        if self.__encoding is None:
+            self.value = new_raw
+        else:
+            self._value = self.__encoding.decode(new_raw)
+            for owner in self._owners:
+                owner._invalidate()
+
+    @property
+    def encoding(self):
+        """
+        The field's FieldEncoding, or None for plain unsigned big endian fields
+        """
+        return self.__encoding
+
+    @encoding.setter
+    def encoding(self, new_encoding):
+        raise AttributeError("encoding field cannot be modified")
+
+    @property
+    def name(self):
+        return self.__name
+
+    @name.setter
+    def name(self, new_name):
+        raise AttributeError("name field cannot be modified")
+
+    @property
+    def size(self):
+        return self.__size
+
+    @size.setter
+    def size(self, new_size):
+        raise AttributeError("size field cannot be modified")
+
+    def to_dict(self):
+        return {self.name: self.value}
+
+    def to_bin(self):
+        """
+        __bin__ cannot be overloaded in the same way as other methods. Treat this function as if you could.
+        """
+        binStr = bin(self.raw)[2:]
+        while len(binStr) < self.size:
+            binStr = '0' + binStr
+        return binStr
+
+
+class EnumField(BitField):
+    """
+    A BitField whose value is looked up from its raw code in a table, see EnumEncoding
+    """
+
+    def __init__(self, size: int, table, name: str = "", value=None, unknown: str = "raise", default=None):
+        encoding = EnumEncoding.of(size, table, unknown, default)
+        if value is None:
+            value = encoding.decode(0) if 0 in encoding.members or unknown != "raise" else next(iter(encoding.codes))
+        super().__init__(size=size, name=name, value=value, encoding=encoding)
+
+    def __int__(self):
+        return self.raw
+
+
+class FixedPointField(BitField):
+    """
+    A BitField holding a scaled value, see FixedPointEncoding
+    """
+
+    def __init__(self, size: int, scale: float, name: str = "", value: float = None, offset: float = 0.0,
+                 signed: bool = False):
+        encoding = FixedPointEncoding(size, scale, offset, signed)
+        super().__init__(size=size, name=name, value=encoding.decode(0) if value is None else value, encoding=encoding)
+
+    def __int__(self):
+        return self.raw
+
+
+class FloatField(BitField):
+    """
+    A BitField holding an IEEE 754 float, see FloatEncoding
+    """
+
+    def __init__(self, size: int, name: str = "", value: float = 0.0, byteorder: str = "big"):
+        super().__init__(size=size, name=name, value=value, encoding=FloatEncoding(size, byteorder))
+
+    def __int__(self):
+        return self.raw
+
+
+class ArrayField(BitField):
+    """
+    A BitField holding `count` packed `width` bit integers as an array.array, see ArrayEncoding
+    """
+
+    def __init__(self, count: int, width: int, name: str = "", value=None, signed: bool = False):
+        encoding = ArrayEncoding(count, width, signed)
+        if value is None:
+            value = array.array(encoding.typecode, [0]) * count
+        super().__init__(size=encoding.size, name=name, value=value, encoding=encoding)
+
+    def __int__(self):
+        return self.raw
+
+
+class StructField(BitField):
+    """
+    A BitField holding a nested struct or record, see StructEncoding
+    """
+
+    def __init__(self, struct_type, name: str = "", value=None):
+        encoding = StructEncoding(struct_type)
+        if value is None:
+            # a fresh instance, since all zero bits are not valid for every struct
+            value = struct_type()
+        super().__init__(size=encoding.size, name=name, value=value, encoding=encoding)
+
+    def __int__(self):
+        return self.raw
+
+
+class PayloadField:
+    """
+    A variable length run of bytes whose length is held by an earlier field of a VarBitStruct.
+    Decoded payloads are memoryviews into the decoded buffer whenever they start on a byte boundary.
+    """
+
+    def __init__(self, name: str, length: str, unit: int = 1, adjust: int = 0, value: bytes = b""):
+        """
+        Params:
+            name:   the name of the field
+            length: the name of the earlier field holding the payload length
+            unit:   the number of bytes counted by each step of the length field
+            adjust: added to the scaled length, for length fields which count more than the payload
+            value:  the initial payload
+        """
+        self.__name = name
+        self.__length = length
+        self.__unit = unit
+        self.__adjust = adjust
+        self.value = value
+
+    def __str__(self):
+        return f"{self.name}:\t{bytes(self.value).hex()}"
+
+    def __bytes__(self):
+        return bytes(self.value)
+
+    def __len__(self):
+        return len(self.value)
+
+    @property
+    def name(self):
+        return self.__name
+
+    @name.setter
+    def name(self, new_name):
+        raise AttributeError("name field cannot be modified")
+
+    @property
+    def length(self):
+        return self.__length
+
+    @length.setter
+    def length(self, new_length):
+        raise AttributeError("length field cannot be modified")
+
+    @property
+    def size(self):
+        """
+        The payload's current size in bits
+        """
+        return len(self.value) * 8
+
+    @size.setter
+    def size(self, new_size):
+        raise AttributeError("size field cannot be modified")
+
+    def byte_count(self, length: int) -> int:
+        """
+        Returns the number of payload bytes described by a length field value
+        """
+        return length * self.__unit + self.__adjust
+
+    def to_dict(self):
+        return {self.name: bytes(self.value)}
+
+
+class ChecksumField(BitField):
+    """
+    A BitField holding a CRC of other bits of its struct. bytes() fills it in and from_bytes checks it.
+    """
+
+    def __init__(self, crc: Crc, name: str = "", start: int = 0, end: int = None, scope: str = "struct",
+                 value: int = 0):
+        """
+        Params:
+            crc:    the Crc computed, such as CRC16_CCITT or CRC32
+            name:   the name of the field
+            start:  the first bit covered, counted from the start of the scope
+            end:    the bit after the last one covered. Defaults to the start of this field.
+            scope:  "struct" to cover bits of the field's own BitStruct, or "collection" to cover
+                    bits of the BitCollection (or FlitStruct) holding that struct
+            value:  the initial value
+        """
+        if scope not in ("struct", "collection"):
+            raise ValueError(f"scope must be 'struct' or 'collection', was {scope!r}")
+        super().__init__(size=crc.width, name=name, value=value)
+        self.__crc = crc
+        self.__start = start
+        self.__end = end
+        self.__scope = scope
+
+    @property
+    def crc(self):
+        return self.__crc
+
+    @crc.setter
+    def crc(self, new_crc):
+        raise AttributeError("crc field cannot be modified")
+
+    @property
+    def scope(self):
+        return self.__scope
+
+    @scope.setter
+    def scope(self, new_scope):
+        raise AttributeError("scope field cannot be modified")
+
+    @property
+    def start(self):
+        return self.__start
+
+    @start.setter
+    def start(self, new_start):
+        raise AttributeError("start field cannot be modified")
+
+    @property
+    def end(self):
+        """
+        The bit after the last one covered, or None for the start of this field
+        """
+        return self.__end
+
+    @end.setter
+    def end(self, new_end):
+        raise AttributeError("end field cannot be modified")
+
+    def coverage(self, offset: int, size: int) -> tuple:
+        """
+        Returns the (start, end) bits covered when the field itself starts `offset` bits into a scope
+        `size` bits long
+        """
+        end = offset if self.__end is None else self.__end
+        if not 0 <= self.__start < end:
+            raise ValueError(f"{self.name} covers no bits: {self.__start} to {end}")
+        if end > size:
+            raise ValueError(f"{self.name} covers bits past the end: {end} of {size}")
+        if self.__start < offset + self.size and end > offset:
+            raise ValueError(f"{self.name} cannot cover its own bits")
+        return self.__start, end
+
+
+class ChecksumError(ValueError):
+    """
+    Raised when a stored checksum does not match the data it covers
+    """
+
+
+def _checksum_positions(fields, offset: int, size: int, scope: str) -> tuple:
+    """
+    Returns (field, shift, start, end) for each ChecksumField of the given scope among fields, which
+    start `offset` bits into a scope `size` bits long
+    """
+    positions = []
+    for field in fields:
+        if isinstance(field, ChecksumField) and field.scope == scope:
+            start, end = field.coverage(offset, size)
+            positions.append((field, size - offset - field.size, start, end))
+        offset += field.size
+    return tuple(positions)
+
+
+def _fill_checksums(value: int, size: int, checksums: tuple) -> int:
+    """
+    Returns the `size` bit image value with each checksum computed and written in, in order
+    """
+    for field, shift, start, end in checksums:
+        computed = field.crc.compute_bits((value >> (size - end)) & ((1 << (end - start)) - 1), end - start)
+        field.value = computed
+        value = (value & ~(((1 << field.size) - 1) << shift)) | (computed << shift)
+    return value
+
+
+def _verify_checksums(value: int, size: int, checksums: tuple, data=None):
+    """
+    Raises a ValueError for the first checksum which does not match the `size` bit image value. When
+    the original bytes are given, byte aligned coverage is computed straight from them.
+    """
+    for field, shift, start, end in checksums:
+        stored = (value >> shift) & ((1 << field.size) - 1)
+        if data is not None and not start % 8 and not end % 8:
+            computed = field.crc.compute(data[start // 8:end // 8])
+        else:
+            computed = field.crc.compute_bits((value >> (size - end)) & ((1 << (end - start)) - 1), end - start)
+        if stored != computed:
+            raise ChecksumError(f"{field.name} does not match its data: stored 0x{stored:X}, computed 0x{computed:X}")
+
+
+class DecodeCache:
+    """
+    A bounded least recently used cache of decoded records keyed by their raw bytes, shared by
+    everything decoding one BitLayout. Each entry is the immutable (values, image) pair of a record.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be at least 1, was {maxsize}")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __str__(self):
+        return f"hits: {self.hits}\tmisses: {self.misses}\tevictions: {self.evictions}\tsize: {len(self)}"
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def lookup(self, key: bytes, decode):
+        """
+        Returns the entry for key, calling decode(key) to create it when it is not cached. Nothing
+        is cached when decode raises.
+        """
+        entries = self.__entries
+        entry = entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            entries.move_to_end(key)
+            return entry
+        self.misses += 1
+        entry = entries[key] = decode(key)
+        if len(entries) > self.maxsize:
+            entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def clear(self):
+        self.__entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def to_dict(self):
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate
+        }
+
+
+# compiled pack/unpack code keyed by its generated source, which load_schema's cache seeds in advance
+_CODEC_CODE = {}
+
+
+class BitLayout:
+    """
+    A BitLayout is the precomputed shape of a struct: the name, size and position of every field.
+    Its pack/unpack codec is generated once, when the layout is built, as straight line code.
+    """
+    __cache = {}
+
+    def __init__(self, fields: list[tuple], name: str = "", checksums: tuple = ()):
+        """
+        Params:
+            fields:     (name, size) or (name, size, codec) tuples in the order the fields appear,
+                        most significant first. A codec, such as a FieldEncoding, converts between
+                        the raw bits and the field's value; None means the value is the raw unsigned
+                        bits.
+            name:       the name of the struct this layout describes
+            checksums:  (field index, crc, start, end, scope) for each ChecksumField. They are not
+                        used by pack and unpack, but a struct checking a CRC must not share its
+                        layout, and its decode cache, with a struct of the same shape which does not.
+        """
+        self.__name = name
+        self.__checksums = tuple(checksums)
+        self.__names = tuple(field[0] for field in fields)
+        self.__sizes = tuple(field[1] for field in fields)
+        self.__codecs = tuple(field[2] if len(field) > 2 else None for field in fields)
+        shifts = []
+        shift = sum(self.__sizes)
+        for size in self.__sizes:
+            shift -= size
+            shifts.append(shift)
+        self.__shifts = tuple(shifts)
+        self.__size = sum(self.__sizes)
+        # duplicate names resolve to their first occurrence
+        self.__index = {}
+        for idx, field_name in enumerate(self.__names):
+            self.__index.setdefault(field_name, idx)
+        self.__decode_cache = None
+        self.unpack, self.pack = self.__compile()
+
+    def __len__(self):
+        return len(self.__names)
+
+    def __reduce__(self):
+        # pickled as its shape, so unpickling finds the shared layout instead of compiling a copy
+        fields = tuple(zip(self.__names, self.__sizes, self.__codecs))
+        return BitLayout.of, (fields, self.__name, self.__checksums)
+
+    @classmethod
+    def of(cls, fields: list[tuple], name: str = "", checksums: tuple = ()):
+        """
+        Brief:
+            Returns the shared BitLayout for a shape, building it only the first time it is seen.
+            Every instance of a BitStruct subclass has the same shape, so they all share one layout.
+        """
+        key = (name, tuple(fields), tuple(checksums))
+        layout = cls.__cache.get(key)
+        if layout is None:
+            layout = cls.__cache[key] = cls(fields, name=name, checksums=checksums)
+        return layout
+
+    def __compile(self):
+        """
+        Brief:
+            Generates unpack(value) -> tuple and pack(values) -> int for this exact layout. Plain
+            fields are a shift and a mask; fields with a codec have its conversion inlined when the
+            codec can describe it as source, and call it otherwise.
+        """
+        namespace = {"check": self.check, "_reverse_bits": _reverse_bits, "_swap_bytes": _swap_bytes}
+        locals_ = []
+        unpack_terms = []
+        overflow_terms = []
+        pack_terms = []
+        fields = zip(self.__shifts, self.__sizes, self.__codecs)
+        for idx, (shift, size, codec) in enumerate(fields):
+            local = f"f{idx}"
+            locals_.append(local)
+            raw = f"((value >> {shift}) & {(1 << size) - 1})"
+            if codec is None:
+                unpack_terms.append(raw)
+                overflow_terms.append(f"({local} >> {size})")
+                pack_terms.append(f"({local} << {shift})")
+                continue
+            namespace[f"c{idx}"] = codec
+            if hasattr(codec, "decode_source"):
+                unpack_terms.append(codec.decode_source(raw, f"c{idx}"))
+            else:
+                unpack_terms.append(f"c{idx}.decode({raw})")
+            pack_terms.append(f"(c{idx}.encode({local}) << {shift})")
+
+        source = "def unpack(value):\n"
+        source += f"    return ({', '.join(unpack_terms)}{',' if unpack_terms else ''})\n"
+        source += "def pack(values):\n"
+        if locals_:
+            source += f"    {', '.join(locals_)}, = values\n"
+        if overflow_terms:
+            source += f"    if {' or '.join(overflow_terms)}:\n"
+            source += "        check(values)\n"
+        source += f"    return {' | '.join(pack_terms) or '0'}\n"
+
+        self.__source = source
+        code = _CODEC_CODE.get(source)
+        if code is None:
+            code = _CODEC_CODE[source] = compile(source, "<BitLayout>", "exec")
+        exec(code, namespace)
+        return namespace["unpack"], namespace["pack"]
+
+    @property
+    def name(self):
+        return self.__name
+
+    @name.setter
+    def name(self, new_value):
+        raise AttributeError("Cannot modify BitLayout's name")
+
+    @property
+    def checksums(self):
+        return self.__checksums
+
+    @checksums.setter
+    def checksums(self, new_value):
+        raise AttributeError("Cannot modify BitLayout's checksums")
+
+    @property
+    def source(self):
+        """
+        The generated source of pack and unpack
+        """
+        return self.__source
+
+    @source.setter
+    def source(self, new_value):
+        raise AttributeError("Cannot modify BitLayout's source")
+
+    @property
+    def names(self):
+        return self.__names
+
+    @names.setter
+    def names(self, new_value):
+        raise AttributeError("Cannot modify BitLayout's names")
+
+    @property
+    def sizes(self):
+        return self.__sizes
+
+    @sizes.setter
+    def sizes(self, new_value):
+        raise AttributeError("Cannot modify BitLayout's sizes")
+
+    @property
+    def shifts(self):
+        """
+        The distance of each field's least significant bit from the end of the struct
+        """
+        return self.__shifts
+
+    @shifts.setter
+    def shifts(self, new_value):
+        raise AttributeError("Cannot modify BitLayout's shifts")
+
+    @property
+    def index(self):
+        return self.__index
+
+    @index.setter
+    def index(self, new_value):
+        raise AttributeError("Cannot modify BitLayout's index")
+
+    @property
+    def size(self):
+        return self.__size
+
+    @size.setter
+    def size(self, new_value):
+        raise AttributeError("Cannot modify BitLayout's size")
+
+    @property
+    def byte_size(self):
+        return (self.__size + 7) // 8
+
+    @property
+    def codecs(self):
+        return self.__codecs
+
+    @codecs.setter
+    def codecs(self, new_value):
+        raise AttributeError("Cannot modify BitLayout's codecs")
+
+    def check(self, values):
+        """
+        Raises the same ValueError as BitField for the first value which does not fit its field
+        """
+        for value, size, codec in zip(values, self.__sizes, self.__codecs):
+            if codec is not None:
+                codec.check(value)
+            elif value >> size:
+                raise ValueError(f"{value} is too large for the field size: {size} bits")
+
+    @property
+    def decode_cache(self):
+        """
+        The layout's DecodeCache, or None when decoding is not cached
+        """
+        return self.__decode_cache
+
+    @decode_cache.setter
+    def decode_cache(self, new_value):
+        raise AttributeError("Use enable_cache and disable_cache to change BitLayout's decode_cache")
+
+    def enable_cache(self, maxsize: int = 4096) -> DecodeCache:
+        """
+        Brief:
+            Caches the records decoded from byte strings by this layout, for every struct and record
+            sharing it. Repeated records then decode with a dict lookup.
+
+        Returns:
+            the new DecodeCache, with its hit and miss counters
+        """
+        if any(isinstance(codec, (ArrayEncoding, StructEncoding)) for codec in self.__codecs):
+            raise ValueError(f"{self.__name} holds arrays or nested structs, whose values cannot be shared")
+        self.__decode_cache = DecodeCache(maxsize)
+        return self.__decode_cache
+
+    def disable_cache(self):
+        self.__decode_cache = None
+
+    def decode_entry(self, data: bytes) -> tuple:
+        """
+        Returns (values, image) for the record at the start of data
+        """
+        value = _extract_bits(data, 0, self.__size)
+        return self.unpack(value), value
+
+    def unpack_bytes(self, data: bytes, bit_offset: int = 0) -> tuple:
+        """
+        Returns the field values held in data, starting bit_offset bits in
+        """
+        if self.__decode_cache is not None and not bit_offset:
+            return self.__decode_cache.lookup(bytes(data[:self.byte_size]), self.decode_entry)[0]
+        return self.unpack(_extract_bits(data, bit_offset, self.__size))
+
+
+class BitStruct:
+
+    def __init__(self, bitfields: list[BitField], name: str = ""):
+        self.__fields = bitfields
+        self.__name = name
+        self.__layout = BitLayout.of(
+            [(field.name, field.size, field.encoding) for field in bitfields], name=name,
+            checksums=[
+                (idx, field.crc, field.start, field.end, field.scope)
+                for idx, field in enumerate(bitfields) if isinstance(field, ChecksumField)
+            ]
+        )
+        self.__size = self.__layout.size
+        self.__checksums = _checksum_positions(bitfields, 0, self.__size, "struct")
+        self.__idx = 0
+        # int(self) is cached until a field changes, unless a field's value can change in place
+        self._image = None
+        self.__cacheable = not any(
+            isinstance(codec, (ArrayEncoding, StructEncoding)) for codec in self.__layout.codecs
+        )
+        # a decoded image is only known to re-encode to itself when every codec is exact
+        self.__exact = all(codec is None or isinstance(codec, FieldEncoding) for codec in self.__layout.codecs)
+        # every collection holding this struct; a struct or field may be held by several
+        self._owners = ()
+        self._shares_fields = False
+        for field in bitfields:
+            self.__adopt(field)
+
+    def __adopt(self, field: BitField):
+        if self in field._owners:
+            return
+        if field._owners:
+            # decoding writes values without the setter, so it tells the other structs itself
+            self._shares_fields = True
+            for owner in field._owners:
+                owner._shares_fields = True
+        field._owners += (self,)
+
+    def __str__(self):
+        print_width = max([len(field.name) for field in self.fields])
+        retStr = f"\t{self.name}:\n"
+        for field in self.fields:
+            padding = " " * (print_width - len(field.name) + 4)
+            retStr += f"\t\t{field.name}:{padding}{field.value}\n"
+        return retStr
+
+    def __int__(self):
+        if self._image is not None:
+            return self._image
+        value = self.__layout.pack([field.value for field in self.fields])
+        if self.__checksums:
+            value = _fill_checksums(value, self.__size, self.__checksums)
+        if self.__cacheable:
+            self._image = value
+        return value
+
+    def __eq__(self, other):
+        if not isinstance(other, BitStruct):
+            return NotImplemented
+        return self.__layout is other.layout and int(self) == int(other)
+
+    def __reduce__(self):
+        """
+        Brief:
+            Pickles the struct as its class and its bit image. Subclasses are rebuilt by calling
+            them without arguments when that builds this struct's layout, and plain BitStructs from
+            their layout. Plain BitStructs holding BitField subclasses, such as ChecksumFields,
+            pickle their fields instead, and so do subclasses built any other way. Subclasses pickle
+            cannot find by name, such as those from load_schema, are rebuilt as plain BitStructs.
+        """
+        if type(self) is not BitStruct and _importable(type(self)):
+            if _default_shape(type(self)) is self.__layout:
+                return _rebuild_struct, (type(self), int(self))
+            return copyreg.__newobj__, (type(self),), dict(self.__dict__, _owners=())
+        if all(type(field) is BitField for field in self.fields):
+            return _rebuild_struct, (self.__layout, int(self))
+        return BitStruct, (self.fields, self.name)
+
+    def __setstate__(self, state):
+        # the fields dropped their owners when pickled
+        self.__dict__.update(state)
+        for field in self.fields:
+            self.__adopt(field)
+
+    def __hash__(self):
+        return hash((self.__layout, int(self)))
+
+    def __index__(self):
+        """
+        Brief:
+            Enables type conversions such as __hex__
+        """
+        return operator.index(int(self))
+
+    def __bytes__(self):
+        """
+        Creates a bytearray of the appropriate size. Unclear what this might be used for.
+        """
+        intVal = int(self)
+        bytes_needed, rem = divmod(self.size, 8)
+        if rem:
+            bytes_needed += 1
+        return intVal.to_bytes(bytes_needed, 'big')
+
+    def __iter__(self):
+        self.__idx = 0
+        return self
+
+    def __next__(self):
+        idx = self.idx
+        if idx >= len(self.fields):
+            raise StopIteration
+        self.__idx += 1
+        return self.fields[idx]
+
+    def __getitem__(self, item):
+        """
+        Brief:
+            Returns a field by position, or by name. When several fields share a name the first
+            one is returned.
+        """
+        if isinstance(item, str):
+            return self.fields[self.__layout.index[item]]
+        return self.fields[item]
+
+    @property
+    def fields(self):
+        return self.__fields
+
+    @fields.setter
+    def fields(self, new_val):
+        raise AttributeError("Cannot modify BitStruct's fields")
+
+    @property
+    def layout(self):
+        return self.__layout
+
+    @layout.setter
+    def layout(self, new_val):
+        raise AttributeError("Cannot modify BitStruct's layout")
+
+    @property
+    def name(self):
+        return self.__name
+
+    @name.setter
+    def name(self, new_val):
+        raise AttributeError("Cannot modify BitStruct's name")
+
+    @property
+    def size(self):
+        return self.__size
+
+    @size.setter
+    def size(self, new_val):
+        raise AttributeError("Cannot modify BitStruct's size")
+
+    @property
+    def idx(self):
+        return self.__idx
+
+    @idx.setter
+    def idx(self, new_value):
+        raise AttributeError("Cannot modify BitStruct's index")
+
+    def to_bin(self):
+        binStr = bin(int(self))[2:]
+        return "0" * (self.size - len(binStr)) + binStr
+
+    def to_dict(self):
+        return {self.name: {field.name: field.value for field in self}}
+
+    def _invalidate(self):
+        """
+        Drops the cached bit image, called by the struct's fields whenever one of them changes, and
+        passes it on to every collection holding the struct
+        """
+        self._image = None
+        for owner in self._owners:
+            owner._invalidate()
+
+    def __assign(self, values, image: int = None):
+        """
+        Stores values which are already known to fit their fields, such as values decoded from the
+        fields' own bits, without each field checking them again
+        """
+        self._invalidate()
+        for field, value in zip(self.fields, values):
+            field._value = value
+        if self._shares_fields:
+            for field in self.fields:
+                for owner in field._owners:
+                    if owner is not self:
+                        owner._invalidate()
+        if image is not None and self.__exact and self.__cacheable:
+            self._image = image
+
+    def set_values(self, values):
+        """
+        Brief:
+            Sets every field at once, in field order. The whole record is checked in one pass by the
+            layout's pack before any field changes, so a bad value leaves the struct as it was.
+        """
+        values = tuple(values)
+        if len(values) != len(self.fields):
+            raise ValueError(f"{self.name} has {len(self.fields)} fields, got {len(values)} values")
+        image = self.__layout.pack(values)
+        # the image is only complete once the checksums are filled in, which int(self) does
+        self.__assign(values, None if self.__checksums else image)
+
+    def update(self, values: dict = None, **fields):
+        """
+        Brief:
+            Sets the named fields, leaving the others as they are. Names which are not identifiers
+            can be passed in the `values` dict. Checked in one pass, like set_values.
+        """
+        changes = dict(values or {}, **fields)
+        index = self.__layout.index
+        for name in changes:
+            if name not in index:
+                raise ValueError(f"{name} is not a field of {self.name}")
+        current = [field.value for field in self.fields]
+        for name, value in changes.items():
+            current[index[name]] = value
+        self.set_values(current)
+
+    def from_bin(self, binstring: str = ""):
+        """
+        This class is meant to represent a struct of bit fields. It requires bits to populate.
+        """
+        if binstring.startswith("0b"):
+            binstring = binstring[2:]
+
+        if len(binstring) < self.size:
+            raise ValueError("Not enough bins to fill the BitStruct")
+
+        value = int(binstring[:self.size] or "0", 2)
+        if self.__checksums:
+            _verify_checksums(value, self.__size, self.__checksums)
+        self.__assign(self.__layout.unpack(value), value)
+
+    def from_int(self, value: int):
+        """
+        Populates the bit struct from an integer holding its bit image. The inverse of int(struct).
+        """
+        if value.bit_length() > self.size:
+            raise ValueError(f"{value} is too large for the BitStruct size: {self.size} bits")
+
+        if self.__checksums:
+            _verify_checksums(value, self.__size, self.__checksums)
+        self.__assign(self.__layout.unpack(value), value)
+
+    def from_bytes(self, bytestring: bytes):
+        """
+        Populates the bit struct from a bytearray
+        """
+        if len(bytestring) < self.__layout.byte_size:
+            raise ValueError("Not enough bytes to fill the BitStruct")
+
+        cache = self.__layout.decode_cache
+        if cache is None:
+            values, value = self.__decode(bytestring)
+        else:
+            values, value = cache.lookup(bytes(bytestring[:self.__layout.byte_size]), self.__decode)
+        self.__assign(values, value)
+
+    def __decode(self, bytestring: bytes) -> tuple:
+        value = _extract_bits(bytestring, 0, self.__size)
+        if self.__checksums:
+            _verify_checksums(value, self.__size, self.__checksums, bytestring)
+        return self.__layout.unpack(value), value
+
+
+class BitCollection:
+    """
+    A BitCollection is defined as an ordered collection of BitStructs
+    """
+
+    def __init__(self, bitstructs: list[BitStruct], name: str = ""):
+        self.__structs = bitstructs
+        self.__name = name
+        self.__size = sum([struct.size for struct in self.structs])
+        self.__idx = 0
+        checksums = []
+        offset = 0
+        for struct in bitstructs:
+            checksums.extend(_checksum_positions(struct.fields, offset, self.__size, "collection"))
+            offset += struct.size
+        self.__checksums = tuple(checksums)
+        self.__shape = tuple(struct.layout for struct in bitstructs)
+        # int(self) is cached until one of the structs changes, unless a value can change in place
+        self._image = None
+        self.__cacheable = not any(
+            isinstance(codec, (ArrayEncoding, StructEncoding)) for layout in self.__shape for codec in layout.codecs
+        )
+        self._owners = ()
+        for struct in bitstructs:
+            if self not in struct._owners:
+                struct._owners += (self,)
+        # struct names may repeat, so each name maps to the positions of every struct using it
+        self.__index = {}
+        for idx, struct in enumerate(bitstructs):
+            self.__index.setdefault(struct.name, []).append(idx)
+
+    def __iter__(self):
+        self.__idx = 0
+        return self
+
+    def __next__(self):
+        idx = self.idx
+        if idx >= len(self.structs):
+            raise StopIteration
+        self.__idx += 1
+        return self.structs[idx]
+
+    def __str__(self):
+        retStr = f"{self.name}:\n"
+        for struct in self.structs:
+            retStr += str(struct)
+        return retStr
+
+    def __int__(self):
+        if self._image is not None:
+            return self._image
+        binstr = "".join([struct.to_bin() for struct in self.structs])
+        value = int(binstr, 2)
+        if self.__checksums:
+            value = _fill_checksums(value, self.__size, self.__checksums)
+        if self.__cacheable:
+            self._image = value
+        return value
+
+    def __reduce__(self):
+        """
+        Pickles the collection as its structs, each of which pickles as its class and bit image.
+        Subclasses are rebuilt by calling them without arguments when that builds the same structs,
+        and subclasses pickle cannot find by name as a plain BitCollection or FlitStruct.
+        """
+        if type(self) in (BitCollection, FlitStruct):
+            return type(self), (self.structs, self.name)
+        if not _importable(type(self)):
+            return FlitStruct if isinstance(self, FlitStruct) else BitCollection, (self.structs, self.name)
+        if _default_shape(type(self)) == self.__shape:
+            return _rebuild_collection, (type(self), int(self))
+        return copyreg.__newobj__, (type(self),), dict(self.__dict__, _owners=())
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        for struct in self.structs:
+            if self not in struct._owners:
+                struct._owners += (self,)
+
+    def __eq__(self, other):
+        if not isinstance(other, BitCollection):
+            return NotImplemented
+        return (self.__name, self.__shape) == (other.name, other.__shape) and int(self) == int(other)
+
+    def __hash__(self):
+        return hash((self.__name, self.__shape, int(self)))
+
+    def _invalidate(self):
+        """
+        Drops the cached bit image, called by the collection's structs whenever one of them changes
+        """
+        self._image = None
+        for owner in self._owners:
+            owner._invalidate()
+
+    def __bytes__(self):
+        intVal = int(self)
+        bytes_needed, rem = divmod(self.size, 8)
+        if rem:
+            bytes_needed += 1
+        # int.to_bytes requires a byteorder param
+        return intVal.to_bytes(bytes_needed, byteorder='big')
+
+    def __index__(self):
+        """
+        Brief:
+            Enables type conversions such as __hex__
+        """
+        return operator.index(int(self))
+
+    def __len__(self):
+        return len(self.structs)
+
+    def __getitem__(self, item):
+        """
+        Brief:
+            Returns a struct by position, or by name. When several structs share a name the first
+            one is returned; use get_all for every one of them.
+        """
+        if isinstance(item, str):
+            return self.structs[self.__index[item][0]]
+        return self.structs[item]
+
+    def get_all(self, name: str) -> list:
+        """
+        Returns every struct with the given name, in order
+        """
+        return [self.structs[idx] for idx in self.__index.get(name, ())]
+
+    @property
+    def structs(self):
+        return self.__structs
+
+    @structs.setter
+    def structs(self, new_value):
+        raise AttributeError(f"Cannot modify BitCollection's substructs")
+
+    @property
+    def name(self):
+        return self.__name
+
+    @name.setter
+    def name(self, new_value):
+        raise AttributeError("Cannot modify BitCollection's name")
+
+    @property
+    def size(self):
+        return self.__size
+
+    @size.setter
+    def size(self, new_value):
+        raise AttributeError("Cannot modify BitCollection's size")
+
+    @property
+    def idx(self):
+        return self.__idx
+
+    @idx.setter
+    def idx(self, new_value):
+        raise AttributeError("Cannot modify BitCollection's index")
+
+    def to_bin(self):
+        if self.__checksums:
+            binstr = bin(int(self))[2:]
+            return "0" * (self.size - len(binstr)) + binstr
+        binstr = ""
+        for struct in self.structs:
+            binstr += struct.to_bin()
+        return binstr
+
+    def to_dict(self):
+        """
+        Creates a dictionary representation of the struct.
+
+        It's possible that a BitCollection might contain multiple structs
+        of the same name.
+        """
+        return {
+            self.name: [
+                struct.to_dict() for struct in self
+            ]
+        }
+
+    def from_bin(self, binstring: str):
+        """
+        Because this is a collection of bit structs it does make sense that someone
+        might want to populate it with bits rather than bytes.
+        """
+        if binstring.startswith("0b"):
+            binstring = binstring[2:]
+
+        if len(binstring) < self.size:
+            raise ValueError("Not enough bins to fill the BitCollection")
+
+        if self.__checksums:
+            _verify_checksums(int(binstring[:self.size], 2), self.__size, self.__checksums)
+        for struct in self.structs:
+            struct.from_bin(binstring[:struct.size])
+            binstring = binstring[struct.size:]
+
+    def from_bytes(self, bytestring: bytes):
+        if len(bytestring) < self.size // 8:
+            raise ValueError("Not enough bytes to fill the BitCollection")
+
+        if self.__checksums:
+            value = _extract_bits(bytestring, 0, self.__size)
+            _verify_checksums(value, self.__size, self.__checksums, bytestring)
+
+        data = Biterator(bytestring)
+        available_bins = next(data)
+
+        for struct in self.structs:
+            while len(available_bins) < struct.size:
+                available_bins += next(data)
+            struct.from_bin(available_bins[:struct.size])
+            available_bins = available_bins[struct.size:]
+
+
+class FlitStruct(BitCollection):
+
+    def __init__(self, bitstructs: list[BitStruct], name: str = ""):
+        super().__init__(bitstructs=bitstructs, name=name)
+        if self.size != 128:
+            raise ValueError(f"FlitStructs MUST be 128 bits, was {self.size}")
+
+
+class VarBitStruct:
+    """
+    A struct containing PayloadFields, whose sizes come from earlier length fields. The runs of fixed
+    fields between payloads share BitLayouts, and every offset is resolved in one forward pass over
+    the data. Unlike BitStruct, bytes() pads the final byte at the end, so that frames placed back to
+    back decode with iter_unpack.
+    """
+
+    def __init__(self, bitfields: list, name: str = ""):
+        self.__fields = bitfields
+        self.__name = name
+        self.__index = {}
+        for idx, field in enumerate(bitfields):
+            if isinstance(field, PayloadField) and field.length not in self.__index:
+                raise ValueError(f"{field.name} is sized by {field.length}, which must be an earlier field")
+            self.__index.setdefault(field.name, idx)
+        # (layout, fields) for each run of fixed fields, (None, payload) for each payload
+        self.__segments = []
+        run = []
+        for field in bitfields + [None]:
+            if isinstance(field, BitField):
+                run.append(field)
+                continue
+            if run:
+                layout = BitLayout.of([(member.name, member.size, member.encoding) for member in run], name=name)
+                self.__segments.append((layout, run))
+                run = []
+            if field is not None:
+                self.__segments.append((None, field))
+        self.__offsets = ()
+        self.__idx = 0
+
+    def __str__(self):
+        print_width = max([len(field.name) for field in self.fields])
+        retStr = f"\t{self.name}:\n"
+        for field in self.fields:
+            padding = " " * (print_width - len(field.name) + 4)
+            value = bytes(field.value).hex() if isinstance(field, PayloadField) else field.value
+            retStr += f"\t\t{field.name}:{padding}{value}\n"
+        return retStr
+
+    def __int__(self):
+        value = 0
+        for layout, fields in self.__segments:
+            if layout is None:
+                self.__check_length(fields)
+                value = (value << fields.size) | int.from_bytes(fields.value, 'big')
+            else:
+                value = (value << layout.size) | layout.pack([field.value for field in fields])
+        return value
+
+    def __bytes__(self):
+        value = int(self)
+        size = self.size
+        return (value << (-size % 8)).to_bytes((size + 7) // 8, 'big')
+
+    def __iter__(self):
+        self.__idx = 0
+        return self
+
+    def __next__(self):
+        idx = self.idx
+        if idx >= len(self.fields):
+            raise StopIteration
+        self.__idx += 1
+        return self.fields[idx]
+
+    def __getitem__(self, item):
+        """
+        Brief:
+            Returns a field by position, or by name. When several fields share a name the first
+            one is returned.
+        """
+        if isinstance(item, str):
+            return self.fields[self.__index[item]]
+        return self.fields[item]
+
+    @property
+    def fields(self):
+        return self.__fields
+
+    @fields.setter
+    def fields(self, new_val):
+        raise AttributeError("Cannot modify VarBitStruct's fields")
+
+    @property
+    def name(self):
+        return self.__name
+
+    @name.setter
+    def name(self, new_val):
+        raise AttributeError("Cannot modify VarBitStruct's name")
+
+    @property
+    def size(self):
+        """
+        The struct's current size in bits, which depends on its payloads
+        """
+        return sum(field.size for field in self.fields)
+
+    @size.setter
+    def size(self, new_val):
+        raise AttributeError("Cannot modify VarBitStruct's size")
+
+    @property
+    def offsets(self):
+        """
+        The bit offset of each field from the start of the data it was last decoded from
+        """
+        return self.__offsets
+
+    @offsets.setter
+    def offsets(self, new_val):
+        raise AttributeError("Cannot modify VarBitStruct's offsets")
+
+    @property
+    def idx(self):
+        return self.__idx
+
+    @idx.setter
+    def idx(self, new_value):
+        raise AttributeError("Cannot modify VarBitStruct's index")
+
+    def __check_length(self, payload):
+        expected = payload.byte_count(self[payload.length].value)
+        if len(payload) != expected:
+            raise ValueError(f"{payload.name} holds {len(payload)} bytes but {payload.length} describes {expected}")
+
+    def to_bin(self):
+        binStr = bin(int(self))[2:]
+        return "0" * (self.size - len(binStr)) + binStr
+
+    def to_dict(self):
+        return {self.name: {name: value for field in self for name, value in field.to_dict().items()}}
+
+    def from_bytes(self, bytestring: bytes, bit_offset: int = 0) -> int:
+        """
+        Brief:
+            Populates the struct from the bits of a bytearray starting bit_offset bits in. Payloads
+            which start on a byte boundary are memoryviews into bytestring, so they are only valid
+            while it is.
+
+        Returns:
+            the bit offset just past the end of the struct
+        """
+        data = memoryview(bytestring)
+        available = len(data) * 8
+        pos = bit_offset
+        offsets = []
+        for layout, fields in self.__segments:
+            if layout is not None:
+                if pos + layout.size > available:
+                    raise ValueError("Not enough bytes to fill the VarBitStruct")
+                offsets.extend(pos + layout.size - shift - size for shift, size in zip(layout.shifts, layout.sizes))
+                # decoded from exactly the fields' own bits, so they always fit
+                for field, value in zip(fields, layout.unpack_bytes(data, pos)):
+                    field._value = value
+                pos += layout.size
+                continue
+            count = fields.byte_count(self[fields.length].value)
+            if count < 0 or pos + count * 8 > available:
+                raise ValueError(f"Not enough bytes to fill {fields.name}: {count} bytes needed")
+            offsets.append(pos)
+            if pos % 8:
+                fields.value = _extract_bits(data, pos, count * 8).to_bytes(count, 'big')
+            else:
+                fields.value = data[pos // 8:pos // 8 + count]
+            pos += count * 8
+        self.__offsets = tuple(offsets)
+        return pos
+
+    @classmethod
+    def iter_unpack(cls, bytestring: bytes):
+        """
+        Yields a new struct for each frame packed back to back in bytestring, each one starting on
+        a byte boundary. Only subclasses which can be built without arguments support this.
+        """
+        pos = 0
+        end = len(bytestring) * 8
+        while pos < end:
+            struct = cls()
+            pos = struct.from_bytes(bytestring, pos)
+            pos += -pos % 8
+            yield struct
+
+
+class BitWriter:
+    """
+    Appends bits at a cursor into a growing bytearray, or into any object with a write(bytes) method
+    such as an open file. Whole bytes leave the cursor's small accumulator as soon as they are complete
+    and are written to a file in blocks of `block_size` bytes. Everything is packed most significant
+    bit first, so records written back to back are read back by from_bytes, BitTable and the like.
+    """
+
+    def __init__(self, stream=None, block_size: int = 1 << 16):
+        """
+        Params:
+            stream:     an object with a write(bytes) method. When None, the bits are collected in a
+                        bytearray returned by getvalue.
+            block_size: the number of bytes buffered before each write to the stream
+        """
+        self.__stream = stream
+        self.__buffer = bytearray()
+        self.__block_size = block_size
+        self.__flushed = 0
+        self.__value = 0
+        self.__bits = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def tell(self) -> int:
+        """
+        Returns the cursor's position in bits from the start of the output
+        """
+        return (self.__flushed + len(self.__buffer)) * 8 + self.__bits
+
+    def __spill(self):
+        # moves whole bytes out of the accumulator, and whole blocks out to the stream
+        whole, rem = divmod(self.__bits, 8)
+        self.__buffer += (self.__value >> rem).to_bytes(whole, 'big')
+        self.__value &= (1 << rem) - 1
+        self.__bits = rem
+        if self.__stream is not None and len(self.__buffer) >= self.__block_size:
+            self.flush()
+
+    def write(self, value: int, size: int):
+        """
+        Appends the `size` low bits of a non-negative value
+        """
+        if value < 0:
+            raise ValueError(f"{value} is too small for the field size: {size} bits")
+        if value >> size:
+            raise ValueError(f"{value} is too large for the field size: {size} bits")
+        self.__value = (self.__value << size) | value
+        self.__bits += size
+        # shifting stays cheap while the accumulator holds a few hundred bytes at most
+        if self.__bits >= 1024:
+            self.__spill()
+
+    def write_field(self, field: BitField):
+        self.write(field.raw, field.size)
+
+    def write_struct(self, struct):
+        """
+        Appends the bit image of a BitStruct, BitRecord or BitCollection
+        """
+        self.write(int(struct), struct.size)
+
+    def write_structs(self, structs):
+        write = self.write
+        for struct in structs:
+            write(int(struct), struct.size)
+
+    def write_rows(self, layout, rows):
+        """
+        Packs and appends rows of field values, without building a struct for each one
+
+        Params:
+            layout: the BitLayout of each row, or a BitStruct/BitRecord holding one
+            rows:   sequences of field values in layout order
+        """
+        layout = getattr(layout, "layout", layout)
+        pack = layout.pack
+        size = layout.size
+        write = self.write
+        for row in rows:
+            write(pack(row), size)
+
+    def write_bytes(self, data: bytes):
+        """
+        Appends whole bytes. When the cursor is on a byte boundary they are copied without shifting.
+        """
+        if self.__bits % 8:
+            self.write(int.from_bytes(data, 'big'), len(data) * 8)
+            return
+        if self.__bits:
+            self.__spill()
+        self.__buffer += data
+        if self.__stream is not None and len(self.__buffer) >= self.__block_size:
+            self.flush()
+
+    def pad(self, count: int, fill: int = 0):
+        """
+        Appends `count` bits, all zeros, or all ones when fill is 1
+        """
+        self.write(((1 << count) - 1) if fill else 0, count)
+
+    def align(self, boundary: int = 8, fill: int = 0):
+        """
+        Pads up to the next multiple of `boundary` bits, if the cursor is not already on one
+        """
+        self.pad(-self.tell() % boundary, fill)
+
+    def flush(self):
+        """
+        Writes every whole byte to the stream. A partial final byte stays at the cursor.
+        """
+        if self.__bits >= 8:
+            self.__spill()
+        if self.__stream is not None and self.__buffer:
+            self.__stream.write(bytes(self.__buffer))
+            self.__flushed += len(self.__buffer)
+            self.__buffer.clear()
+
+    def close(self):
+        """
+        Pads the final byte with zeros and flushes everything
+        """
+        self.align()
+        self.flush()
+
+    def getvalue(self) -> bytearray:
+        """
+        Returns the bytes written so far when writing into a bytearray. A partial final byte is not
+        included until the writer is aligned or closed.
+        """
+        if self.__stream is not None:
+            raise ValueError("getvalue is only available when writing into a bytearray")
+        if self.__bits >= 8:
+            self.__spill()
+        return self.__buffer
+
+
+class Bits:
+    """
+    Declares the width (and optionally the display name and encoding) of a field on a @bitrecord class:
+
+        @bitrecord(name="Small Struct")
+        class SmallStruct:
+            apple: Bits[4]
+            banana: Bits[4, "Banana!"] = 3
+            carrot: Bits(16, signed=True, byteorder="little")
+    """
+
+    def __init__(self, size: int, name: str = None, signed: bool = False, byteorder: str = "big",
+                 bit_order: str = "msb", encoding=None):
+        if size < 1:
+            raise ValueError(f"Bits must be at least 1 bit wide, was {size}")
+        self.size = size
+        self.name = name
+        self.encoding = _field_encoding(size, signed, byteorder, bit_order, encoding)
+
+    def __class_getitem__(cls, item):
+        if isinstance(item, tuple):
+            return cls(*item)
+        return cls(item)
+
+    def __repr__(self):
+        if self.encoding is not None:
+            return f"Bits({self.size}, {self.name!r}, encoding={self.encoding!r})"
+        if self.name is None:
+            return f"Bits[{self.size}]"
+        return f"Bits[{self.size}, {self.name!r}]"
+
+
+class BitRecord:
+    """
+    The base of every class generated by @bitrecord. A BitRecord holds one plain slot per field, so
+    creating one is a single allocation and reading a field is an attribute lookup. Values are
+    checked against their field sizes when the record is encoded rather than on every assignment.
+    """
+    __slots__ = ()
+    layout = BitLayout([])
+    name = ""
+    size = 0
+    _attrs = ()
+
+    def __int__(self):
+        return self.layout.pack(self._values())
+
+    def __index__(self):
+        """
+        Brief:
+            Enables type conversions such as __hex__
+        """
+        return operator.index(int(self))
+
+    def __bytes__(self):
+        return int(self).to_bytes(self.layout.byte_size, 'big')
+
+    def __repr__(self):
+        args = ", ".join(f"{attr}={value!r}" for attr, value in zip(self._attrs, self._values()))
+        return f"{type(self).__name__}({args})"
+
+    def __str__(self):
+        print_width = max([len(name) for name in self.layout.names])
+        retStr = f"\t{self.name}:\n"
+        for name, value in zip(self.layout.names, self._values()):
+            padding = " " * (print_width - len(name) + 4)
+            retStr += f"\t\t{name}:{padding}{value}\n"
+        return retStr
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._values() == other._values()
+
+    def __reduce__(self):
+        return type(self)._make, (self._values(),)
+
+    def __hash__(self):
+        return hash(self._values())
+
+    def _values(self):
+        return ()
+
+    def _assign(self, values):
+        pass
+
+    @classmethod
+    def _make(cls, values):
+        record = object.__new__(cls)
+        record._assign(values)
+        return record
+
+    def to_bin(self):
+        binStr = bin(int(self))[2:]
+        return "0" * (self.size - len(binStr)) + binStr
+
+    def to_dict(self):
+        return {self.name: dict(zip(self.layout.names, self._values()))}
+
+    def to_bitstruct(self):
+        """
+        Returns an equivalent, independent BitStruct
+        """
+        return BitStruct(
+            bitfields=[
+                BitField(size=size, name=name, value=value, encoding=codec)
+                for name, size, codec, value in zip(
+                    self.layout.names, self.layout.sizes, self.layout.codecs, self._values()
+                )
+            ], name=self.name
+        )
+
+    def from_int(self, value: int):
+        """
+        Populates the record from an integer holding its bit image. The inverse of int(record).
+        """
+        if value.bit_length() > self.size:
+            raise ValueError(f"{value} is too large for the BitRecord size: {self.size} bits")
+        self._assign(self.layout.unpack(value))
+
+    def from_bin(self, binstring: str = ""):
+        if binstring.startswith("0b"):
             binstring = binstring[2:]
 
-        if len(binstring) < self.size:
-            raise ValueError("Not enough bins to fill the BitCollection")
+        if len(binstring) < self.size:
+            raise ValueError("Not enough bins to fill the BitRecord")
+        self._assign(self.layout.unpack(int(binstring[:self.size], 2)))
+
+    def from_bytes(self, bytestring: bytes):
+        if len(bytestring) < self.layout.byte_size:
+            raise ValueError("Not enough bytes to fill the BitRecord")
+        self._assign(self.layout.unpack_bytes(bytestring))
+
+    @classmethod
+    def unpack(cls, bytestring: bytes):
+        """
+        Returns a new record decoded from the leading bits of a bytearray
+        """
+        if len(bytestring) < cls.layout.byte_size:
+            raise ValueError("Not enough bytes to fill the BitRecord")
+        return cls._make(cls.layout.unpack_bytes(bytestring))
+
+    @classmethod
+    def unpack_int(cls, value: int):
+        """
+        Returns a new record decoded from an integer bit image
+        """
+        if value.bit_length() > cls.size:
+            raise ValueError(f"{value} is too large for the BitRecord size: {cls.size} bits")
+        return cls._make(cls.layout.unpack(value))
+
+
+@functools.lru_cache(maxsize=None)
+def _builds_without_arguments(cls) -> bool:
+    """
+    Returns whether calling cls with no arguments builds an instance, which pickling a struct or
+    collection as its bit image relies on
+    """
+    try:
+        parameters = inspect.signature(cls).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return all(
+        parameter.default is not parameter.empty or parameter.kind in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD)
+        for parameter in parameters
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _default_shape(cls):
+    """
+    Returns the layout of a BitStruct subclass, or the struct layouts of a BitCollection subclass,
+    built without arguments, or None when it cannot be. Only instances of that shape can be pickled
+    as their class and bit image.
+    """
+    if not _builds_without_arguments(cls):
+        return None
+    instance = cls()
+    if isinstance(instance, BitStruct):
+        return instance.layout
+    return tuple(struct.layout for struct in instance.structs)
+
+
+def _importable(cls) -> bool:
+    """
+    Returns whether pickle can find cls again by its module and qualified name
+    """
+    target = sys.modules.get(cls.__module__)
+    for part in cls.__qualname__.split("."):
+        target = getattr(target, part, None)
+    return target is cls
+
+
+def _rebuild_struct(template, image: int):
+    """
+    Unpickles a BitStruct from its class, or from the layout of a plain BitStruct, and its bit image
+    """
+    if isinstance(template, BitLayout):
+        struct = BitStruct(
+            bitfields=[
+                BitField(size=size, name=name, encoding=codec)
+                for name, size, codec in zip(template.names, template.sizes, template.codecs)
+            ], name=template.name
+        )
+    else:
+        struct = template()
+    struct.from_int(image)
+    return struct
+
+
+def _rebuild_collection(cls, image: int):
+    """
+    Unpickles a BitCollection subclass by calling it without arguments and loading its bit image
+    """
+    collection = cls()
+    collection.from_bin(format(image, f"0{collection.size}b"))
+    return collection
+
+
+class RecordBuffer:
+    """
+    Many records of one type packed into a single buffer, for handing them between processes: a
+    RecordBuffer pickles as one reference to the record type plus the buffer, however many records
+    it holds. Records are decoded again as they are read.
+    """
+
+    def __init__(self, template, data: bytes = b""):
+        """
+        Params:
+            template:   what each record is rebuilt as: a BitStruct subclass or @bitrecord class
+                        which can be built without arguments, or the BitLayout of plain BitStructs
+            data:       the records' bit images, each in layout.byte_size bytes
+        """
+        self.__template = template
+        self.__layout = getattr(template, "layout", template)
+        if isinstance(template, type) and issubclass(template, BitStruct):
+            self.__layout = template().layout
+        self.__width = self.__layout.byte_size
+        if len(data) % self.__width:
+            raise ValueError(f"{len(data)} bytes is not a whole number of {self.__width} byte records")
+        self.__data = bytes(data)
+
+    @classmethod
+    def from_records(cls, records) -> "RecordBuffer":
+        """
+        Packs a sequence of BitStructs or BitRecords of one type
+        """
+        records = list(records)
+        if not records:
+            raise ValueError("At least one record is needed to build a RecordBuffer")
+        first = records[0]
+        template = type(first)
+        if isinstance(first, BitStruct) and _default_shape(template) is not first.layout:
+            template = first.layout
+        width = first.layout.byte_size
+        return cls(template, b"".join([int(record).to_bytes(width, 'big') for record in records]))
+
+    def __reduce__(self):
+        template = self.__template
+        if isinstance(template, type) and issubclass(template, BitStruct) and not _importable(template):
+            template = self.__layout
+        return RecordBuffer, (template, self.__data)
+
+    def __len__(self):
+        return len(self.__data) // self.__width
+
+    def __bytes__(self):
+        return self.__data
+
+    def __getitem__(self, idx: int):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(f"record {idx} is out of range for {len(self)} records")
+        image = int.from_bytes(self.__data[idx * self.__width:(idx + 1) * self.__width], 'big')
+        if isinstance(self.__template, type) and issubclass(self.__template, BitRecord):
+            return self.__template.unpack_int(image)
+        return _rebuild_struct(self.__template, image)
+
+    def __iter__(self):
+        return (self[idx] for idx in range(len(self)))
+
+    @property
+    def layout(self):
+        return self.__layout
+
+    @layout.setter
+    def layout(self, new_value):
+        raise AttributeError("Cannot modify RecordBuffer's layout")
+
+
+def _resolve_annotation(cls, annotation):
+    if isinstance(annotation, str):
+        module = sys.modules.get(cls.__module__)
+        annotation = eval(annotation, vars(module) if module else {}, dict(vars(cls)))
+    return annotation
+
+
+def bitrecord(cls=None, *, name: str = None):
+    """
+    Brief:
+        A class decorator turning a class of Bits annotations into a slotted BitRecord subclass. The
+        layout, its codec, __init__ and the slot accessors are all generated once, here.
+
+    Params:
+        cls:    the class being decorated
+        name:   the struct name used by str() and to_dict(). Defaults to the class name.
+    """
+    def wrap(cls):
+        attrs = []
+        fields = []
+        defaults = {}
+        for attr, annotation in cls.__dict__.get("__annotations__", {}).items():
+            annotation = _resolve_annotation(cls, annotation)
+            if not isinstance(annotation, Bits):
+                raise TypeError(f"{attr} must be annotated with Bits[size], was {annotation!r}")
+            if hasattr(BitRecord, attr):
+                raise ValueError(f"{attr} is reserved by BitRecord and cannot be a field name")
+            attrs.append(attr)
+            fields.append((attr if annotation.name is None else annotation.name, annotation.size, annotation.encoding))
+            if attr in cls.__dict__:
+                defaults[attr] = cls.__dict__[attr]
+
+        namespace = {
+            key: value for key, value in cls.__dict__.items()
+            if key not in ("__dict__", "__weakref__", "__annotations__") and key not in defaults
+        }
+        layout = BitLayout(fields, name=cls.__name__ if name is None else name)
+        params = ", ".join(f"{attr}=defaults.get({attr!r}, 0)" for attr in attrs)
+        source = f"def __init__(self{', ' if params else ''}{params}):\n"
+        source += "".join(f"    self.{attr} = {attr}\n" for attr in attrs) or "    pass\n"
+        source += "def _values(self):\n"
+        source += f"    return ({''.join(f'self.{attr}, ' for attr in attrs)})\n"
+        source += "def _assign(self, values):\n"
+        if attrs:
+            source += f"    {''.join(f'self.{attr}, ' for attr in attrs)}= values\n"
+        else:
+            source += "    pass\n"
+        exec(source, {"defaults": defaults}, namespace)
+
+        namespace["__slots__"] = tuple(attrs)
+        namespace["layout"] = layout
+        namespace["name"] = layout.name
+        namespace["size"] = layout.size
+        namespace["_attrs"] = tuple(attrs)
+        bases = cls.__bases__ if issubclass(cls, BitRecord) else (BitRecord,)
+        return type(cls.__name__, bases, namespace)
+
+    if cls is None:
+        return wrap
+    return wrap(cls)
+
+
+def _record_images(layout, data: bytes, stride: int, bit_offset: int = 0) -> list:
+    """
+    Returns the bit image of every whole record in data, the records `stride` bits apart
+    """
+    if stride < layout.size:
+        raise ValueError(f"stride must be at least the layout size: {layout.size} bits, was {stride}")
+    available = len(data) * 8 - bit_offset
+    count = 0 if available < layout.size else (available - layout.size) // stride + 1
+    if bit_offset % 8 or stride % 8:
+        return [_extract_bits(data, bit_offset + idx * stride, layout.size) for idx in range(count)]
+    view = memoryview(data)
+    start = bit_offset // 8
+    step = stride // 8
+    width = layout.byte_size
+    pad = width * 8 - layout.size
+    from_bytes = int.from_bytes
+    return [from_bytes(view[pos:pos + width], 'big') >> pad for pos in range(start, start + count * step, step)]
+
+
+def _column_typecode(size: int, codec) -> str:
+    """
+    Returns the array.array typecode of a column of decoded values, or None when they are not numbers
+    """
+    if codec is None:
+        return _typecode(size)
+    if isinstance(codec, FieldEncoding):
+        return _typecode(size, codec.signed)
+    if isinstance(codec, (FixedPointEncoding, FloatEncoding)):
+        return "d"
+    return None
+
+
+class BitTable:
+    """
+    A columnar table of decoded records sharing one BitLayout. Each field is held as a single column:
+    a typed array.array for integer and float fields, a list for anything else. Queries work a column
+    at a time and return new tables, so no per-record objects are created until they are asked for.
+    """
+
+    def __init__(self, layout, data: bytes = b"", stride: int = None, bit_offset: int = 0):
+        """
+        Params:
+            layout:     the BitLayout of each record, or a BitStruct/BitRecord holding one
+            data:       the packed records
+            stride:     the distance in bits from the start of one record to the next. Defaults to
+                        the layout's size rounded up to whole bytes.
+            bit_offset: where the first record starts in data
+        """
+        layout = getattr(layout, "layout", layout)
+        self.__layout = layout
+        self.__stride = layout.byte_size * 8 if stride is None else stride
+        raws = _record_images(layout, data, self.__stride, bit_offset)
+        rows = map(layout.unpack, raws)
+        self.__columns = self.__typed(zip(*rows)) if raws else self.__typed([()] * len(layout))
+        self.__length = len(raws)
+
+    def __typed(self, columns) -> tuple:
+        typed = []
+        for values, size, codec in zip(columns, self.__layout.sizes, self.__layout.codecs):
+            code = _column_typecode(size, codec)
+            typed.append(list(values) if code is None else array.array(code, values))
+        return tuple(typed)
+
+    @classmethod
+    def _from_columns(cls, layout, columns, stride: int = None):
+        table = cls(layout, stride=stride)
+        table.__columns = tuple(columns)
+        table.__length = len(columns[0]) if columns else 0
+        return table
+
+    @classmethod
+    def from_structs(cls, structs, stride: int = None):
+        """
+        Returns a table holding the values of a sequence of BitStructs or BitRecords of one layout
+        """
+        structs = list(structs)
+        if not structs:
+            raise ValueError("At least one struct is needed to build a BitTable")
+        table = cls(structs[0], stride=stride)
+        if isinstance(structs[0], BitRecord):
+            rows = [record._values() for record in structs]
+        else:
+            rows = [[field.value for field in struct.fields] for struct in structs]
+        table.__columns = table.__typed(zip(*rows))
+        table.__length = len(rows)
+        return table
+
+    def __len__(self):
+        return self.__length
+
+    def __iter__(self):
+        return zip(*self.__columns)
+
+    def __getitem__(self, item):
+        """
+        Brief:
+            Returns a column by field name, or a row tuple by position
+        """
+        if isinstance(item, str):
+            return self.column(item)
+        return tuple(column[item] for column in self.__columns)
+
+    def column(self, item):
+        """
+        Returns a column by field name, or by field position
+        """
+        if isinstance(item, str):
+            return self.__columns[self.__layout.index[item]]
+        return self.__columns[item]
+
+    def __take(self, positions) -> "BitTable":
+        positions = list(positions)
+        columns = []
+        for column in self.__columns:
+            taken = map(column.__getitem__, positions)
+            columns.append(array.array(column.typecode, taken) if isinstance(column, array.array) else list(taken))
+        return self._from_columns(self.__layout, columns, self.__stride)
+
+    @property
+    def layout(self):
+        return self.__layout
+
+    @layout.setter
+    def layout(self, new_value):
+        raise AttributeError("Cannot modify BitTable's layout")
+
+    @property
+    def stride(self):
+        return self.__stride
+
+    @stride.setter
+    def stride(self, new_value):
+        raise AttributeError("Cannot modify BitTable's stride")
+
+    @property
+    def columns(self):
+        """
+        Each field's column by name. When several fields share a name the first one is returned.
+        """
+        return {name: self.__columns[idx] for name, idx in self.__layout.index.items()}
+
+    @columns.setter
+    def columns(self, new_value):
+        raise AttributeError("Cannot modify BitTable's columns")
+
+    def filter(self, conditions: dict = None, **predicates) -> "BitTable":
+        """
+        Brief:
+            Returns the rows matching every condition. A condition maps a field name to either a
+            value, which matches equal values, or a predicate called with each value.
+
+        Params:
+            conditions: conditions for field names which are not valid keywords
+            predicates: conditions given by keyword
+        """
+        conditions = {**(conditions or {}), **predicates}
+        positions = range(self.__length)
+        for name, condition in conditions.items():
+            column = self[name]
+            if callable(condition):
+                positions = [idx for idx, keep in zip(positions, map(condition, map(column.__getitem__, positions)))
+                             if keep]
+            else:
+                positions = [idx for idx in positions if column[idx] == condition]
+        return self.__take(positions)
+
+    def sort(self, *names: str, reverse: bool = False) -> "BitTable":
+        """
+        Returns the rows ordered by the named fields, the first name deciding first
+        """
+        positions = range(self.__length)
+        # stable sorts from the last key to the first, each keyed straight off a column
+        for name in reversed(names):
+            positions = sorted(positions, key=self[name].__getitem__, reverse=reverse)
+        return self.__take(positions)
+
+    def group_count(self, *names: str) -> collections.Counter:
+        """
+        Returns the number of rows for each value of a field, or for each tuple of values of several
+        """
+        if len(names) == 1:
+            return collections.Counter(self[names[0]])
+        return collections.Counter(zip(*(self[name] for name in names)))
+
+    def group_by(self, *names: str) -> dict:
+        """
+        Returns a table of the matching rows for each value (or tuple of values) of the named fields
+        """
+        keys = self[names[0]] if len(names) == 1 else list(zip(*(self[name] for name in names)))
+        groups = {}
+        for idx, key in enumerate(keys):
+            groups.setdefault(key, []).append(idx)
+        return {key: self.__take(positions) for key, positions in groups.items()}
+
+    def min(self, name: str):
+        return min(self[name])
+
+    def max(self, name: str):
+        return max(self[name])
+
+    def histogram(self, name: str, bins: int = 10) -> tuple:
+        """
+        Brief:
+            Counts a numeric field's values in `bins` equal width bins spanning its min to max
+
+        Returns:
+            (edges, counts) where bin i counts values from edges[i] up to edges[i + 1], the last
+            bin including its upper edge
+        """
+        column = self[name]
+        if not column:
+            return [], []
+        low = min(column)
+        high = max(column)
+        width = (high - low) / bins or 1
+        last = bins - 1
+        counts = collections.Counter([min(int((value - low) / width), last) for value in column])
+        return [low + width * idx for idx in range(bins + 1)], [counts[idx] for idx in range(bins)]
+
+    def to_bytes(self) -> bytes:
+        """
+        Packs every row back into records `stride` bits apart
+        """
+        pack = self.__layout.pack
+        pad = self.__stride - self.__layout.size
+        if not self.__stride % 8:
+            width = self.__stride // 8
+            return b"".join([(pack(row) << pad).to_bytes(width, 'big') for row in self])
+        binstr = "".join([format(pack(row) << pad, f"0{self.__stride}b") for row in self])
+        binstr += "0" * (-len(binstr) % 8)
+        return int(binstr or "0", 2).to_bytes(len(binstr) // 8, 'big')
+
+    def to_struct(self, idx: int, struct_type=None):
+        """
+        Returns row idx as a new struct: an instance of struct_type, which must be a BitStruct
+        subclass or @bitrecord class with this layout, or a plain BitStruct when not given
+        """
+        row = self[idx]
+        if struct_type is None:
+            layout = self.__layout
+            return BitStruct(
+                bitfields=[
+                    BitField(size=size, name=name, value=value, encoding=codec)
+                    for name, size, codec, value in zip(layout.names, layout.sizes, layout.codecs, row)
+                ], name=layout.name
+            )
+        if isinstance(struct_type, type) and issubclass(struct_type, BitRecord):
+            return struct_type._make(row)
+        struct = struct_type()
+        struct.from_int(self.__layout.pack(row))
+        return struct
+
+    def to_structs(self, struct_type=None) -> list:
+        """
+        Returns every row as a new struct, see to_struct
+        """
+        return [self.to_struct(idx, struct_type) for idx in range(self.__length)]
+
+
+class SharedColumns:
+    """
+    Decoded columns of a capture held in one multiprocessing.shared_memory block, so that several
+    processes can read them without decoding or copying. The block starts with a description of the
+    layout and columns, so attaching only needs its name. Numeric fields hold their decoded values;
+    other fields, such as enums, hold their raw codes and are decoded on request with decoded().
+    """
+    __HEADER = struct.Struct("<Q")
+
+    def __init__(self, block, owner: bool):
+        """
+        Use SharedColumns.create or SharedColumns.attach rather than building one directly
+        """
+        self.__block = block
+        self.__owner = owner
+        self.__views = []
+        (length,) = self.__HEADER.unpack_from(block.buf)
+        info = pickle.loads(bytes(block.buf[self.__HEADER.size:self.__HEADER.size + length]))
+        self.__layout = info["layout"]
+        self.__length = info["count"]
+        # (typecode, offset into the block, holds raw codes) for each field
+        start = self.__data_start(length)
+        self.__columns = [(code, start + offset, raw) for code, offset, raw in info["columns"]]
+
+    @classmethod
+    def __data_start(cls, info_length: int) -> int:
+        # the columns start at the first multiple of 8 bytes after the description
+        return -(-(cls.__HEADER.size + info_length) // 8) * 8
+
+    @classmethod
+    def create(cls, layout, data: bytes, stride: int = None, bit_offset: int = 0, name: str = None):
+        """
+        Brief:
+            Decodes every record of data into a new shared memory block. The creator unlinks the
+            block once every process is done with it.
+
+        Params:
+            layout:     the BitLayout of each record, or a BitStruct/BitRecord holding one
+            data:       the packed records
+            stride:     the distance in bits between records. Defaults to the layout's size rounded
+                        up to whole bytes.
+            bit_offset: where the first record starts in data
+            name:       the name of the block, chosen by the system when not given
+        """
+        layout = getattr(layout, "layout", layout)
+        stride = layout.byte_size * 8 if stride is None else stride
+        raws = _record_images(layout, data, stride, bit_offset)
+        columns = []
+        arrays = []
+        offset = 0
+        for shift, size, codec in zip(layout.shifts, layout.sizes, layout.codecs):
+            mask = (1 << size) - 1
+            values = [(raw >> shift) & mask for raw in raws]
+            code = _column_typecode(size, codec)
+            raw = code is None
+            if raw:
+                # shared as raw codes, decoded by whoever reads them
+                code = _typecode(size)
+                if code is None:
+                    raise ValueError(f"fields wider than 64 bits cannot be shared, was {size} bits")
+            elif codec is not None:
+                values = codec.take(values) if hasattr(codec, "take") else map(codec.decode, values)
+            column = array.array(code, values)
+            columns.append((code, offset, raw))
+            arrays.append(column)
+            offset += -(-len(column) * column.itemsize // 8) * 8
+        info = pickle.dumps({"layout": layout, "count": len(raws), "columns": columns})
+        start = cls.__data_start(len(info))
+        block = shared_memory.SharedMemory(name=name, create=True, size=max(start + offset, 1))
+        cls.__HEADER.pack_into(block.buf, 0, len(info))
+        block.buf[cls.__HEADER.size:cls.__HEADER.size + len(info)] = info
+        for (_, column_offset, _), column in zip(columns, arrays):
+            packed = column.tobytes()
+            block.buf[start + column_offset:start + column_offset + len(packed)] = packed
+        return cls(block, owner=True)
+
+    @classmethod
+    def attach(cls, name: str):
+        """
+        Opens the columns another process created, without copying them. The attaching processes
+        should be started by the creator through multiprocessing, so that they share its resource
+        tracker and leave freeing the block to it.
+        """
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        if self.__owner:
+            self.unlink()
+
+    def __len__(self):
+        return self.__length
+
+    def __getitem__(self, item):
+        return self.column(item)
+
+    @property
+    def name(self):
+        return self.__block.name
+
+    @name.setter
+    def name(self, new_value):
+        raise AttributeError("Cannot modify SharedColumns' name")
+
+    @property
+    def layout(self):
+        return self.__layout
+
+    @layout.setter
+    def layout(self, new_value):
+        raise AttributeError("Cannot modify SharedColumns' layout")
+
+    def column(self, item):
+        """
+        Returns a field's column, by name or position, as a typed memoryview into shared memory.
+        Fields which are not numbers hold their raw codes, see decoded.
+        """
+        idx = self.__layout.index[item] if isinstance(item, str) else item
+        code, offset, _ = self.__columns[idx]
+        itemsize = array.array(code).itemsize
+        view = self.__block.buf[offset:offset + self.__length * itemsize].cast(code)
+        self.__views.append(view)
+        return view
+
+    def decoded(self, item) -> list:
+        """
+        Returns a field's decoded values, decoding the raw codes of fields which are not numbers
+        """
+        idx = self.__layout.index[item] if isinstance(item, str) else item
+        column = self.column(idx)
+        codec = self.__layout.codecs[idx]
+        if not self.__columns[idx][2]:
+            return column.tolist()
+        if hasattr(codec, "take"):
+            return codec.take(column)
+        return list(map(codec.decode, column))
+
+    def close(self):
+        """
+        Detaches this process from the block. Columns handed out earlier are released.
+        """
+        for view in self.__views:
+            view.release()
+        self.__views = []
+        self.__block.close()
+
+    def unlink(self):
+        """
+        Frees the block once every process has closed it. Only the creator should call this.
+        """
+        self.__block.unlink()
 
-        for struct in self.structs:
-            struct.from_bin(binstring[:struct.size])
-            binstring = binstring[struct.size:]
 
-    def from_bytes(self, bytestring: bytes):
-        if len(bytestring) < self.size // 8:
-            raise ValueError("Not enough bytes to fill the BitCollection")
+def _stable_bytes(value) -> bytes:
+    """
+    Returns bytes identifying value which are the same in every process, unlike hash() of a str
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return b"b" + bytes(value)
+    if isinstance(value, str):
+        return b"s" + value.encode()
+    if isinstance(value, enum.Enum):
+        return f"e{type(value).__qualname__}.{value.name}".encode()
+    if isinstance(value, float):
+        return b"f" + struct.pack(">d", value)
+    if isinstance(value, int):
+        return f"i{value}".encode()
+    if isinstance(value, array.array):
+        return value.typecode.encode() + value.tobytes()
+    if isinstance(value, (BitStruct, BitCollection, BitRecord)):
+        return f"r{type(value).__qualname__}:{int(value)}".encode()
+    return b"o" + repr(value).encode()
 
-        data = Biterator(bytestring)
-        available_bins = next(data)
 
-        for struct in self.structs:
-            while len(available_bins) < struct.size:
-                available_bins += next(data)
-            struct.from_bin(available_bins[:struct.size])
-            available_bins = available_bins[struct.size:]
+def _mix64(value) -> int:
+    """
+    Returns a well spread 64 bit hash of value which is the same in every process. Ints of up to
+    64 bits go through the splitmix64 finalizer; anything else is hashed with blake2b.
+    """
+    if type(value) is not int or value.bit_length() > 64:
+        return int.from_bytes(hashlib.blake2b(_stable_bytes(value), digest_size=8).digest(), 'big')
+    value &= 0xFFFFFFFFFFFFFFFF
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return value ^ (value >> 31)
 
 
-class FlitStruct(BitCollection):
+class FieldStats:
+    """
+    Running statistics for one field, in constant memory: count, min, max and mean for numeric
+    fields, an exact histogram for fields of at most `histogram_bits` bits, and a k minimum values
+    sketch estimating the number of distinct values of larger fields.
+    """
 
-    def __init__(self, bitstructs: list[BitStruct], name: str = ""):
-        super().__init__(bitstructs=bitstructs, name=name)
-        if self.size != 128:
-            raise ValueError(f"FlitStructs MUST be 128 bits, was {self.size}")
+    def __init__(self, name: str, size: int, histogram_bits: int = 8, sketch_size: int = 1024):
+        self.name = name
+        self.size = size
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.total = 0
+        self.numeric = True
+        self.sketch_size = sketch_size
+        self.histogram = collections.Counter() if size <= histogram_bits else None
+        # the sketch_size smallest distinct hashes, negated so heap[0] is the largest of them
+        self.__heap = []
+        self.__hashes = set()
+
+    @property
+    def mean(self):
+        if not self.count or not self.numeric:
+            return None
+        return self.total / self.count
+
+    @property
+    def distinct(self) -> int:
+        """
+        The number of distinct values seen: exact for histogram fields and below sketch_size values,
+        estimated beyond that
+        """
+        if self.histogram is not None:
+            return len(self.histogram)
+        if len(self.__heap) < self.sketch_size:
+            return len(self.__heap)
+        return round((self.sketch_size - 1) * (1 << 64) / -self.__heap[0])
+
+    def __add_hashes(self, hashes):
+        heap = self.__heap
+        seen = self.__hashes
+        for hashed in hashes:
+            if hashed in seen:
+                continue
+            if len(heap) < self.sketch_size:
+                heapq.heappush(heap, -hashed)
+                seen.add(hashed)
+            elif hashed < -heap[0]:
+                seen.discard(-heapq.heapreplace(heap, -hashed))
+                seen.add(hashed)
+
+    def update(self, column):
+        """
+        Adds a column of values to the statistics
+        """
+        if not len(column):
+            return
+        self.count += len(column)
+        if self.numeric and isinstance(column, array.array):
+            low = min(column)
+            high = max(column)
+            self.min = low if self.min is None else min(self.min, low)
+            self.max = high if self.max is None else max(self.max, high)
+            self.total += sum(column)
+        else:
+            self.numeric = False
+        if self.histogram is not None:
+            self.histogram.update(column)
+        else:
+            try:
+                unique = set(column)
+            except TypeError:
+                # an ArrayField's values are arrays, which cannot be hashed
+                unique = column
+            self.__add_hashes(map(_mix64, unique))
+
+    def merge(self, other: "FieldStats"):
+        """
+        Folds in the statistics of the same field gathered elsewhere, such as another process
+        """
+        self.count += other.count
+        self.numeric = self.numeric and other.numeric
+        for bound, pick in (("min", min), ("max", max)):
+            mine, theirs = getattr(self, bound), getattr(other, bound)
+            setattr(self, bound, theirs if mine is None else mine if theirs is None else pick(mine, theirs))
+        self.total += other.total
+        if self.histogram is not None:
+            self.histogram.update(other.histogram)
+        else:
+            self.__add_hashes(-hashed for hashed in other.__heap)
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "min": self.min if self.numeric else None,
+            "max": self.max if self.numeric else None,
+            "mean": self.mean,
+            "distinct": self.distinct,
+            "histogram": None if self.histogram is None else dict(self.histogram)
+        }
+
+
+class FieldAggregator:
+    """
+    Gathers FieldStats for every field of a layout over a stream of fixed-stride records, a chunk
+    at a time. Each chunk is decoded into a BitTable and folded in column by column, so memory use
+    depends on the chunk size, not the length of the stream.
+    """
+
+    def __init__(self, layout, stride: int = None, histogram_bits: int = 8, sketch_size: int = 1024):
+        """
+        Params:
+            layout:         the BitLayout of each record, or a BitStruct/BitRecord holding one
+            stride:         the distance in bits between records, a whole number of bytes.
+                            Defaults to the layout's size rounded up to whole bytes.
+            histogram_bits: fields of at most this many bits keep an exact histogram
+            sketch_size:    the number of hashes kept to estimate the distinct values of larger fields
+        """
+        self.__layout = getattr(layout, "layout", layout)
+        self.__stride = self.__layout.byte_size * 8 if stride is None else stride
+        if self.__stride % 8:
+            raise ValueError(f"streamed records must be a whole number of bytes apart, was {self.__stride} bits")
+        self.__fields = [
+            FieldStats(name, size, histogram_bits, sketch_size)
+            for name, size in zip(self.__layout.names, self.__layout.sizes)
+        ]
+        self.__pending = b""
+
+    def __getitem__(self, item):
+        """
+        Brief:
+            Returns a field's FieldStats by position, or by name
+        """
+        if isinstance(item, str):
+            return self.__fields[self.__layout.index[item]]
+        return self.__fields[item]
+
+    @property
+    def fields(self):
+        return self.__fields
+
+    @fields.setter
+    def fields(self, new_value):
+        raise AttributeError("Cannot modify FieldAggregator's fields")
+
+    @property
+    def records(self):
+        return self.__fields[0].count if self.__fields else 0
+
+    @property
+    def pending(self):
+        """
+        The bytes of a trailing partial record, kept until the next chunk completes it
+        """
+        return len(self.__pending)
+
+    def update(self, data: bytes):
+        """
+        Adds every whole record in data, keeping a trailing partial record for the next call
+        """
+        if self.__pending:
+            data = self.__pending + data
+        step = self.__stride // 8
+        usable = len(data) // step * step
+        if usable < self.__layout.byte_size:
+            self.__pending = bytes(data)
+            return
+        table = BitTable(self.__layout, memoryview(data)[:usable], stride=self.__stride)
+        for idx, stats in enumerate(self.__fields):
+            stats.update(table.column(idx))
+        self.__pending = bytes(data[usable:])
+
+    def update_stream(self, stream, chunk_size: int = 1 << 20):
+        """
+        Params:
+            stream:     any object with a read(n) method returning bytes
+            chunk_size: the number of bytes read per call
+        """
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                return
+            self.update(chunk)
+
+    def merge(self, other: "FieldAggregator"):
+        """
+        Folds in the statistics another aggregator gathered over the same layout
+        """
+        for stats, others in zip(self.__fields, other.fields):
+            stats.merge(others)
+
+    def to_dict(self):
+        return {self.__layout.name: {stats.name: stats.to_dict() for stats in self.__fields}}
+
+
+RecordDiff = collections.namedtuple("RecordDiff", "index fields")
+RecordDiff.__doc__ = """
+A record which differs between two captures: its position, and {field name: (old value, new value)}
+for each differing field. Records only present on one side have None for the missing values.
+"""
+
+
+def _unique_names(names) -> list:
+    """
+    Returns names with each repeated one numbered by its occurrence: "name[0]", "name[1]" and so on
+    """
+    counts = collections.Counter(names)
+    seen = collections.Counter()
+    unique = []
+    for name in names:
+        if counts[name] > 1:
+            unique.append(f"{name}[{seen[name]}]")
+            seen[name] += 1
+        else:
+            unique.append(name)
+    return unique
+
+
+def _diff_layout(source) -> BitLayout:
+    """
+    Returns the layout of a BitLayout, BitStruct, BitRecord or BitCollection. A collection's fields
+    are named "struct name.field name". Repeated names are numbered, "P[0].x" and "P[1].x", so
+    every field has a name of its own.
+    """
+    if isinstance(source, BitCollection):
+        struct_names = _unique_names([struct.name for struct in source.structs])
+        fields = [
+            (f"{struct_name}.{field.name}", field.size, field.encoding)
+            for struct_name, struct in zip(struct_names, source.structs) for field in struct.fields
+        ]
+        name = source.name
+    else:
+        layout = getattr(source, "layout", source)
+        if len(set(layout.names)) == len(layout.names):
+            return layout
+        fields = list(zip(layout.names, layout.sizes, layout.codecs))
+        name = layout.name
+    names = _unique_names([field[0] for field in fields])
+    return BitLayout.of([(unique,) + field[1:] for unique, field in zip(names, fields)], name=name)
+
+
+def _iter_chunks(source, size: int):
+    """
+    Yields successive `size` byte chunks of a bytes-like object, or of a binary file object
+    """
+    if hasattr(source, "read"):
+        while True:
+            chunk = source.read(size)
+            if not chunk:
+                return
+            # pipes and sockets can return fewer bytes than asked for before they end
+            while len(chunk) < size:
+                more = source.read(size - len(chunk))
+                if not more:
+                    break
+                chunk += more
+            yield memoryview(chunk)
+    view = memoryview(source)
+    for start in range(0, len(view), size):
+        yield view[start:start + size]
+
+
+def _decode_or_raw(codec, raw: int):
+    """
+    Returns the field value the codec decodes from raw, or raw itself when the codec rejects it
+    """
+    try:
+        return codec.decode(raw)
+    except ValueError:
+        return raw
+
+
+def bit_diff(layout, old, new, stride: int = None, chunk_records: int = 4096):
+    """
+    Brief:
+        A generator yielding a RecordDiff for each record which differs between two captures of
+        the same layout. Each chunk of records is compared with one memory comparison; chunks that
+        differ are XORed as a whole, and only the fields under non-zero bits of the mask are decoded.
+        Values a field's codec rejects, such as unknown enum codes, are reported as their raw bits.
+
+    Params:
+        layout:         a BitLayout, or a BitStruct, BitRecord or BitCollection with the shape of each record
+        old:            the first capture, as a bytes-like object or binary file
+        new:            the second capture, as a bytes-like object or binary file
+        stride:         the distance in bits between records, a whole number of bytes. Defaults to
+                        the layout's size rounded up to whole bytes.
+        chunk_records:  the number of records compared at a time
+    """
+    layout = _diff_layout(layout)
+    stride = layout.byte_size * 8 if stride is None else stride
+    if stride % 8 or stride < layout.size:
+        raise ValueError(f"compared records must be a whole number of bytes apart, was {stride} bits")
+    step = stride // 8
+    width = layout.byte_size
+    pad = width * 8 - layout.size
+    fields = list(zip(layout.names, layout.shifts, layout.sizes, layout.codecs))
+    nonzero = re.compile(rb"[^\x00]")
+    from_bytes = int.from_bytes
+    chunk_size = step * chunk_records
+    index = 0
+    empty = memoryview(b"")
+    for old_chunk, new_chunk in itertools.zip_longest(
+            _iter_chunks(old, chunk_size), _iter_chunks(new, chunk_size), fillvalue=empty):
+        common = min(len(old_chunk), len(new_chunk))
+        shared = (common - width) // step + 1 if common >= width else 0
+        if old_chunk[:common] != new_chunk[:common]:
+            xor = from_bytes(old_chunk[:common], 'big') ^ from_bytes(new_chunk[:common], 'big')
+            xor = xor.to_bytes(common, 'big')
+            match = nonzero.search(xor)
+            while match is not None and match.start() // step < shared:
+                record = match.start() // step
+                start = record * step
+                mask = from_bytes(xor[start:start + width], 'big') >> pad
+                if mask:
+                    old_raw = from_bytes(old_chunk[start:start + width], 'big') >> pad
+                    new_raw = from_bytes(new_chunk[start:start + width], 'big') >> pad
+                    changed = {}
+                    for name, shift, size, codec in fields:
+                        field_mask = (1 << size) - 1
+                        if (mask >> shift) & field_mask:
+                            old_value = (old_raw >> shift) & field_mask
+                            new_value = (new_raw >> shift) & field_mask
+                            if codec is not None:
+                                old_value = _decode_or_raw(codec, old_value)
+                                new_value = _decode_or_raw(codec, new_value)
+                            changed[name] = (old_value, new_value)
+                    yield RecordDiff(index + record, changed)
+                match = nonzero.search(xor, start + step)
+        # the records only one capture holds
+        longer = old_chunk if len(old_chunk) > common else new_chunk
+        for record in range(shared, (len(longer) - width) // step + 1):
+            data = longer[record * step:record * step + width]
+            try:
+                values = layout.unpack_bytes(data)
+            except ValueError:
+                raw = from_bytes(data, 'big') >> pad
+                values = [
+                    (raw >> shift) & ((1 << size) - 1) if codec is None else
+                    _decode_or_raw(codec, (raw >> shift) & ((1 << size) - 1))
+                    for _, shift, size, codec in fields
+                ]
+            changed = {}
+            for name, value in zip(layout.names, values):
+                changed[name] = (value, None) if longer is old_chunk else (None, value)
+            yield RecordDiff(index + record, changed)
+        index += chunk_records
+
+
+def dedupe_records(layout, data: bytes, stride: int = None, seen: set = None) -> tuple:
+    """
+    Brief:
+        Drops repeated records from a buffer without decoding them: each record's bytes are the key.
+        Pass the same `seen` set to successive calls to dedupe a stream a chunk at a time.
+
+    Params:
+        layout: a BitLayout, or a BitStruct or BitRecord with the shape of each record
+        data:   the packed records
+        stride: the distance in bits between records, a whole number of bytes. Defaults to the
+                layout's size rounded up to whole bytes.
+        seen:   the keys of records already seen, updated in place
+
+    Returns:
+        (the first occurrence of every record, packed back to back, the indexes of the dropped records)
+    """
+    layout = getattr(layout, "layout", layout)
+    stride = layout.byte_size * 8 if stride is None else stride
+    if stride % 8 or stride < layout.size:
+        raise ValueError(f"deduped records must be a whole number of bytes apart, was {stride} bits")
+    step = stride // 8
+    width = layout.byte_size
+    pad = width * 8 - layout.size
+    data = bytes(data)
+    seen = set() if seen is None else seen
+    unique = []
+    duplicates = []
+    for idx, start in enumerate(range(0, len(data) - width + 1, step)):
+        key = data[start:start + width]
+        if pad:
+            # bits past the end of the record are not part of it
+            key = int.from_bytes(key, 'big') >> pad
+        if key in seen:
+            duplicates.append(idx)
+        else:
+            seen.add(key)
+            unique.append(data[start:start + step])
+    return b"".join(unique), duplicates
+
+
+def _record_checksums(source) -> tuple:
+    """
+    Returns (crc, size, shift, start, end) for each checksum of a BitStruct or BitCollection in the
+    order they are filled, with every position counted across the whole record
+    """
+    if isinstance(source, BitStruct):
+        return tuple(
+            (field.crc, field.size, shift, start, end)
+            for field, shift, start, end in _checksum_positions(source.fields, 0, source.size, "struct")
+        )
+    if not isinstance(source, BitCollection):
+        return ()
+    checksums = []
+    offset = 0
+    for struct in source.structs:
+        tail = source.size - offset - struct.size
+        for field, shift, start, end in _checksum_positions(struct.fields, 0, struct.size, "struct"):
+            checksums.append((field.crc, field.size, shift + tail, start + offset, end + offset))
+        offset += struct.size
+    offset = 0
+    for struct in source.structs:
+        for field, shift, start, end in _checksum_positions(struct.fields, offset, source.size, "collection"):
+            checksums.append((field.crc, field.size, shift, start, end))
+        offset += struct.size
+    return tuple(checksums)
+
+
+def _read_column(data, start: int, nbytes: int, width: int) -> list:
+    """
+    Returns the `nbytes` byte big endian value found `start` bytes into every `width` byte record
+    """
+    count = len(data) // width
+    typecode = _typecode(nbytes * 8)
+    if typecode is None:
+        return [int.from_bytes(data[pos:pos + nbytes], 'big') for pos in range(start, count * width, width)]
+    itemsize = array.array(typecode).itemsize
+    planes = bytearray(count * itemsize)
+    for idx in range(nbytes):
+        planes[itemsize - nbytes + idx::itemsize] = data[start + idx::width][:count]
+    column = array.array(typecode)
+    column.frombytes(planes)
+    if sys.byteorder == "little":
+        column.byteswap()
+    return column
+
+
+def _write_column(out: bytearray, raws, start: int, nbytes: int, width: int):
+    """
+    Writes a column of `nbytes` byte values into every `width` byte record of out, `start` bytes in
+    """
+    typecode = _typecode(nbytes * 8)
+    if typecode is None:
+        itemsize = nbytes
+        column = b"".join(raw.to_bytes(nbytes, 'big') for raw in raws)
+    else:
+        itemsize = array.array(typecode).itemsize
+        column = array.array(typecode, raws)
+        if sys.byteorder == "little":
+            column.byteswap()
+        column = column.tobytes()
+    for idx in range(nbytes):
+        out[start + idx::width] = column[itemsize - nbytes + idx::itemsize]
+
+
+class TrafficGenerator:
+    """
+    Generates random records for a layout straight into packed bytes, for load testing consumers.
+    No struct is built: fields without constraints are filled a whole buffer at a time from random
+    bytes, and drawn fields are written a column at a time. Every record is valid: enum fields only
+    hold known codes, nested structs are generated recursively and checksums are filled in.
+    """
+
+    def __init__(self, source, seed=None, distributions: dict = None):
+        """
+        Params:
+            source:         a BitLayout, BitStruct, BitCollection or FlitStruct, or a BitStruct
+                            subclass or @bitrecord class. A collection's fields are named
+                            "struct name.field name", with repeated names numbered as in bit_diff.
+            seed:           seeds the generator, so the same seed always generates the same bytes
+            distributions:  {field name: values} to control a field: either a sequence of values,
+                            drawn uniformly, or a callable taking (random.Random, count) and
+                            returning `count` values
+        """
+        if isinstance(source, type) and issubclass(source, BitStruct):
+            source = source()
+        self.__layout = layout = _diff_layout(source)
+        self.__checksums = _record_checksums(source)
+        self.__random = random.Random(seed)
+        self.__width = layout.byte_size
+        pad = self.__width * 8 - layout.size
+        # clears the bits past the end of each record's last byte
+        self.__pad_table = bytes(byte & (0xFF << pad) & 0xFF for byte in range(256)) if pad else None
+        distributions = {} if distributions is None else distributions
+        for name in distributions:
+            if name not in layout.names:
+                raise ValueError(f"{name} is not a field of {layout.name}")
+        checksummed = {shift for _, _, shift, _, _ in self.__checksums}
+        # fields whose values are drawn, rather than left as random bits: (offset, size, shift, draw)
+        self.__drawn = []
+        for name, size, shift, codec in zip(layout.names, layout.sizes, layout.shifts, layout.codecs):
+            if name in distributions:
+                draw = self.__distribution(name, size, codec, distributions[name])
+            elif shift in checksummed:
+                continue
+            elif isinstance(codec, EnumEncoding) and size <= 8:
+                # random bytes mapped onto the codes, so every code comes up within 1/256 as often
+                codes = sorted(codec.members)
+                draw = functools.partial(self.__translate, bytes(codes[byte % len(codes)] for byte in range(256)))
+            elif isinstance(codec, EnumEncoding):
+                draw = functools.partial(self.__choose, tuple(sorted(codec.members)))
+            elif isinstance(codec, StructEncoding):
+                draw = TrafficGenerator(codec.struct_type, seed=self.__random.getrandbits(64)).generate_images
+            else:
+                continue
+            self.__drawn.append((layout.size - shift - size, size, shift, draw))
+
+    def __choose(self, population, count: int) -> list:
+        return self.__random.choices(population, k=count)
+
+    def __translate(self, table: bytes, count: int) -> bytes:
+        return self.__random.randbytes(count).translate(table)
+
+    def __distribution(self, name: str, size: int, codec, distribution):
+        def draw(count):
+            if callable(distribution):
+                values = distribution(self.__random, count)
+            else:
+                values = self.__random.choices(distribution, k=count)
+            raws = list(values) if codec is None else list(map(codec.encode, values))
+            for raw in (min(raws, default=0), max(raws, default=0)):
+                if raw < 0:
+                    raise ValueError(f"{name}: {raw} is too small for the field size: {size} bits")
+                if raw >> size:
+                    raise ValueError(f"{name}: {raw} is too large for the field size: {size} bits")
+            return raws
+        return draw
+
+    @property
+    def layout(self):
+        return self.__layout
+
+    @layout.setter
+    def layout(self, new_value):
+        raise AttributeError("Cannot modify TrafficGenerator's layout")
+
+    def generate(self, count: int) -> bytes:
+        """
+        Returns `count` records packed back to back, each in layout.byte_size bytes. Successive calls
+        continue the same random stream.
+        """
+        width = self.__width
+        out = bytearray(self.__random.randbytes(count * width))
+        if self.__pad_table is not None:
+            out[width - 1::width] = out[width - 1::width].translate(self.__pad_table)
+        for offset, size, shift, draw in self.__drawn:
+            raws = draw(count)
+            first = offset // 8
+            nbytes = (offset + size + 7) // 8 - first
+            if not (offset % 8 or size % 8):
+                _write_column(out, raws, first, nbytes, width)
+                continue
+            # the bytes the field straddles are read back a column at a time and merged with it
+            shift = nbytes * 8 - offset % 8 - size
+            keep = ~(((1 << size) - 1) << shift)
+            spans = _read_column(out, first, nbytes, width)
+            merged = [(span & keep) | (raw << shift) for span, raw in zip(spans, raws)]
+            _write_column(out, merged, first, nbytes, width)
+        for crc, size, shift, start, end in self.__checksums:
+            offset = self.__layout.size - shift - size
+            if not (offset % 8 or size % 8 or start % 8 or end % 8):
+                with memoryview(out) as view:
+                    values = crc.compute_many(
+                        view[base + start // 8:base + end // 8] for base in range(0, len(out), width)
+                    )
+                _write_column(out, values, offset // 8, size // 8, width)
+                continue
+            images = self.__images(out)
+            keep = ~(((1 << size) - 1) << shift)
+            tail = self.__layout.size - end
+            span = (1 << (end - start)) - 1
+            self.__store(out, [
+                (image & keep) | (crc.compute_bits((image >> tail) & span, end - start) << shift)
+                for image in images
+            ])
+        return bytes(out)
+
+    def generate_images(self, count: int) -> list:
+        """
+        Returns `count` records as bit image ints
+        """
+        return self.__images(self.generate(count))
+
+    def write(self, stream, count: int, chunk_records: int = 65536) -> int:
+        """
+        Writes `count` records to a binary stream, `chunk_records` at a time. Returns the bytes written.
+        """
+        written = 0
+        while count > 0:
+            chunk = self.generate(min(count, chunk_records))
+            stream.write(chunk)
+            written += len(chunk)
+            count -= chunk_records
+        return written
+
+    def __images(self, data) -> list:
+        return _record_images(self.__layout, data, self.__width * 8)
+
+    def __store(self, out: bytearray, images: list):
+        width = self.__width
+        pad = width * 8 - self.__layout.size
+        out[:] = b"".join((image << pad).to_bytes(width, 'big') for image in images)
+
+
+class DecodeStats:
+    """
+    Counters describing how much of a corrupt input a ResilientDecoder had to throw away
+    """
+
+    def __init__(self):
+        self.frames = 0
+        self.skipped_bits = 0
+        self.errors = collections.Counter()
+
+    def __str__(self):
+        return f"frames: {self.frames}\tskipped bits: {self.skipped_bits}\terrors: {dict(self.errors)}"
+
+    @property
+    def skipped_bytes(self):
+        return self.skipped_bits // 8
+
+    def to_dict(self):
+        return {
+            "frames": self.frames,
+            "skipped_bytes": self.skipped_bytes,
+            "skipped_bits": self.skipped_bits,
+            "errors": dict(self.errors)
+        }
+
+
+class ResilientDecoder:
+    """
+    Decodes a run of BitStructs out of data which may be corrupt. Rather than raising on the
+    first bad frame it skips forward to the next frame boundary and keeps count of what was lost.
+
+    Error reasons:
+        sync:       bits were skipped while searching for the next sync word
+        validation: a frame failed the validator
+        checksum:   a frame's stored checksum did not match its data
+        decode:     a frame held a value its fields cannot decode, such as an unknown enum code
+        short:      the data ended part way through a frame
+    """
+
+    def __init__(self, struct_type, sync=None, validator=None, frame_size: int = None, resync_step: int = 8):
+        """
+        Params:
+            struct_type:    a callable, usually a BitStruct subclass, returning an empty BitStruct
+            sync:           an optional BitPattern found at the start of every frame
+            validator:      an optional callable taking a populated BitStruct. Returning a falsy
+                            value or raising ValueError rejects the frame.
+            frame_size:     the number of bits between the starts of consecutive frames. Defaults
+                            to the struct's size rounded up to a whole byte.
+            resync_step:    the number of bits to move forward after a rejected frame when there is
+                            no sync word to search for
+        """
+        self.__struct_type = struct_type
+        self.__struct_size = struct_type().size
+        if sync is not None and not isinstance(sync, BitPattern):
+            sync = BitPattern(sync)
+        self.__sync = sync
+        self.__validator = validator
+        if frame_size is None:
+            frame_size = -(-self.__struct_size // 8) * 8
+        if frame_size < self.__struct_size:
+            raise ValueError(f"frame_size must hold the {self.__struct_size} bit struct, was {frame_size}")
+        self.__frame_size = frame_size
+        self.__resync_step = resync_step
+        self.__stats = DecodeStats()
+        self.__lost = False
+
+    @property
+    def stats(self):
+        return self.__stats
+
+    @stats.setter
+    def stats(self, new_value):
+        raise AttributeError("Cannot modify ResilientDecoder's stats")
+
+    def __is_valid(self, struct):
+        if self.__validator is None:
+            return True
+        try:
+            return bool(self.__validator(struct))
+        except ValueError:
+            return False
+
+    def __lose_sync(self):
+        if not self.__lost:
+            self.__lost = True
+            self.__stats.errors["sync"] += 1
+
+    def __scan(self, data, pos: int, final: bool):
+        """
+        Brief:
+            Yields every valid frame in data from bit offset pos onwards, and returns the bit offset
+            from which decoding should resume once more data is available. Everything before that
+            offset has either been decoded or counted as skipped.
+        """
+        stats = self.__stats
+        sync = self.__sync
+        struct_size = self.__struct_size
+        total = len(data) * 8
+        mark = pos
+        # a single lazy search shared across the whole buffer keeps resynchronization linear
+        hits = None
+        while True:
+            if sync is not None:
+                if pos + sync.size <= total and _extract_bits(data, pos, sync.size) == sync.value:
+                    found = pos
+                else:
+                    if hits is None:
+                        hits = sync.iter_find(data, pos)
+                    found = next((hit for hit in hits if hit >= pos), -1)
+                if found == -1:
+                    keep = total if final else max(pos, total - sync.size + 1)
+                    if keep > pos:
+                        self.__lose_sync()
+                    stats.skipped_bits += keep - mark
+                    return keep
+                if found > pos:
+                    self.__lose_sync()
+                pos = found
+
+            if pos + struct_size > total:
+                if not final:
+                    stats.skipped_bits += pos - mark
+                    return pos
+                if total > pos:
+                    stats.errors["short"] += 1
+                stats.skipped_bits += total - mark
+                return total
+
+            struct = self.__struct_type()
+            try:
+                struct.from_int(_extract_bits(data, pos, struct_size))
+                reason = None if self.__is_valid(struct) else "validation"
+            except ChecksumError:
+                reason = "checksum"
+            except ValueError:
+                reason = "decode"
+            if reason is not None:
+                stats.errors[reason] += 1
+                self.__lost = True
+                pos += 1 if sync is not None else self.__resync_step
+                continue
+
+            self.__lost = False
+            stats.skipped_bits += pos - mark
+            stats.frames += 1
+            yield struct
+            pos += self.__frame_size
+            mark = pos
+
+    def decode(self, data: bytes):
+        """
+        A generator yielding every valid frame within a complete buffer
+        """
+        yield from self.__scan(data, 0, True)
+
+    def decode_stream(self, stream, chunk_size: int = 1 << 16):
+        """
+        Brief:
+            A generator yielding every valid frame within a binary stream
+
+        Params:
+            stream:     any object with a read(n) method returning bytes
+            chunk_size: the number of bytes read per call
+        """
+        buffer = b""
+        pos = 0
+        while True:
+            chunk = stream.read(chunk_size)
+            final = not chunk
+            buffer += chunk
+            pos = yield from self.__scan(buffer, pos, final)
+            if final:
+                return
+            drop = pos // 8
+            buffer = buffer[drop:]
+            pos -= drop * 8
+
+
+SCHEMA_CACHE_VERSION = 3
+_COLLECTION_TYPES = {"BitCollection": BitCollection, "FlitStruct": FlitStruct}
+_SCHEMA_ENCODING_KEYS = ("signed", "byteorder", "bit_order")
+
+
+def _class_name(name: str) -> str:
+    return re.sub(r"\W", "_", name) or "_"
+
+
+def _compile_schema(schema: dict) -> dict:
+    """
+    Brief:
+        Validates a schema and flattens it into plain tables of names and sizes
+
+    Params:
+        schema: the decoded JSON document. It has the form:
+            {
+                "structs": {
+                    "<struct name>": [{"name": "<field name>", "size": <bits>, **encoding}, ...]
+                },
+            where the optional encoding keys are "signed", "byteorder" and "bit_order" as on BitField.
+                "collections": {
+                    "<collection name>": {"type": "BitCollection" | "FlitStruct", "structs": ["<struct name>", ...]}
+                }
+            }
+    """
+    if not isinstance(schema, dict):
+        raise ValueError("A schema must be a JSON object")
+    for key in ("structs", "collections"):
+        if not isinstance(schema.get(key, {}), dict):
+            raise ValueError(f"A schema's {key} must be a JSON object")
+
+    structs = {}
+    for struct_name, fields in schema.get("structs", {}).items():
+        if not isinstance(fields, list) or not fields:
+            raise ValueError(f"Struct {struct_name} must have a list of fields")
+        table = []
+        for field in fields:
+            field_name = field.get("name", "") if isinstance(field, dict) else None
+            size = field.get("size") if isinstance(field, dict) else None
+            if not isinstance(field_name, str) or type(size) is not int or size < 1:
+                raise ValueError(f"Struct {struct_name} has an invalid field: {field}")
+            options = tuple(sorted((key, value) for key, value in field.items() if key in _SCHEMA_ENCODING_KEYS))
+            unknown = set(field) - {"name", "size"} - set(_SCHEMA_ENCODING_KEYS)
+            if unknown:
+                raise ValueError(f"Struct {struct_name} field {field_name} has unknown keys: {sorted(unknown)}")
+            _field_encoding(size, **dict(options))
+            table.append((field_name, size, options))
+        structs[struct_name] = tuple(table)
+
+    collections_ = {}
+    for collection_name, collection in schema.get("collections", {}).items():
+        if not isinstance(collection, dict):
+            raise ValueError(f"Collection {collection_name} must be a JSON object")
+        kind = collection.get("type", "BitCollection")
+        if not isinstance(kind, str) or kind not in _COLLECTION_TYPES:
+            raise ValueError(f"Collection {collection_name} has an unknown type: {kind}")
+        members = collection.get("structs", [])
+        if not isinstance(members, list):
+            raise ValueError(f"Collection {collection_name} must have a list of structs")
+        for member in members:
+            if not isinstance(member, str) or member not in structs:
+                raise ValueError(f"Collection {collection_name} refers to an unknown struct: {member}")
+        size = sum(sum(field[1] for field in structs[member]) for member in members)
+        if kind == "FlitStruct" and size != 128:
+            raise ValueError(f"FlitStructs MUST be 128 bits, {collection_name} was {size}")
+        collections_[collection_name] = (kind, tuple(members))
+
+    return {"structs": structs, "collections": collections_}
+
+
+def _build_schema(tables: dict) -> dict:
+    """
+    Brief:
+        Turns compiled schema tables into BitStruct and BitCollection subclasses which, like the
+        hand written ones, take no arguments to instantiate.
+    """
+    classes = {}
+    for struct_name, table in tables["structs"].items():
+        def __init__(self, _table=table, _name=struct_name):
+            BitStruct.__init__(
+                self,
+                bitfields=[
+                    BitField(size=size, name=field_name, **dict(options)) for field_name, size, options in _table
+                ],
+                name=_name
+            )
+        classes[struct_name] = type(_class_name(struct_name), (BitStruct,), {"__init__": __init__})
+
+    for collection_name, (kind, members) in tables["collections"].items():
+        member_classes = tuple(classes[member] for member in members)
+
+        def __init__(self, _members=member_classes, _name=collection_name, _base=_COLLECTION_TYPES[kind]):
+            _base.__init__(self, bitstructs=[member() for member in _members], name=_name)
+        classes[collection_name] = type(
+            _class_name(collection_name), (_COLLECTION_TYPES[kind],), {"__init__": __init__}
+        )
+    return classes
+
+
+def load_schema(path: str, cache_dir: str = None) -> dict:
+    """
+    Brief:
+        Reads a JSON schema file and returns a dict of generated struct and collection classes,
+        keyed by name.
+
+    Params:
+        path:       the JSON schema file
+        cache_dir:  an optional directory of compiled schemas. Entries are keyed by the hash of the
+                    schema file, so a changed file is always recompiled. Each entry holds the
+                    validated tables and the compiled pack/unpack code of every struct, marshalled
+                    like a __pycache__ entry, so the directory must be as trusted as the code itself.
+    """
+    with open(path, "rb") as schema_file:
+        raw = schema_file.read()
+
+    entry = None
+    cache_path = None
+    if cache_dir is not None:
+        digest = hashlib.sha256(raw).hexdigest()
+        # marshalled code only loads in the interpreter version which wrote it
+        cache_name = f"{digest}.{sys.implementation.cache_tag}.v{SCHEMA_CACHE_VERSION}.bitschema"
+        cache_path = os.path.join(cache_dir, cache_name)
+        try:
+            with open(cache_path, "rb") as cache_file:
+                entry = _read_schema_entry(cache_file.read())
+        except OSError:
+            entry = None
+
+    if entry is not None:
+        tables, codes = entry
+        _CODEC_CODE.update(codes)
+        return _build_schema(tables)
+
+    tables = _compile_schema(json.loads(raw))
+    classes = _build_schema(tables)
+    if cache_path is not None:
+        sources = [cls().layout.source for cls in classes.values() if issubclass(cls, BitStruct)]
+        codes = {source: _CODEC_CODE[source] for source in sources}
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as cache_file:
+            cache_file.write(marshal.dumps((tables, codes)))
+        os.replace(temp_path, cache_path)
+    return classes
+
+
+def _read_schema_entry(data: bytes):
+    """
+    Returns the (tables, codes) held by a schema cache entry, or None when it is unreadable
+    """
+    try:
+        entry = marshal.loads(data)
+    except (EOFError, ValueError, TypeError):
+        return None
+    if not (isinstance(entry, tuple) and len(entry) == 2 and isinstance(entry[1], dict)):
+        return None
+    tables, codes = entry
+    if not (isinstance(tables, dict) and tables.keys() == {"structs", "collections"}):
+        return None
+    if not all(isinstance(source, str) and isinstance(code, types.CodeType) for source, code in codes.items()):
+        return None
+    return tables, codes
+
+
+# the codec entry points which instrumentation wraps. Classmethods are wrapped as classmethods.
+_INSTRUMENTED_METHODS = [
+    (BitStruct, ("from_bytes", "from_bin", "from_int", "__bytes__")),
+    (BitCollection, ("from_bytes", "from_bin", "__bytes__")),
+    (BitRecord, ("from_bytes", "from_bin", "from_int", "__bytes__", "unpack", "unpack_int"))
+]
+_instrumentation_originals = {}
+_instrumentation_counters = {}
+
+
+def _layout_key(obj) -> str:
+    """
+    Instrumentation is kept per class. Plain BitStructs and BitCollections are told apart by name.
+    """
+    cls = obj if isinstance(obj, type) else type(obj)
+    if cls in (BitStruct, BitCollection, FlitStruct) and obj.name:
+        return f"{cls.__name__}:{obj.name}"
+    return cls.__qualname__
+
+
+def _instrument(method, operation: str):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (_layout_key(self), operation)
+        counters = _instrumentation_counters.get(key)
+        if counters is None:
+            counters = _instrumentation_counters[key] = {"calls": 0, "bytes": 0, "failures": 0, "seconds": 0.0}
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        except ValueError:
+            counters["failures"] += 1
+            raise
+        finally:
+            counters["seconds"] += time.perf_counter() - start
+            counters["calls"] += 1
+            counters["bytes"] += (self.size + 7) // 8
+    return wrapper
+
+
+def enable_instrumentation():
+    """
+    Brief:
+        Starts counting calls, bytes processed, ValueError failures and cumulative time for every
+        decode and encode, per layout. While disabled the original methods are in place, so
+        instrumentation costs nothing. Time spent in a collection includes the time of its structs.
+    """
+    if _instrumentation_originals:
+        return
+    for cls, names in _INSTRUMENTED_METHODS:
+        for name in names:
+            original = cls.__dict__[name]
+            _instrumentation_originals[(cls, name)] = original
+            operation = name.strip("_")
+            if isinstance(original, classmethod):
+                setattr(cls, name, classmethod(_instrument(original.__func__, operation)))
+            else:
+                setattr(cls, name, _instrument(original, operation))
+
+
+def disable_instrumentation():
+    """
+    Restores the uninstrumented methods. Counters are kept until reset_instrumentation.
+    """
+    for (cls, name), original in _instrumentation_originals.items():
+        setattr(cls, name, original)
+    _instrumentation_originals.clear()
+
+
+def instrumentation_enabled() -> bool:
+    return bool(_instrumentation_originals)
+
+
+def reset_instrumentation():
+    _instrumentation_counters.clear()
+
+
+def instrumentation_snapshot() -> dict:
+    """
+    Returns a copy of the counters in the form {layout: {operation: {calls, bytes, failures, seconds}}}
+    """
+    snapshot = {}
+    for (key, operation), counters in _instrumentation_counters.items():
+        snapshot.setdefault(key, {})[operation] = dict(counters)
+    return snapshot
+
+
+# referents which belong to the interpreter or the class, never to an individual record
+_UNOWNED_TYPES = (
+    type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+    types.CodeType, types.MemberDescriptorType, types.GetSetDescriptorType, type(None), bool
+)
+# shared by every field or struct using them, along with their lookup tables
+_SHARED_TYPES = (
+    BitLayout, FieldEncoding, EnumEncoding, FixedPointEncoding, FloatEncoding, ArrayEncoding, StructEncoding, Crc
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _dict_size(entries: int) -> int:
+    return sys.getsizeof(dict.fromkeys(range(entries)))
+
+
+def memory_footprint(obj, include_shared: bool = False) -> dict:
+    """
+    Brief:
+        Reports the memory held by a BitField, BitStruct, BitCollection, BitRecord or any container
+        of them (such as a list of decoded records). Every object reachable from obj is counted
+        once, so field names and values shared between records are only paid for once.
+
+        Instance dictionaries are not materialized to be measured; each is estimated as a dict
+        with the same number of entries.
+
+    Params:
+        obj:            the object to measure
+        include_shared: also count the BitLayouts, encodings and Crcs, which are shared by every
+                        field and struct using them
+
+    Returns:
+        {"bytes": total bytes, "objects": object count, "by_type": {type name: bytes}}
+    """
+    seen = set()
+    pending = [obj]
+    total = 0
+    by_type = collections.Counter()
+    while pending:
+        current = pending.pop()
+        if id(current) in seen or isinstance(current, _UNOWNED_TYPES):
+            continue
+        if not include_shared and isinstance(current, _SHARED_TYPES):
+            continue
+        # small ints are cached by the interpreter
+        if type(current) is int and -5 <= current <= 256:
+            continue
+        seen.add(id(current))
+        size = sys.getsizeof(current)
+        referents = gc.get_referents(current)
+        if hasattr(current, "__dict__") and not isinstance(current, dict):
+            size += _dict_size(len(referents) - 1)
+        total += size
+        by_type[type(current).__name__] += size
+        pending.extend(referents)
+    return {"bytes": total, "objects": len(seen), "by_type": dict(by_type)}
@@ -0,0 +1,556 @@
+"""
+Throughput benchmarks for every codec path in BitS, run across the layouts used by the unit tests.
+
+    python bit_struct_benchmarks.py --output bench.json
+    python bit_struct_benchmarks.py --hot-paths --save-baseline baseline.json
+    python bit_struct_benchmarks.py --hot-paths --compare baseline.json
+    python bit_struct_benchmarks.py --memory 100000
+    python -m pytest -m benchmark
+"""
+# Python imports
+import argparse
+import json
+import math
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+# External Dependencies
+import pytest
+
+# Package imports
+from BitS import (
+    Biterator,
+    BitPattern,
+    BitCollection,
+    FlitStruct,
+    ResilientDecoder
+)
+from bit_struct_tests import (
+    CHECKERBOARD_BYTES,
+    BYTE_ALIGNED_32BIT_STRUCT,
+    NON_BYTE_ALIGNED_27BIT_STRUCT,
+    OVERLAPPING_BOUNDARY_STRUCT,
+    EIGHT_BIT_STRUCT,
+    TEN_BIT_STRUCT,
+    FIFTEEN_BIT_STRUCT,
+    TWENTY_BIT_STRUCT,
+    THIRTY_BIT_STRUCT,
+    FOURTY_BIT_STRUCT,
+    BYTE_ALIGNED_32BIT_RECORD,
+    NON_BYTE_ALIGNED_27BIT_RECORD,
+    OVERLAPPING_BOUNDARY_RECORD
+)
+
+STRUCT_LAYOUTS = [BYTE_ALIGNED_32BIT_STRUCT, NON_BYTE_ALIGNED_27BIT_STRUCT, OVERLAPPING_BOUNDARY_STRUCT]
+RECORD_LAYOUTS = [BYTE_ALIGNED_32BIT_RECORD, NON_BYTE_ALIGNED_27BIT_RECORD, OVERLAPPING_BOUNDARY_RECORD]
+COLLECTION_MEMBERS = [
+    EIGHT_BIT_STRUCT, TEN_BIT_STRUCT, FIFTEEN_BIT_STRUCT, TWENTY_BIT_STRUCT, THIRTY_BIT_STRUCT, FOURTY_BIT_STRUCT
+]
+FLIT_MEMBERS = [EIGHT_BIT_STRUCT, FOURTY_BIT_STRUCT, FOURTY_BIT_STRUCT, FOURTY_BIT_STRUCT]
+
+DEFAULT_SIZES = [1, 100, 10_000, 100_000]
+HOT_PATHS = [
+    "BitStruct.from_bytes",
+    "BitStruct.from_bin",
+    "BitStruct.__bytes__",
+    "BitCollection.from_bytes",
+    "BitCollection.from_bin",
+    "BitCollection.__bytes__"
+]
+DEFAULT_THRESHOLD = 0.25
+
+
+class Case:
+    """
+    A single benchmark: a callable which processes `records` records totalling `nbytes` bytes
+    """
+
+    def __init__(self, path: str, layout: str, records: int, nbytes: int, func):
+        self.path = path
+        self.layout = layout
+        self.records = records
+        self.nbytes = nbytes
+        self.func = func
+
+    def __str__(self):
+        return f"{self.path}[{self.layout}]x{self.records}"
+
+
+def payload(nbytes: int) -> bytes:
+    """
+    Returns nbytes of checkerboard test data
+    """
+    repeats, rem = divmod(nbytes, len(CHECKERBOARD_BYTES))
+    return bytes(CHECKERBOARD_BYTES) * repeats + bytes(CHECKERBOARD_BYTES[:rem])
+
+
+def byte_size(bits: int) -> int:
+    return (bits + 7) // 8
+
+
+def biterator_cases(count: int):
+    data = payload(count)
+
+    def run():
+        for _ in Biterator(data):
+            pass
+    yield Case("Biterator", "bytes", count, count, run)
+
+
+def bitfield_cases(count: int):
+    for layout in STRUCT_LAYOUTS:
+        fields = list(layout())
+        nbytes = sum(byte_size(field.size) for field in fields) * count
+
+        def run(fields=fields):
+            for _ in range(count):
+                for field in fields:
+                    field.to_bin()
+        yield Case("BitField.to_bin", layout.__name__, count * len(fields), nbytes, run)
+
+
+def bitstruct_cases(count: int):
+    for layout in STRUCT_LAYOUTS:
+        bitstruct = layout()
+        data = payload(byte_size(bitstruct.size))
+        bins = "".join(Biterator(data))
+        nbytes = byte_size(bitstruct.size) * count
+
+        def from_bytes(bitstruct=bitstruct, data=data):
+            for _ in range(count):
+                bitstruct.from_bytes(data)
+
+        def from_bin(bitstruct=bitstruct, bins=bins):
+            for _ in range(count):
+                bitstruct.from_bin(bins)
+
+        def to_bytes(bitstruct=bitstruct, field=bitstruct.fields[0]):
+            # rewriting a field drops the cached image, so every call packs the struct
+            for _ in range(count):
+                field.raw = field.raw
+                bytes(bitstruct)
+
+        def to_bytes_cached(bitstruct=bitstruct):
+            for _ in range(count):
+                bytes(bitstruct)
+
+        yield Case("BitStruct.from_bytes", layout.__name__, count, nbytes, from_bytes)
+        yield Case("BitStruct.from_bin", layout.__name__, count, nbytes, from_bin)
+        yield Case("BitStruct.__bytes__", layout.__name__, count, nbytes, to_bytes)
+        yield Case("BitStruct.__bytes__ cached", layout.__name__, count, nbytes, to_bytes_cached)
+
+
+def bitrecord_cases(count: int):
+    for layout in RECORD_LAYOUTS:
+        data = payload(layout.layout.byte_size)
+        record = layout.unpack(data)
+        nbytes = layout.layout.byte_size * count
+
+        def unpack(layout=layout, data=data):
+            for _ in range(count):
+                layout.unpack(data)
+
+        def to_bytes(record=record):
+            for _ in range(count):
+                bytes(record)
+
+        yield Case("BitRecord.unpack", layout.__name__, count, nbytes, unpack)
+        yield Case("BitRecord.__bytes__", layout.__name__, count, nbytes, to_bytes)
+
+
+def bitcollection_cases(count: int):
+    collection = BitCollection(
+        bitstructs=[COLLECTION_MEMBERS[idx % len(COLLECTION_MEMBERS)]() for idx in range(count)], name="Benchmark"
+    )
+    data = payload(byte_size(collection.size))
+    bins = "".join(Biterator(data))
+
+    def from_bytes():
+        collection.from_bytes(data)
+
+    def from_bin():
+        collection.from_bin(bins)
+
+    def to_bytes(field=collection.structs[0].fields[0]):
+        field.raw = field.raw
+        bytes(collection)
+
+    def to_bytes_cached():
+        bytes(collection)
+
+    yield Case("BitCollection.from_bytes", "mixed", count, len(data), from_bytes)
+    yield Case("BitCollection.from_bin", "mixed", count, len(data), from_bin)
+    yield Case("BitCollection.__bytes__", "mixed", count, len(data), to_bytes)
+    yield Case("BitCollection.__bytes__ cached", "mixed", count, len(data), to_bytes_cached)
+
+
+def flitstruct_cases(count: int):
+    flit = FlitStruct(bitstructs=[member() for member in FLIT_MEMBERS], name="Benchmark Flit")
+    data = payload(16)
+
+    def from_bytes():
+        for _ in range(count):
+            flit.from_bytes(data)
+
+    def to_bytes(field=flit.structs[0].fields[0]):
+        for _ in range(count):
+            field.raw = field.raw
+            bytes(flit)
+
+    def to_bytes_cached():
+        for _ in range(count):
+            bytes(flit)
+
+    yield Case("FlitStruct.from_bytes", "flit", count, 16 * count, from_bytes)
+    yield Case("FlitStruct.__bytes__", "flit", count, 16 * count, to_bytes)
+    yield Case("FlitStruct.__bytes__ cached", "flit", count, 16 * count, to_bytes_cached)
+
+
+def bitpattern_cases(count: int):
+    data = payload(count * 4)
+    pattern = BitPattern(0x6A956, 20)
+
+    def find_all():
+        pattern.find_all(data)
+    yield Case("BitPattern.find_all", "20bit", count, len(data), find_all)
+
+
+def resilient_decoder_cases(count: int):
+    for layout in STRUCT_LAYOUTS:
+        frame_bytes = byte_size(layout().size)
+        data = payload(frame_bytes * count)
+        decoder = ResilientDecoder(layout)
+
+        def decode(decoder=decoder, data=data):
+            for _ in decoder.decode(data):
+                pass
+        yield Case("ResilientDecoder.decode", layout.__name__, count, len(data), decode)
+
+
+CASE_FACTORIES = [
+    biterator_cases,
+    bitfield_cases,
+    bitstruct_cases,
+    bitrecord_cases,
+    bitcollection_cases,
+    flitstruct_cases,
+    bitpattern_cases,
+    resilient_decoder_cases
+]
+
+
+def iter_cases(sizes, path_filter: str = "", paths=None):
+    for factory in CASE_FACTORIES:
+        for count in sizes:
+            for case in factory(count):
+                if path_filter in case.path and (paths is None or case.path in paths):
+                    yield case
+
+
+def measure(case: Case, repeat: int = 5, min_time: float = 0.02) -> dict:
+    """
+    Brief:
+        Runs a case `repeat` times and reports its timings and throughput. Fast cases are looped
+        so that every timed run lasts at least min_time, and each timing is the time per loop.
+        Throughput is computed from the median run.
+    """
+    start = time.perf_counter()
+    case.func()
+    loops = max(1, math.ceil(min_time / max(time.perf_counter() - start, 1e-9)))
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            case.func()
+        timings.append((time.perf_counter() - start) / loops)
+    median = statistics.median(timings)
+    if len(timings) > 1:
+        lower, _, upper = statistics.quantiles(timings, n=4, method="inclusive")
+    else:
+        lower = upper = median
+    return {
+        "path": case.path,
+        "layout": case.layout,
+        "records": case.records,
+        "bytes": case.nbytes,
+        "timings": timings,
+        "median_seconds": median,
+        "min_seconds": min(timings),
+        "iqr_seconds": upper - lower,
+        "records_per_sec": case.records / median if median else float("inf"),
+        "bytes_per_sec": case.nbytes / median if median else float("inf")
+    }
+
+
+def run(sizes=DEFAULT_SIZES, repeat: int = 5, max_seconds: float = 10.0, path_filter: str = "", paths=None) -> dict:
+    """
+    Brief:
+        Benchmarks every case and returns a JSON serializable report.
+
+    Params:
+        sizes:          the record / struct counts to run every path at
+        repeat:         the number of timed runs per case
+        max_seconds:    once a path and layout takes longer than this for one run, its larger
+                        sizes are recorded as skipped rather than run
+        path_filter:    only run paths containing this string
+        paths:          only run these exact paths
+    """
+    results = []
+    too_slow = set()
+    for case in iter_cases(sorted(sizes), path_filter, paths):
+        key = (case.path, case.layout)
+        if key in too_slow:
+            results.append({"path": case.path, "layout": case.layout, "records": case.records, "skipped": True})
+            continue
+        result = measure(case, repeat)
+        if max(result["timings"]) > max_seconds:
+            too_slow.add(key)
+        results.append(result)
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "results": results
+    }
+
+
+def decode_representations(struct_type, record_type, count: int) -> dict:
+    """
+    Returns a builder per representation, each decoding `count` records into a list of that representation
+    """
+    record_bytes = record_type.layout.byte_size
+    data = payload(record_bytes * count)
+    spans = [(idx * record_bytes, (idx + 1) * record_bytes) for idx in range(count)]
+
+    def bitstructs():
+        structs = []
+        for start, end in spans:
+            bitstruct = struct_type()
+            bitstruct.from_bytes(data[start:end])
+            structs.append(bitstruct)
+        return structs
+
+    def bitrecords():
+        return [record_type.unpack(data[start:end]) for start, end in spans]
+
+    def tuples():
+        return [record_type.layout.unpack_bytes(data[start:end]) for start, end in spans]
+
+    def raw():
+        return bytearray(data)
+
+    return {"BitStruct": bitstructs, "BitRecord": bitrecords, "tuple": tuples, "bytes": raw}
+
+
+def measure_memory(builder, count: int) -> dict:
+    """
+    Brief:
+        Uses tracemalloc to measure the peak memory of building `count` decoded records, and the
+        memory still held by the result afterwards.
+    """
+    tracemalloc.start()
+    try:
+        tracemalloc.clear_traces()
+        result = builder()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return {
+        "records": count,
+        "peak_bytes": peak,
+        "retained_bytes": retained,
+        "bytes_per_record": retained / count if count else 0.0
+    }
+
+
+def run_memory(count: int) -> dict:
+    """
+    Reports the memory cost of decoding `count` records of every test layout into every representation
+    """
+    results = []
+    for struct_type, record_type in zip(STRUCT_LAYOUTS, RECORD_LAYOUTS):
+        for representation, builder in decode_representations(struct_type, record_type, count).items():
+            result = measure_memory(builder, count)
+            result.update(layout=struct_type.__name__, representation=representation)
+            results.append(result)
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "results": results
+    }
+
+
+def _result_key(result: dict) -> tuple:
+    return result["path"], result["layout"], result["records"]
+
+
+def compare(report: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list[dict]:
+    """
+    Brief:
+        Compares a report against a baseline report, case by case. A case has regressed when its
+        median run is slower than the baseline median by more than `threshold` (as a fraction)
+        AND by more than the spread of the two runs (the sum of their interquartile ranges), so
+        that a noisy machine does not fail the comparison on its own.
+
+    Returns:
+        One row per case present in both reports, with a status of "regressed", "improved" or "ok"
+    """
+    previous = {_result_key(result): result for result in baseline["results"] if not result.get("skipped")}
+    rows = []
+    for result in report["results"]:
+        if result.get("skipped"):
+            continue
+        old = previous.get(_result_key(result))
+        if old is None:
+            continue
+        old_median = old["median_seconds"]
+        new_median = result["median_seconds"]
+        noise = old.get("iqr_seconds", 0.0) + result.get("iqr_seconds", 0.0)
+        allowed = max(old_median * threshold, noise)
+        if new_median - old_median > allowed:
+            status = "regressed"
+        elif old_median - new_median > allowed:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append({
+            "path": result["path"],
+            "layout": result["layout"],
+            "records": result["records"],
+            "baseline_records_per_sec": old["records_per_sec"],
+            "records_per_sec": result["records_per_sec"],
+            "change": old_median / new_median - 1 if new_median else float("inf"),
+            "status": status
+        })
+    return rows
+
+
+def format_comparison(rows: list[dict]) -> str:
+    """
+    Returns a table of compared cases, with regressions listed first
+    """
+    order = {"regressed": 0, "improved": 1, "ok": 2}
+    lines = [f"{'status':<10}{'path':<28}{'layout':<32}{'records':>9}{'baseline/s':>14}{'current/s':>14}{'change':>9}"]
+    for row in sorted(rows, key=lambda row: order[row["status"]]):
+        lines.append(
+            f"{row['status']:<10}{row['path']:<28}{row['layout']:<32}{row['records']:>9}"
+            f"{row['baseline_records_per_sec']:>14.0f}{row['records_per_sec']:>14.0f}{row['change']:>+9.1%}"
+        )
+    regressed = sum(row["status"] == "regressed" for row in rows)
+    lines.append(f"{regressed} of {len(rows)} cases regressed")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every codec path in BitS")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=10.0)
+    parser.add_argument("--filter", default="", help="only run paths containing this string")
+    parser.add_argument("--hot-paths", action="store_true", help="only run the BitStruct / BitCollection hot paths")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--save-baseline", help="write the JSON report here as the new baseline")
+    parser.add_argument("--compare", help="compare against this baseline and fail on regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="the fractional slowdown which counts as a regression")
+    parser.add_argument("--memory", type=int, metavar="N",
+                        help="instead of timing, report the memory used to decode N records per representation")
+    args = parser.parse_args(argv)
+
+    if args.memory is not None:
+        report = run_memory(args.memory)
+        if args.output:
+            with open(args.output, "w") as output:
+                json.dump(report, output, indent=2)
+        else:
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        return 0
+
+    report = run(args.sizes, args.repeat, args.max_seconds, args.filter, HOT_PATHS if args.hot_paths else None)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as output:
+                json.dump(report, output, indent=2)
+    if not (args.output or args.save_baseline or args.compare):
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        rows = compare(report, baseline, args.threshold)
+        print(format_comparison(rows))
+        if any(row["status"] == "regressed" for row in rows):
+            return 1
+    return 0
+
+
+# ============================= Benchmark Tests =============================
+@pytest.mark.benchmark
+@pytest.mark.parametrize("case", list(iter_cases([1, 1000])), ids=str)
+def test_benchmark(case):
+    result = measure(case, repeat=3, min_time=0)
+    assert result["records_per_sec"] > 0
+    assert result["bytes_per_sec"] > 0
+    json.dumps(result)
+
+
+def fake_report(medians, iqr=0.0):
+    return {
+        "results": [
+            {
+                "path": "BitStruct.from_bytes", "layout": layout, "records": 100, "median_seconds": median,
+                "iqr_seconds": iqr, "records_per_sec": 100 / median
+            } for layout, median in medians.items()
+        ]
+    }
+
+
+@pytest.mark.parametrize(
+    "baseline, current, expected", [
+        # 3x slower
+        (fake_report({"A": 1.0}), fake_report({"A": 3.0}), ["regressed"]),
+        # within the threshold
+        (fake_report({"A": 1.0}), fake_report({"A": 1.2}), ["ok"]),
+        # faster
+        (fake_report({"A": 1.0}), fake_report({"A": 0.5}), ["improved"]),
+        # slower, but no more than the measurements are noisy
+        (fake_report({"A": 1.0}, iqr=0.5), fake_report({"A": 1.8}, iqr=0.5), ["ok"]),
+        # cases missing from the baseline are not compared
+        (fake_report({"A": 1.0}), fake_report({"A": 1.0, "B": 9.0}), ["ok"])
+    ]
+)
+def test_compare_against_baseline(baseline, current, expected):
+    rows = compare(current, baseline, threshold=0.25)
+    assert [row["status"] for row in rows] == expected
+    assert f"{expected.count('regressed')} of {len(rows)} cases regressed" in format_comparison(rows)
+
+
+def test_baseline_round_trip(tmp_path):
+    baseline = str(tmp_path / "baseline.json")
+    args = ["--sizes", "1", "--repeat", "3", "--filter", "BitStruct.from_bytes"]
+    assert main(args + ["--save-baseline", baseline]) == 0
+    with open(baseline) as baseline_file:
+        results = json.load(baseline_file)["results"]
+    assert len(results) == len(STRUCT_LAYOUTS)
+    assert all(result["iqr_seconds"] >= 0 for result in results)
+    # an absurdly loose threshold cannot regress
+    assert main(args + ["--compare", baseline, "--threshold", "1000"]) == 0
+
+
+def test_memory_per_representation():
+    results = {result["representation"]: result for result in run_memory(200)["results"][:4]}
+    assert results["BitStruct"]["bytes_per_record"] > results["BitRecord"]["bytes_per_record"]
+    assert results["BitRecord"]["bytes_per_record"] > results["bytes"]["bytes_per_record"]
+    assert all(result["peak_bytes"] >= result["retained_bytes"] for result in results.values())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
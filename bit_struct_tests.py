@@ -1,13 +1,67 @@
+# Python imports
+import array
+import enum
+import io
+import json
+import multiprocessing
+import pickle
+import zlib
+
 # External Dependencies
 import pytest
 
 # Package imports
+import BitS
 from BitS import (
     Biterator,
+    BitPattern,
     BitField,
     BitStruct,
     BitCollection,
-    FlitStruct
+    FlitStruct,
+    ResilientDecoder,
+    Bits,
+    BitLayout,
+    BitRecord,
+    bitrecord,
+    load_schema,
+    enable_instrumentation,
+    disable_instrumentation,
+    instrumentation_enabled,
+    instrumentation_snapshot,
+    reset_instrumentation,
+    memory_footprint,
+    FieldEncoding,
+    EnumEncoding,
+    EnumField,
+    FixedPointEncoding,
+    FixedPointField,
+    FloatEncoding,
+    FloatField,
+    ArrayEncoding,
+    ArrayField,
+    StructEncoding,
+    StructField,
+    PayloadField,
+    VarBitStruct,
+    Crc,
+    CRC16_CCITT,
+    CRC16_XMODEM,
+    CRC16_ARC,
+    CRC32,
+    ChecksumField,
+    ChecksumError,
+    BitTable,
+    FieldStats,
+    FieldAggregator,
+    bit_diff,
+    RecordDiff,
+    dedupe_records,
+    DecodeCache,
+    RecordBuffer,
+    SharedColumns,
+    BitWriter,
+    TrafficGenerator
 )
 
 # Test Data
@@ -147,6 +201,215 @@ class FOURTY_BIT_STRUCT(BitStruct):
         )
 
 
+class SYNC_FRAME_STRUCT(BitStruct):
+    def __init__(self):
+        super().__init__(
+            bitfields=[
+                BitField(size=16, name="Sync"),
+                BitField(size=8, name="Payload"),
+                BitField(size=8, name="Check")
+            ], name="Sync Frame"
+        )
+
+
+class ENCODED_48BIT_STRUCT(BitStruct):
+    def __init__(self):
+        super().__init__(
+            bitfields=[
+                BitField(size=12, name="Temperature", signed=True),
+                BitField(size=16, name="Counter", byteorder="little"),
+                BitField(size=4, name="Flags", bit_order="lsb"),
+                BitField(size=16, name="Offset", signed=True, byteorder="little")
+            ], name="Encoded 48bit Struct"
+        )
+
+
+@bitrecord(name="Encoded 48bit Struct")
+class ENCODED_48BIT_RECORD:
+    temperature: Bits(12, "Temperature", signed=True)
+    counter: Bits(16, "Counter", byteorder="little")
+    flags: Bits(4, "Flags", bit_order="lsb")
+    offset: Bits(16, "Offset", signed=True, byteorder="little")
+
+
+# Temperature: -2 | Counter: 0x1234 stored 34 12 | Flags: 0b0001 stored 1000 | Offset: -300 stored D4 FE
+ENCODED_48BIT_BYTES = bytes.fromhex("FFE3412" + "8" + "D4FE")
+ENCODED_48BIT_VALUES = (-2, 0x1234, 1, -300)
+
+
+class MODE(enum.Enum):
+    IDLE = 0
+    RUN = 1
+    FAULT = 3
+
+
+class ENUM_16BIT_STRUCT(BitStruct):
+    def __init__(self):
+        super().__init__(
+            bitfields=[
+                EnumField(size=2, table=MODE, name="Mode"),
+                EnumField(size=3, table={0: "off", 1: "low", 2: "high"}, name="Power", unknown="raw"),
+                EnumField(size=3, table=["red", "green", "blue"], name="Color", unknown="default", default="unknown"),
+                BitField(size=8, name="Payload")
+            ], name="Enum 16bit Struct"
+        )
+
+
+class SENSOR_72BIT_STRUCT(BitStruct):
+    def __init__(self):
+        super().__init__(
+            bitfields=[
+                FixedPointField(size=12, scale=0.0625, name="Temperature", signed=True),
+                FixedPointField(size=12, scale=0.5, offset=-40.0, name="Humidity"),
+                FloatField(size=16, name="Pressure"),
+                FloatField(size=32, name="Altitude")
+            ], name="Sensor 72bit Struct"
+        )
+
+
+# Temperature: -2.5 stored FD8 | Humidity: 21.0 stored 07A | Pressure: 1.5 stored 3E00 | Altitude: 100.25 stored 42C88000
+SENSOR_72BIT_BYTES = bytes.fromhex("FD807A3E0042C88000")
+SENSOR_72BIT_VALUES = (-2.5, 21.0, 1.5, 100.25)
+
+
+class ADC_136BIT_STRUCT(BitStruct):
+    def __init__(self):
+        super().__init__(
+            bitfields=[
+                StructField(BYTE_ALIGNED_32BIT_STRUCT, name="Header"),
+                BitField(size=4, name="Channel"),
+                ArrayField(count=8, width=12, name="Samples"),
+                BitField(size=4, name="Flags")
+            ], name="ADC 136bit Struct"
+        )
+
+
+# Header: 12 34 5678 | Channel: 3 | Samples: 001 002 003 7FF 800 FFF 000 ABC | Flags: F
+ADC_136BIT_BYTES = bytes.fromhex("12345678" + "3" + "0010020037FF800FFF000ABC" + "F")
+ADC_136BIT_SAMPLES = [0x001, 0x002, 0x003, 0x7FF, 0x800, 0xFFF, 0x000, 0xABC]
+
+
+class LENGTH_PREFIXED_STRUCT(VarBitStruct):
+    def __init__(self):
+        super().__init__(
+            bitfields=[
+                BitField(size=8, name="Type"),
+                BitField(size=8, name="Length"),
+                PayloadField(name="Payload", length="Length"),
+                BitField(size=16, name="Check")
+            ], name="Length Prefixed Struct"
+        )
+
+
+class NIBBLE_PREFIXED_STRUCT(VarBitStruct):
+    def __init__(self):
+        super().__init__(
+            bitfields=[
+                BitField(size=4, name="Words"),
+                PayloadField(name="Payload", length="Words", unit=2, adjust=-1),
+                BitField(size=4, name="Tail")
+            ], name="Nibble Prefixed Struct"
+        )
+
+
+class CRC16_40BIT_STRUCT(BitStruct):
+    def __init__(self):
+        super().__init__(
+            bitfields=[
+                BitField(size=8, name="Type"),
+                BitField(size=16, name="Value"),
+                ChecksumField(CRC16_CCITT, name="CRC")
+            ], name="CRC16 40bit Struct"
+        )
+
+
+class CRC16_28BIT_STRUCT(BitStruct):
+    def __init__(self):
+        super().__init__(
+            bitfields=[
+                BitField(size=5, name="Kind"),
+                BitField(size=7, name="Count"),
+                ChecksumField(CRC16_XMODEM, name="CRC")
+            ], name="CRC16 28bit Struct"
+        )
+
+
+def crc_flit():
+    return FlitStruct(
+        bitstructs=[
+            BitStruct([BitField(size=32, name="Word 0"), BitField(size=32, name="Word 1")], name="Body"),
+            BitStruct([BitField(size=32, name="Word 2")], name="Body"),
+            BitStruct([ChecksumField(CRC32, name="CRC", scope="collection")], name="Trailer")
+        ], name="CRC Flit"
+    )
+
+
+def bitwise_crc(crc, value, size):
+    """
+    A bit at a time reference CRC of the `size` bit stream in value, most significant bit first
+    """
+    bits = [(value >> idx) & 1 for idx in range(size - 1, -1, -1)]
+    if crc.reflect:
+        # reflected CRCs take each whole byte least significant bit first
+        whole = size - size % 8
+        for start in range(0, whole, 8):
+            bits[start:start + 8] = bits[start:start + 8][::-1]
+    register = crc.init
+    for bit in bits:
+        top = ((register >> (crc.width - 1)) ^ bit) & 1
+        register = ((register << 1) & ((1 << crc.width) - 1)) ^ (crc.poly if top else 0)
+    if crc.reflect:
+        register = int(format(register, f"0{crc.width}b")[::-1], 2)
+    return register ^ crc.xorout
+
+
+def sum_shared_column(name, field, results):
+    with SharedColumns.attach(name) as shared:
+        results.put(sum(shared[field]))
+
+
+def label_stats(labels, results):
+    stats = FieldStats("Label", 32)
+    stats.update(labels)
+    results.put(stats)
+
+
+def sync_frame_bins(payload, check=None):
+    if check is None:
+        check = payload ^ 0xFF
+    return "1010101001010101" + format(payload, "08b") + format(check, "08b")
+
+
+def bins_to_bytes(binstring):
+    padding = -len(binstring) % 8
+    binstring += "0" * padding
+    return int(binstring, 2).to_bytes(len(binstring) // 8, 'big')
+
+
+# Test Records
+@bitrecord(name="Byte Aligned 32bit Struct")
+class BYTE_ALIGNED_32BIT_RECORD:
+    apple: Bits[4, "Apple"]
+    banana: Bits[4, "Banana"]
+    carrot: Bits[8, "Carrot"]
+    durian: Bits[16, "Durian"]
+
+
+@bitrecord(name="Non Byte Aligned 27bit Struct")
+class NON_BYTE_ALIGNED_27BIT_RECORD:
+    elderberry: Bits[7, "Elderberry"]
+    fig: Bits[5, "Fig"]
+    grapefruit: Bits[2, "Grapefruit"]
+    honeydew: Bits[13, "Honeydew"]
+
+
+@bitrecord(name="Overlapping BitFields")
+class OVERLAPPING_BOUNDARY_RECORD:
+    jackfruit: Bits[20, "Jackfruit"]
+    kumquat: Bits[30, "Kumquat"]
+    lemon: Bits[20, "Lemon"]
+
+
 # ============================= Biterator Tests =============================
 @pytest.mark.parametrize(
     "bytedata, expected_iterations, expected_output", [
@@ -190,6 +453,75 @@ def test_Biterator_generates(bytestring, expected):
         idx += 1
 
 
+# ============================= BitPattern Tests =============================
+def brute_force_find(pattern_bits, bytedata):
+    haystack = "".join(Biterator(bytedata))
+    offsets = []
+    idx = haystack.find(pattern_bits)
+    while idx != -1:
+        offsets.append(idx)
+        idx = haystack.find(pattern_bits, idx + 1)
+    return offsets
+
+
+SEARCH_DATA = bytes((idx * 37 + (idx >> 3) * 11) % 256 for idx in range(512)) + CHECKERBOARD_BYTES
+
+
+@pytest.mark.parametrize(
+    "pattern, size, expected_bins", [
+        (0xAA55,            16,     "1010101001010101"),
+        ("0b101",           None,   "101"),
+        ("0110100",         None,   "0110100"),
+        (b"\x2A\x95",       None,   "0010101010010101"),
+        (0x1,               13,     "0000000000001"),
+        (0b11111111,        8,      "11111111"),
+        (0x6A956,           20,     "01101010100101010110")
+    ]
+)
+def test_BitPattern_finds_all_alignments(pattern, size, expected_bins):
+    bit_pattern = BitPattern(pattern, size)
+    assert bit_pattern.to_bin() == expected_bins
+    expected = brute_force_find(expected_bins, SEARCH_DATA)
+    assert bit_pattern.find_all(SEARCH_DATA) == expected
+    assert bit_pattern.find(SEARCH_DATA) == (expected[0] if expected else -1)
+    if len(expected) > 1:
+        assert bit_pattern.find(SEARCH_DATA, expected[0] + 1) == expected[1]
+
+
+@pytest.mark.parametrize(
+    "chunk_size", [1, 2, 3, 7, 64, 1 << 20]
+)
+def test_BitPattern_finds_in_stream(chunk_size):
+    bit_pattern = BitPattern("0b0101101")
+    expected = brute_force_find("0101101", SEARCH_DATA)
+    assert list(bit_pattern.find_in_stream(io.BytesIO(SEARCH_DATA), chunk_size)) == expected
+
+
+def test_BitPattern_from_BitStruct():
+    bitstruct = NON_BYTE_ALIGNED_27BIT_STRUCT()
+    bitstruct.from_bytes(CHECKERBOARD_BYTES)
+    bit_pattern = BitPattern(bitstruct)
+    assert bit_pattern.size == 27
+    assert bit_pattern.to_bin() == bitstruct.to_bin()
+    assert bit_pattern.find_all(CHECKERBOARD_BYTES) == brute_force_find(bitstruct.to_bin(), CHECKERBOARD_BYTES)
+    assert bit_pattern.find(CHECKERBOARD_BYTES) == 0
+
+
+@pytest.mark.parametrize(
+    "pattern, size, expected_err", [
+        (0xAA55,    None,   "An int BitPattern requires a size in bits"),
+        (0xAA55,    8,      "43605 is too large for the pattern size: 8 bits"),
+        ("",        None,   "A BitPattern must be at least 1 bit wide")
+    ]
+)
+def test_BitPattern_throws_invalid_pattern(pattern, size, expected_err):
+    try:
+        BitPattern(pattern, size)
+        assert False
+    except ValueError as err:
+        assert str(err) == expected_err
+
+
 # ============================= BitField Tests =============================
 @pytest.mark.parametrize(
     "bitfield, expected", [
@@ -357,6 +689,72 @@ def test_BitField_throws_invalid_assignment(bitfield, setval):
         assert str(err) == "size field cannot be modified"
 
 
+@pytest.mark.parametrize(
+    "encoding, raw, value", [
+        (FieldEncoding(12, signed=True),                        0xFFF,      -1),
+        (FieldEncoding(12, signed=True),                        0x7FF,      2047),
+        (FieldEncoding(12, signed=True),                        0x800,      -2048),
+        (FieldEncoding(16, byteorder="little"),                 0x3412,     0x1234),
+        (FieldEncoding(4, bit_order="lsb"),                     0b0001,     0b1000),
+        (FieldEncoding(13, bit_order="lsb"),                    0b1100000000000,    0b11),
+        (FieldEncoding(16, signed=True, byteorder="little"),    0xD4FE,     -300),
+        (FieldEncoding(16, signed=True, byteorder="little", bit_order="lsb"), 0b0000000010000000, 1)
+    ]
+)
+def test_FieldEncoding_round_trips(encoding, raw, value):
+    assert encoding.decode(raw) == value
+    assert encoding.encode(value) == raw
+    assert eval(encoding.decode_source(str(raw)), vars(BitS)) == value
+
+
+@pytest.mark.parametrize(
+    "bitfield, value, expected_bin, expected_bytes", [
+        (BitField(size=12, name="Apple", signed=True),                  -2,     "111111111110",     b"\x0F\xFE"),
+        (BitField(size=16, name="Banana", byteorder="little"),          0x1234, "0011010000010010", b"\x34\x12"),
+        (BitField(size=4, name="Carrot", bit_order="lsb"),              1,      "1000",             b"\x08"),
+        (BitField(size=8, name="Durian", signed=True, bit_order="lsb"), -128,   "00000001",         b"\x01")
+    ]
+)
+def test_BitField_encodings(bitfield, value, expected_bin, expected_bytes):
+    bitfield.value = value
+    assert int(bitfield) == value
+    assert bitfield.to_bin() == expected_bin
+    assert bytes(bitfield) == expected_bytes
+    bitfield.raw = int(expected_bin, 2)
+    assert bitfield.value == value
+
+
+@pytest.mark.parametrize(
+    "bitfield, setval, expected_err", [
+        (BitField(size=12, name="Apple", signed=True),  2048,   "2048 is too large for the field size: 12 bits"),
+        (BitField(size=12, name="Apple", signed=True),  -2049,  "-2049 is too small for the field size: 12 bits"),
+        (BitField(size=16, name="Banana", byteorder="little"), 65536, "65536 is too large for the field size: 16 bits")
+    ]
+)
+def test_BitField_encodings_throw_invalid_assignment(bitfield, setval, expected_err):
+    try:
+        bitfield.value = setval
+        assert False
+    except ValueError as err:
+        assert str(err) == expected_err
+
+
+@pytest.mark.parametrize(
+    "kwargs, expected_err", [
+        ({"size": 12, "byteorder": "little"},   "little endian fields must be a whole number of bytes, was 12 bits"),
+        ({"size": 8, "byteorder": "middle"},    "byteorder must be 'big' or 'little', was 'middle'"),
+        ({"size": 8, "bit_order": "sideways"},  "bit_order must be 'msb' or 'lsb', was 'sideways'"),
+        ({"size": 8, "encoding": FieldEncoding(4, signed=True)}, "encoding is for 4 bits, the field is 8 bits")
+    ]
+)
+def test_BitField_throws_invalid_encoding(kwargs, expected_err):
+    try:
+        BitField(**kwargs)
+        assert False
+    except ValueError as err:
+        assert str(err) == expected_err
+
+
 # ============================= BitStruct Tests =============================
 @pytest.mark.parametrize(
     "bitstruct, test_data, expected_values, expected_bins", [
@@ -490,6 +888,304 @@ def test_BitStruct_supports_assignment_output(bitstruct, expected_bin):
     assert bitstruct.to_bin() == expected_bin
 
 
+@pytest.mark.parametrize(
+    "bitstruct, test_data, expected_values", [
+        (BYTE_ALIGNED_32BIT_STRUCT(),     CHECKERBOARD_BYTES,   {"Apple": 10, "Banana": 10, "Carrot": 85, "Durian": 43605}),
+        (NON_BYTE_ALIGNED_27BIT_STRUCT(), CHECKERBOARD_BYTES,   {"Elderberry": 85, "Fig": 5, "Grapefruit": 1, "Honeydew": 3410}),
+        (OVERLAPPING_BOUNDARY_STRUCT(),   CHECKERBOARD_BYTES,   {"Jackfruit": 697690, "Kumquat": 693545302, "Lemon": 693610})
+    ]
+)
+def test_BitStruct_access_by_name(bitstruct, test_data, expected_values):
+    bitstruct.from_bytes(test_data)
+    for idx, (name, value) in enumerate(expected_values.items()):
+        assert bitstruct[name] is bitstruct[idx]
+        assert bitstruct[name].value == value
+    try:
+        bitstruct["Zucchini"]
+        assert False
+    except KeyError:
+        assert True
+
+
+def test_BitStruct_shares_layout_per_shape():
+    assert BYTE_ALIGNED_32BIT_STRUCT().layout is BYTE_ALIGNED_32BIT_STRUCT().layout
+    assert BYTE_ALIGNED_32BIT_STRUCT().layout is not NON_BYTE_ALIGNED_27BIT_STRUCT().layout
+    try:
+        BYTE_ALIGNED_32BIT_STRUCT().layout = None
+        assert False
+    except AttributeError as err:
+        assert str(err) == "Cannot modify BitStruct's layout"
+
+
+def test_BitStruct_duplicate_names_resolve_to_first():
+    bitstruct = BitStruct(
+        bitfields=[
+            BitField(size=4, name="Twin", value=1),
+            BitField(size=4, name="Twin", value=2),
+        ], name="Twins"
+    )
+    assert bitstruct["Twin"] is bitstruct[0]
+
+
+def test_BitStruct_decodes_encoded_fields():
+    bitstruct = ENCODED_48BIT_STRUCT()
+    bitstruct.from_bytes(ENCODED_48BIT_BYTES)
+    assert tuple(field.value for field in bitstruct) == ENCODED_48BIT_VALUES
+    assert bytes(bitstruct) == ENCODED_48BIT_BYTES
+    assert bitstruct.to_bin() == "".join(field.to_bin() for field in bitstruct)
+
+    populated = ENCODED_48BIT_STRUCT()
+    populated.from_bin(bitstruct.to_bin())
+    assert populated.to_dict() == bitstruct.to_dict()
+    populated = ENCODED_48BIT_STRUCT()
+    populated.from_int(int(bitstruct))
+    assert populated.to_dict() == bitstruct.to_dict()
+
+    record = ENCODED_48BIT_RECORD.unpack(ENCODED_48BIT_BYTES)
+    assert record.to_dict() == bitstruct.to_dict()
+    assert bytes(record) == ENCODED_48BIT_BYTES
+    assert record.to_bitstruct().to_dict() == bitstruct.to_dict()
+    try:
+        bytes(ENCODED_48BIT_RECORD(temperature=-2049))
+        assert False
+    except ValueError as err:
+        assert str(err) == "-2049 is too small for the field size: 12 bits"
+
+
+@pytest.mark.parametrize(
+    "test_data, expected_values", [
+        (b"\x4A\x2A", (MODE.RUN, "low", "blue", 42)),
+        (b"\x06\x00", (MODE.IDLE, "off", "unknown", 0)),
+        # raw codes outside the table pass through
+        (b"\xF0\xFF", (MODE.FAULT, 6, "red", 255))
+    ]
+)
+def test_BitStruct_decodes_enum_fields(test_data, expected_values):
+    bitstruct = ENUM_16BIT_STRUCT()
+    bitstruct.from_bytes(test_data)
+    assert tuple(field.value for field in bitstruct) == expected_values
+    assert int(bitstruct["Mode"]) == expected_values[0].value
+    if "unknown" in expected_values:
+        # the default stands in for an unknown code, so it cannot be encoded
+        try:
+            bytes(bitstruct)
+            assert False
+        except ValueError as err:
+            assert str(err) == "'unknown' is not a member of lookup"
+    else:
+        assert bytes(bitstruct) == test_data
+
+
+def test_BitStruct_encodes_enum_fields():
+    bitstruct = ENUM_16BIT_STRUCT()
+    assert bitstruct["Mode"].value is MODE.IDLE
+    bitstruct["Mode"].value = MODE.FAULT
+    bitstruct["Power"].value = "low"
+    bitstruct["Color"].value = "green"
+    assert bytes(bitstruct) == b"\xC9\x00"
+    assert ENUM_16BIT_STRUCT().layout is bitstruct.layout
+    try:
+        bitstruct["Mode"].value = "RUN"
+        assert False
+    except ValueError as err:
+        assert str(err) == "'RUN' is not a member of MODE"
+    try:
+        bitstruct.from_bytes(b"\x80\x00")
+        assert False
+    except ValueError as err:
+        assert str(err) == "2 is not a known code of MODE"
+
+
+def test_EnumEncoding_takes_in_bulk():
+    encoding = EnumEncoding(3, {0: "off", 1: "low", 2: "high"}, unknown="default", default="?")
+    assert encoding.take([0, 1, 2, 7, 1]) == ["off", "low", "high", "?", "low"]
+    assert EnumEncoding.of(2, MODE) is EnumEncoding.of(2, MODE)
+
+    @bitrecord
+    class EnumRecord:
+        mode: Bits(2, "Mode", encoding=EnumEncoding.of(2, MODE))
+        payload: Bits[6, "Payload"]
+    record = EnumRecord.unpack(b"\x45")
+    assert record.mode is MODE.RUN
+    assert record.payload == 5
+    assert bytes(record) == b"\x45"
+
+
+def test_BitStruct_decodes_scaled_and_float_fields():
+    bitstruct = SENSOR_72BIT_STRUCT()
+    bitstruct.from_bytes(SENSOR_72BIT_BYTES)
+    assert tuple(field.value for field in bitstruct) == SENSOR_72BIT_VALUES
+    assert int(bitstruct["Temperature"]) == 0xFD8
+    assert bytes(bitstruct) == SENSOR_72BIT_BYTES
+
+    other = SENSOR_72BIT_STRUCT()
+    for field, value in zip(other, SENSOR_72BIT_VALUES):
+        field.value = value
+    assert bytes(other) == SENSOR_72BIT_BYTES
+
+
+@pytest.mark.parametrize(
+    "field, setval, expected_value, expected_err", [
+        # values between steps round to the nearest one
+        ("Temperature", 1.03, 1.0, None),
+        ("Humidity", -39.8, -40.0, None),
+        ("Pressure", 0.1, 0.0999755859375, None),
+        ("Temperature", 128.0, None, "128.0 is too large for the field size: 12 bits"),
+        ("Temperature", -128.1, None, "-128.1 is too small for the field size: 12 bits"),
+        ("Humidity", -41, None, "-41 is too small for the field size: 12 bits"),
+        ("Pressure", 70000.0, None, "70000.0 is too large for the field size: 16 bits"),
+        ("Altitude", 1e300, None, "1e+300 is too large for the field size: 32 bits"),
+        ("Temperature", float("inf"), None, "inf is too large for the field size: 12 bits"),
+        ("Humidity", float("-inf"), None, "-inf is too small for the field size: 12 bits"),
+        ("Temperature", float("nan"), None, "nan cannot be stored in the field size: 12 bits")
+    ]
+)
+def test_scaled_and_float_fields_round_and_range_check(field, setval, expected_value, expected_err):
+    bitstruct = SENSOR_72BIT_STRUCT()
+    if expected_err is None:
+        bitstruct[field].value = setval
+        bitstruct.from_bytes(bytes(bitstruct))
+        assert bitstruct[field].value == expected_value
+    else:
+        try:
+            bitstruct[field].value = setval
+            assert False
+        except ValueError as err:
+            assert str(err) == expected_err
+
+
+def test_scaled_and_float_encodings_take_in_bulk():
+    q = FixedPointEncoding.q(16, 8)
+    assert q == FixedPointEncoding(16, scale=1 / 256, signed=True)
+    assert q.take([0x0180, 0xFF80, 0x7FFF]) == [1.5, -0.5, 0x7FFF / 256]
+    assert FloatEncoding(16).take([0x3E00, 0xC000]) == [1.5, -2.0]
+    assert FloatEncoding(32).take([0x42C88000, 0x3F800000]) == [100.25, 1.0]
+    assert FloatEncoding(64, byteorder="little").take([0x000000000000F03F]) == [1.0]
+    try:
+        FloatEncoding(24)
+        assert False
+    except ValueError as err:
+        assert str(err) == "float fields must be 16, 32 or 64 bits, was 24"
+
+    @bitrecord
+    class SensorRecord:
+        temperature: Bits(12, "Temperature", encoding=FixedPointEncoding(12, 0.0625, signed=True))
+        level: Bits(12, "Level")
+        pressure: Bits(16, "Pressure", encoding=FloatEncoding(16))
+    record = SensorRecord.unpack(bytes.fromhex("FD80073E00"))
+    assert (record.temperature, record.level, record.pressure) == (-2.5, 7, 1.5)
+    assert bytes(record) == bytes.fromhex("FD80073E00")
+
+
+def test_BitStruct_decodes_array_and_nested_fields():
+    bitstruct = ADC_136BIT_STRUCT()
+    assert bitstruct.size == 136
+    bitstruct.from_bytes(ADC_136BIT_BYTES)
+    header = bitstruct["Header"].value
+    assert isinstance(header, BYTE_ALIGNED_32BIT_STRUCT)
+    assert [field.value for field in header] == [0x1, 0x2, 0x34, 0x5678]
+    assert bitstruct["Channel"].value == 3
+    assert bitstruct["Samples"].value == array.array("H", ADC_136BIT_SAMPLES)
+    assert bitstruct["Flags"].value == 0xF
+    assert bytes(bitstruct) == ADC_136BIT_BYTES
+
+    header["Durian"].value = 0x9ABC
+    bitstruct["Samples"].value = list(range(8))
+    assert bytes(bitstruct) == bytes.fromhex("12349ABC3" + "000001002003004005006007" + "F")
+
+
+@pytest.mark.parametrize(
+    "encoding, values, expected_bytes", [
+        # byte sized elements decode with a single frombytes
+        (ArrayEncoding(3, 16), [1, 0x1234, 0xFFFF], bytes.fromhex("00011234FFFF")),
+        (ArrayEncoding(3, 16, signed=True), [1, 0x1234, -1], bytes.fromhex("00011234FFFF")),
+        (ArrayEncoding(2, 32), [7, 0xDEADBEEF], bytes.fromhex("00000007DEADBEEF")),
+        (ArrayEncoding(4, 5), [1, 2, 30, 31], bytes.fromhex("008BDF")),
+        (ArrayEncoding(4, 5, signed=True), [1, 2, -2, -1], bytes.fromhex("008BDF")),
+        (ArrayEncoding(1024, 12), [idx * 3 % 4096 for idx in range(1024)], None)
+    ]
+)
+def test_ArrayEncoding_round_trips(encoding, values, expected_bytes):
+    raw = encoding.encode(values)
+    if expected_bytes is not None:
+        assert raw.to_bytes(len(expected_bytes), 'big') == expected_bytes
+    assert encoding.decode(raw).tolist() == values
+    assert encoding.take([raw, 0]) == [encoding.decode(raw), encoding.decode(0)]
+
+
+@pytest.mark.parametrize(
+    "field, setval, expected_err", [
+        ("Samples", [0] * 7, "the field holds 8 values, got 7"),
+        ("Samples", [0] * 7 + [4096], "4096 is too large for the field size: 12 bits"),
+        ("Samples", [-1] + [0] * 7, "-1 is too small for the field size: 12 bits"),
+        ("Header", NON_BYTE_ALIGNED_27BIT_STRUCT(), "is not a BYTE_ALIGNED_32BIT_STRUCT")
+    ]
+)
+def test_array_and_nested_fields_throw_invalid_assignment(field, setval, expected_err):
+    bitstruct = ADC_136BIT_STRUCT()
+    try:
+        bitstruct[field].value = setval
+        assert False
+    except ValueError as err:
+        assert str(err).endswith(expected_err)
+
+
+def test_bitrecord_checks_array_elements_when_encoded():
+    @bitrecord
+    class SampleRecord:
+        a: Bits[8]
+        samples: Bits(24, "Samples", encoding=ArrayEncoding(2, 12))
+
+    for samples, expected_err in [
+        ([5000, 1], "5000 is too large for the field size: 12 bits"),
+        ([1, 2, 3], "the field holds 2 values, got 3")
+    ]:
+        try:
+            bytes(SampleRecord(a=1, samples=samples))
+            assert False
+        except ValueError as err:
+            assert str(err) == expected_err
+    wide = ArrayEncoding(2, 16)
+    for values in ([0x10000, 1], [1]):
+        try:
+            wide.encode(values)
+            assert False
+        except ValueError:
+            pass
+
+
+def test_StructField_defaults_to_a_new_struct():
+    class STATE_8BIT_STRUCT(BitStruct):
+        def __init__(self):
+            super().__init__(
+                bitfields=[EnumField(size=8, table={1: "on", 2: "off"}, name="State", value="on")],
+                name="State 8bit Struct"
+            )
+
+    # neither struct can decode all zero bits
+    for struct_type in (CRC16_40BIT_STRUCT, STATE_8BIT_STRUCT):
+        field = StructField(struct_type, name="Inner")
+        assert isinstance(field.value, struct_type)
+        outer = BitStruct([BitField(size=8, name="Tag"), field], name="Outer")
+        outer.from_bytes(bytes([0x5A]) + bytes(field.value))
+        assert outer["Tag"].value == 0x5A
+
+
+def test_bitrecord_nests_records():
+    @bitrecord
+    class FrameRecord:
+        header: Bits(32, "Header", encoding=StructEncoding(BYTE_ALIGNED_32BIT_RECORD))
+        samples: Bits(24, "Samples", encoding=ArrayEncoding(2, 12))
+
+    assert StructEncoding(BYTE_ALIGNED_32BIT_RECORD) == StructEncoding(BYTE_ALIGNED_32BIT_RECORD)
+    record = FrameRecord.unpack(bytes.fromhex("12345678ABC123"))
+    assert isinstance(record.header, BYTE_ALIGNED_32BIT_RECORD)
+    assert record.header.to_dict() == BYTE_ALIGNED_32BIT_RECORD(1, 2, 0x34, 0x5678).to_dict()
+    assert record.samples.tolist() == [0xABC, 0x123]
+    record.header.durian = 1
+    assert bytes(record) == bytes.fromhex("12340001ABC123")
+
+
 # ============================= BitCollection Tests =============================
 @pytest.mark.parametrize(
     "bitstructs, expected", [
@@ -1191,3 +1887,1475 @@ def test_FlitStruct_must_be_128_bits(bitstructs, expected):
     except ValueError as err:
         assert f"FlitStructs MUST be 128 bits, was" in str(err)
         assert expected is False
+
+
+def test_BitCollection_access_by_name():
+    test_collection = BitCollection(
+        bitstructs=[
+            EIGHT_BIT_STRUCT(),
+            FIFTEEN_BIT_STRUCT(),
+            NON_BYTE_ALIGNED_27BIT_STRUCT(),
+            FIFTEEN_BIT_STRUCT()
+        ], name="TEST"
+    )
+    test_collection.from_bytes(CHECKERBOARD_BYTES)
+    assert test_collection["8 bits"] is test_collection[0]
+    assert test_collection["Non Byte Aligned 27bit Struct"]["Fig"] is test_collection[2][1]
+    # duplicate names resolve to the first struct, get_all returns every one
+    assert test_collection["15 bits"] is test_collection[1]
+    assert test_collection.get_all("15 bits") == [test_collection[1], test_collection[3]]
+    assert test_collection.get_all("Zucchini") == []
+    try:
+        test_collection["Zucchini"]
+        assert False
+    except KeyError:
+        assert True
+
+
+# ============================= VarBitStruct Tests =============================
+def test_VarBitStruct_decodes_length_prefixed_payloads():
+    data = bytes.fromhex("0103AABBCC1234" + "0200BEEF")
+    frame = LENGTH_PREFIXED_STRUCT()
+    assert frame.from_bytes(data) == 56
+    assert frame["Length"].value == 3
+    payload = frame["Payload"].value
+    assert isinstance(payload, memoryview)
+    assert payload.obj is data
+    assert payload == b"\xAA\xBB\xCC"
+    assert frame["Check"].value == 0x1234
+    assert frame.offsets == (0, 8, 16, 40)
+    assert frame.size == 56
+    assert bytes(frame) == data[:7]
+
+    frame.from_bytes(data, 56)
+    assert len(frame["Payload"]) == 0
+    assert frame.to_dict() == {"Length Prefixed Struct": {"Type": 2, "Length": 0, "Payload": b"", "Check": 0xBEEF}}
+
+
+def test_VarBitStruct_iter_unpack_and_unaligned_payloads():
+    data = bytes.fromhex("0103AABBCC1234" + "0200BEEF" + "0501FF0000")
+    frames = list(LENGTH_PREFIXED_STRUCT.iter_unpack(data))
+    assert [frame["Type"].value for frame in frames] == [1, 2, 5]
+    assert b"".join(bytes(frame) for frame in frames) == data
+
+    # Words 2 -> 3 bytes starting half way through a byte, so the payload is copied out
+    data = bytes.fromhex("2ABCDEF5")
+    frame = NIBBLE_PREFIXED_STRUCT()
+    assert frame.from_bytes(data) == 32
+    assert bytes(frame["Payload"]) == bytes.fromhex("ABCDEF")
+    assert frame["Tail"].value == 5
+    assert frame.offsets == (0, 4, 28)
+    assert bytes(frame) == data
+
+
+@pytest.mark.parametrize(
+    "test_data, expected_err", [
+        (bytes.fromhex("01"), "Not enough bytes to fill the VarBitStruct"),
+        (bytes.fromhex("0105AABB"), "Not enough bytes to fill Payload: 5 bytes needed"),
+        (bytes.fromhex("0101AA12"), "Not enough bytes to fill the VarBitStruct")
+    ]
+)
+def test_VarBitStruct_throws_on_short_data(test_data, expected_err):
+    try:
+        LENGTH_PREFIXED_STRUCT().from_bytes(test_data)
+        assert False
+    except ValueError as err:
+        assert str(err) == expected_err
+
+
+def test_VarBitStruct_throws_on_invalid_layout_and_length():
+    try:
+        VarBitStruct([PayloadField(name="Payload", length="Length"), BitField(size=8, name="Length")])
+        assert False
+    except ValueError as err:
+        assert str(err) == "Payload is sized by Length, which must be an earlier field"
+    frame = LENGTH_PREFIXED_STRUCT()
+    frame["Payload"].value = b"abc"
+    try:
+        bytes(frame)
+        assert False
+    except ValueError as err:
+        assert str(err) == "Payload holds 3 bytes but Length describes 0"
+    frame["Length"].value = 3
+    assert bytes(frame) == b"\x00\x03abc\x00\x00"
+
+
+# ============================= Checksum Tests =============================
+@pytest.mark.parametrize(
+    "crc, expected_crc", [
+        (CRC16_CCITT, 0x29B1),
+        (CRC16_XMODEM, 0x31C3),
+        (CRC16_ARC, 0xBB3D),
+        (CRC32, 0xCBF43926),
+        # CRC-32/BZIP2 and CRC-16/MODBUS have no C implementation, so they run from the table
+        (Crc(32, 0x04C11DB7, init=0xFFFFFFFF, xorout=0xFFFFFFFF), 0xFC891918),
+        (Crc(16, 0x8005, init=0xFFFF, reflect=True), 0x4B37)
+    ]
+)
+def test_Crc_check_values(crc, expected_crc):
+    assert crc.compute(b"123456789") == expected_crc
+    assert crc.compute(memoryview(b"__123456789")[2:]) == expected_crc
+    assert crc.compute_bits(int.from_bytes(b"123456789", 'big'), 72) == expected_crc
+    assert crc.compute_many([b"123456789", b""]) == [expected_crc, crc.compute(b"")]
+    for size in (1, 7, 12, 29):
+        value = 0x1ABCDEF1 & ((1 << size) - 1)
+        assert crc.compute_bits(value, size) == bitwise_crc(crc, value, size)
+
+
+def test_BitStruct_fills_and_checks_checksums():
+    bitstruct = CRC16_40BIT_STRUCT()
+    bitstruct["Type"].value = 0x31
+    bitstruct["Value"].value = 0x3233
+    data = bytes(bitstruct)
+    assert data == b"123" + CRC16_CCITT.compute(b"123").to_bytes(2, 'big')
+    assert bitstruct["CRC"].value == CRC16_CCITT.compute(b"123")
+
+    decoded = CRC16_40BIT_STRUCT()
+    decoded.from_bytes(data)
+    assert decoded["Value"].value == 0x3233
+    decoded.from_bin(bitstruct.to_bin())
+    try:
+        decoded.from_bytes(b"124" + data[3:])
+        assert False
+    except ValueError as err:
+        assert str(err) == (
+            f"CRC does not match its data: stored 0x{data[3:].hex().upper()}, computed 0x{CRC16_CCITT.compute(b'124'):X}"
+        )
+    assert decoded["Type"].value == 0x31
+
+
+def test_BitStruct_checksums_cover_unaligned_bits():
+    bitstruct = CRC16_28BIT_STRUCT()
+    bitstruct["Kind"].value = 0b10110
+    bitstruct["Count"].value = 0b0011101
+    expected_crc = bitwise_crc(CRC16_XMODEM, 0b101100011101, 12)
+    assert int(bitstruct) == (0b101100011101 << 16) | expected_crc
+    decoded = CRC16_28BIT_STRUCT()
+    decoded.from_int(int(bitstruct))
+    try:
+        decoded.from_int(int(bitstruct) ^ (1 << 20))
+        assert False
+    except ValueError as err:
+        assert str(err).startswith("CRC does not match its data")
+
+
+def test_FlitStruct_fills_and_checks_collection_checksums():
+    flit = crc_flit()
+    for idx, field in enumerate(field for struct in flit.get_all("Body") for field in struct):
+        field.value = 0x01020304 * (idx + 1)
+    data = bytes(flit)
+    assert data[12:] == zlib.crc32(data[:12]).to_bytes(4, 'big')
+    assert flit["Trailer"]["CRC"].value == zlib.crc32(data[:12])
+    assert flit.to_bin() == format(int.from_bytes(data, 'big'), "0128b")
+
+    decoded = crc_flit()
+    decoded.from_bytes(data)
+    assert decoded["Body"]["Word 1"].value == 0x02040608
+    decoded.from_bin(flit.to_bin())
+    try:
+        decoded.from_bytes(data[:11] + b"\x00" + data[12:])
+        assert False
+    except ValueError as err:
+        assert str(err).startswith("CRC does not match its data")
+
+
+@pytest.mark.parametrize(
+    "kwargs, expected_err", [
+        ({"scope": "frame"}, "scope must be 'struct' or 'collection', was 'frame'"),
+        ({"start": 8, "end": 32}, "CRC cannot cover its own bits"),
+        ({"start": 8, "end": 8}, "CRC covers no bits: 8 to 8"),
+        ({"end": 48}, "CRC covers bits past the end: 48 of 40")
+    ]
+)
+def test_ChecksumField_throws_invalid_coverage(kwargs, expected_err):
+    try:
+        BitStruct(
+            [BitField(size=24, name="Value"), ChecksumField(CRC16_CCITT, name="CRC", **kwargs)], name="Invalid"
+        )
+        assert False
+    except ValueError as err:
+        assert str(err) == expected_err
+
+
+# ============================= BitTable Tests =============================
+# Apple | Banana | Carrot | Durian
+BIT_TABLE_ROWS = [
+    (1, 2, 0x30, 0x1000),
+    (3, 2, 0x10, 0x0500),
+    (1, 7, 0x20, 0xFFFF),
+    (2, 2, 0x30, 0x0001),
+    (1, 2, 0x10, 0x0800)
+]
+BIT_TABLE_BYTES = b"".join(
+    bytes.fromhex(f"{apple:X}{banana:X}{carrot:02X}{durian:04X}") for apple, banana, carrot, durian in BIT_TABLE_ROWS
+)
+
+
+def test_BitTable_decodes_typed_columns():
+    table = BitTable(BYTE_ALIGNED_32BIT_STRUCT().layout, BIT_TABLE_BYTES)
+    assert len(table) == 5
+    assert table["Apple"] == array.array("B", [1, 3, 1, 2, 1])
+    assert table["Durian"] == array.array("H", [0x1000, 0x0500, 0xFFFF, 0x0001, 0x0800])
+    assert list(table.columns) == ["Apple", "Banana", "Carrot", "Durian"]
+    assert table[2] == BIT_TABLE_ROWS[2]
+    assert list(table) == BIT_TABLE_ROWS
+    assert table.to_bytes() == BIT_TABLE_BYTES
+    # a trailing partial record is ignored
+    assert len(BitTable(BYTE_ALIGNED_32BIT_RECORD, BIT_TABLE_BYTES + b"\x01\x02")) == 5
+
+
+def test_BitTable_queries():
+    table = BitTable(BYTE_ALIGNED_32BIT_STRUCT(), BIT_TABLE_BYTES)
+    assert list(table.filter(Apple=1)) == [BIT_TABLE_ROWS[0], BIT_TABLE_ROWS[2], BIT_TABLE_ROWS[4]]
+    assert list(table.filter({"Apple": 1}, Durian=lambda durian: durian < 0x2000)) == [
+        BIT_TABLE_ROWS[0], BIT_TABLE_ROWS[4]
+    ]
+    assert len(table.filter(Apple=9)) == 0
+    assert list(table.sort("Carrot", "Durian")["Durian"]) == [0x0500, 0x0800, 0xFFFF, 0x0001, 0x1000]
+    assert list(table.sort("Durian", reverse=True)["Apple"]) == [1, 1, 1, 3, 2]
+    assert table.group_count("Apple") == {1: 3, 3: 1, 2: 1}
+    assert table.group_count("Apple", "Banana") == {(1, 2): 2, (3, 2): 1, (1, 7): 1, (2, 2): 1}
+    groups = table.group_by("Banana")
+    assert sorted(groups) == [2, 7]
+    assert groups[2].max("Durian") == 0x1000
+    assert groups[7].min("Carrot") == 0x20
+    assert table.min("Durian") == 1
+    assert table.histogram("Carrot", bins=2) == ([0x10, 0x20, 0x30], [2, 3])
+    assert table.histogram("Apple", bins=4) == ([1.0, 1.5, 2.0, 2.5, 3.0], [3, 0, 1, 1])
+
+
+def test_BitTable_converts_back_to_structs():
+    table = BitTable(BYTE_ALIGNED_32BIT_STRUCT().layout, BIT_TABLE_BYTES)
+    plain = table.to_struct(1)
+    assert plain.name == "Byte Aligned 32bit Struct"
+    assert [field.value for field in plain] == list(BIT_TABLE_ROWS[1])
+    structs = table.to_structs(BYTE_ALIGNED_32BIT_STRUCT)
+    assert b"".join(bytes(struct) for struct in structs) == BIT_TABLE_BYTES
+    records = table.to_structs(BYTE_ALIGNED_32BIT_RECORD)
+    assert records[3].durian == 1
+    assert list(BitTable.from_structs(records)) == BIT_TABLE_ROWS
+    assert BitTable.from_structs(structs).to_bytes() == BIT_TABLE_BYTES
+
+
+def test_BitTable_handles_unaligned_strides_and_encoded_fields():
+    bins = "".join(format(idx * 0x123457, "027b")[-27:] for idx in range(4))
+    data = bins_to_bytes(bins)
+    table = BitTable(NON_BYTE_ALIGNED_27BIT_STRUCT(), data, stride=27)
+    assert len(table) == 4
+    expected = NON_BYTE_ALIGNED_27BIT_STRUCT()
+    expected.from_bin(bins[27:54])
+    assert table[1] == tuple(field.value for field in expected)
+    assert table.to_bytes() == data
+
+    sensors = BitTable(SENSOR_72BIT_STRUCT(), SENSOR_72BIT_BYTES * 3)
+    assert sensors["Temperature"] == array.array("d", [-2.5] * 3)
+    assert sensors.to_bytes() == SENSOR_72BIT_BYTES * 3
+    try:
+        BitTable(SENSOR_72BIT_STRUCT(), stride=64)
+        assert False
+    except ValueError as err:
+        assert str(err) == "stride must be at least the layout size: 72 bits, was 64"
+
+
+# ============================= FieldAggregator Tests =============================
+def test_FieldAggregator_streams_chunks():
+    aggregator = FieldAggregator(BYTE_ALIGNED_32BIT_STRUCT())
+    stream = io.BytesIO(BIT_TABLE_BYTES * 2 + b"\x01")
+    aggregator.update_stream(stream, chunk_size=3)
+    assert aggregator.records == 10
+    assert aggregator.pending == 1
+    apple = aggregator["Apple"]
+    assert (apple.count, apple.min, apple.max, apple.mean) == (10, 1, 3, 1.6)
+    assert apple.histogram == {1: 6, 3: 2, 2: 2}
+    durian = aggregator["Durian"]
+    assert durian.histogram is None
+    assert durian.distinct == 5
+    assert aggregator.to_dict()["Byte Aligned 32bit Struct"]["Carrot"] == {
+        "count": 10, "min": 0x10, "max": 0x30, "mean": 0x20, "distinct": 3, "histogram": {0x10: 4, 0x20: 2, 0x30: 4}
+    }
+
+    other = FieldAggregator(BYTE_ALIGNED_32BIT_STRUCT())
+    other.update(bytes.fromhex("F0FF0002"))
+    aggregator.merge(other)
+    assert (durian.count, durian.min, durian.max, durian.distinct) == (11, 1, 0xFFFF, 6)
+    assert aggregator["Apple"].max == 0xF
+
+
+def test_FieldAggregator_handles_encoded_fields():
+    aggregator = FieldAggregator(ENUM_16BIT_STRUCT())
+    aggregator.update(b"\x4A\x2A\x06\x00\xF0\xFF")
+    mode = aggregator["Mode"]
+    assert mode.histogram == {MODE.RUN: 1, MODE.IDLE: 1, MODE.FAULT: 1}
+    assert mode.to_dict()["mean"] is None
+    assert aggregator["Payload"].mean == (42 + 0 + 255) / 3
+    try:
+        FieldAggregator(NON_BYTE_ALIGNED_27BIT_STRUCT(), stride=27)
+        assert False
+    except ValueError as err:
+        assert str(err) == "streamed records must be a whole number of bytes apart, was 27 bits"
+
+
+def test_FieldAggregator_handles_array_fields():
+    aggregator = FieldAggregator(ADC_136BIT_STRUCT())
+    aggregator.update(ADC_136BIT_BYTES * 2 + ADC_136BIT_BYTES[:4] + bytes(13))
+    samples = aggregator["Samples"]
+    assert (samples.count, samples.distinct, samples.mean) == (3, 2, None)
+    assert aggregator["Channel"].histogram == {3: 2, 0: 1}
+
+
+def test_FieldStats_estimates_distinct_values():
+    stats = FieldStats("Counter", 32, sketch_size=256)
+    for start in range(0, 20000, 1000):
+        stats.update(array.array("I", range(start, start + 1000)))
+        stats.update(array.array("I", range(start, start + 1000)))
+    assert stats.count == 40000
+    assert abs(stats.distinct - 20000) < 20000 * 0.2
+
+
+def test_FieldStats_merges_sketches_from_other_processes():
+    labels = [f"label {idx}" for idx in range(300)]
+    # a spawned interpreter salts str hashes differently from this one
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    worker = context.Process(target=label_stats, args=(labels, results))
+    worker.start()
+    remote = results.get(timeout=60)
+    worker.join(timeout=60)
+    local = FieldStats("Label", 32)
+    local.update(labels[100:] + [MODE.RUN])
+    local.merge(remote)
+    assert local.distinct == 301
+
+
+# ============================= Bit Diff Tests =============================
+def test_bit_diff_reports_only_changed_fields():
+    changed = bytearray(BIT_TABLE_BYTES)
+    changed[1] = 0x31       # record 0 Carrot
+    changed[14] ^= 0x80     # record 3 Durian
+    changed[15] ^= 0x01     # record 3 Durian
+    changed[16] = 0x21      # record 4 Apple
+    diffs = list(bit_diff(BYTE_ALIGNED_32BIT_STRUCT(), BIT_TABLE_BYTES, bytes(changed), chunk_records=2))
+    assert diffs == [
+        RecordDiff(0, {"Carrot": (0x30, 0x31)}),
+        RecordDiff(3, {"Durian": (0x0001, 0x8000)}),
+        RecordDiff(4, {"Apple": (1, 2), "Banana": (2, 1)})
+    ]
+    assert list(bit_diff(BYTE_ALIGNED_32BIT_RECORD, BIT_TABLE_BYTES, BIT_TABLE_BYTES)) == []
+
+
+def test_bit_diff_reports_records_only_one_side_holds(tmp_path):
+    old_path = tmp_path / "old.bin"
+    new_path = tmp_path / "new.bin"
+    old_path.write_bytes(BIT_TABLE_BYTES[:8])
+    new_path.write_bytes(BIT_TABLE_BYTES[:8] + BIT_TABLE_BYTES[:4] + b"\x00")
+    with open(old_path, "rb") as old, open(new_path, "rb") as new:
+        diffs = list(bit_diff(BYTE_ALIGNED_32BIT_STRUCT().layout, old, new, chunk_records=2))
+    assert diffs == [
+        RecordDiff(2, {"Apple": (None, 1), "Banana": (None, 2), "Carrot": (None, 0x30), "Durian": (None, 0x1000)})
+    ]
+    diffs = list(bit_diff(BYTE_ALIGNED_32BIT_STRUCT(), BIT_TABLE_BYTES, BIT_TABLE_BYTES[:14]))
+    assert [diff.index for diff in diffs] == [3, 4]
+    assert diffs[0].fields["Durian"] == (0x0001, None)
+
+
+def test_bit_diff_decodes_collections_and_encoded_fields():
+    collection = BitCollection([BYTE_ALIGNED_32BIT_STRUCT(), SENSOR_72BIT_STRUCT()], name="Pair")
+    old = BIT_TABLE_BYTES[:4] + SENSOR_72BIT_BYTES + b"\x00" * 3
+    sensor = SENSOR_72BIT_STRUCT()
+    sensor.from_bytes(SENSOR_72BIT_BYTES)
+    sensor["Pressure"].value = 2.0
+    new = BIT_TABLE_BYTES[:4] + bytes(sensor) + b"\x00" * 3
+    assert list(bit_diff(collection, old, new, stride=128)) == [
+        RecordDiff(0, {"Sensor 72bit Struct.Pressure": (1.5, 2.0)})
+    ]
+    try:
+        list(bit_diff(NON_BYTE_ALIGNED_27BIT_STRUCT(), b"", b"", stride=27))
+        assert False
+    except ValueError as err:
+        assert str(err) == "compared records must be a whole number of bytes apart, was 27 bits"
+
+
+def test_bit_diff_numbers_repeated_names():
+    def point():
+        return BitStruct([BitField(size=8, name="x")], name="P")
+
+    collection = BitCollection([point(), point(), EIGHT_BIT_STRUCT()], name="Points")
+    old = bytes([1, 2, 0])
+    new = bytes([3, 4, 0])
+    assert list(bit_diff(collection, old, new)) == [RecordDiff(0, {"P[0].x": (1, 3), "P[1].x": (2, 4)})]
+    pair = BitStruct([BitField(size=4, name="x"), BitField(size=4, name="x")], name="Pair")
+    assert list(bit_diff(pair, b"\x12", b"\x34")) == [RecordDiff(0, {"x[0]": (1, 3), "x[1]": (2, 4)})]
+
+
+class TrickleStream(io.BytesIO):
+    """
+    Returns at most 3 bytes per read, like a pipe
+    """
+
+    def read(self, size=-1):
+        return super().read(min(size, 3) if size >= 0 else 3)
+
+
+def test_bit_diff_reports_rejected_codes_raw_and_reads_short_streams():
+    # Mode code 2 is not a MODE
+    old = b"\x4A\x2A"
+    new = b"\x8A\x2A\x80\x00"
+    assert list(bit_diff(ENUM_16BIT_STRUCT(), old, new)) == [
+        RecordDiff(0, {"Mode": (MODE.RUN, 2)}),
+        RecordDiff(1, {"Mode": (None, 2), "Power": (None, "off"), "Color": (None, "red"), "Payload": (None, 0)})
+    ]
+
+    old = BIT_TABLE_BYTES
+    new = BIT_TABLE_BYTES[:8] + b"\xFF" + BIT_TABLE_BYTES[9:]
+    expected = list(bit_diff(BYTE_ALIGNED_32BIT_STRUCT(), old, new))
+    assert len(expected) == 1
+    assert list(bit_diff(BYTE_ALIGNED_32BIT_STRUCT(), TrickleStream(old), TrickleStream(new), chunk_records=2)) == expected
+
+
+# ============================= Equality and Dedupe Tests =============================
+def test_BitField_equality_and_hashing():
+    assert BitField(size=4, name="Apple", value=3) == BitField(size=4, name="Apple", value=3)
+    assert BitField(size=4, name="Apple", value=3) != BitField(size=4, name="Apple", value=4)
+    assert BitField(size=4, name="Apple", value=3) != BitField(size=5, name="Apple", value=3)
+    assert BitField(size=8, name="A", value=3, signed=True) != BitField(size=8, name="A", value=3)
+    assert len({BitField(size=4, name="Apple", value=3), BitField(size=4, name="Apple", value=3)}) == 1
+
+
+def test_BitStruct_equality_hashing_and_cached_image():
+    first = BYTE_ALIGNED_32BIT_STRUCT()
+    second = BYTE_ALIGNED_32BIT_STRUCT()
+    first.from_bytes(BIT_TABLE_BYTES[:4])
+    second.from_bytes(BIT_TABLE_BYTES[:4])
+    assert first == second
+    assert len({first, second}) == 1
+    assert first != NON_BYTE_ALIGNED_27BIT_STRUCT()
+    assert first != BIT_TABLE_BYTES[:4]
+
+    image = int(first)
+    second["Durian"].value = 0x1001
+    assert first != second
+    assert int(second) == image + 1
+    second.from_int(image)
+    assert first == second
+    assert {first: "first"}[second] == "first"
+
+
+def test_BitCollection_equality_follows_struct_changes():
+    first = BitCollection([BYTE_ALIGNED_32BIT_STRUCT(), EIGHT_BIT_STRUCT()], name="Pair")
+    second = BitCollection([BYTE_ALIGNED_32BIT_STRUCT(), EIGHT_BIT_STRUCT()], name="Pair")
+    assert first == second
+    assert hash(first) == hash(second)
+    before = int(first)
+    first[0]["Apple"].value = 5
+    assert first != second
+    assert int(first) == before | (5 << 36)
+    second.from_bytes(bytes(first))
+    assert first == second
+    assert first != BitCollection([BYTE_ALIGNED_32BIT_STRUCT(), EIGHT_BIT_STRUCT()], name="Other")
+
+
+def test_BitCollection_image_follows_collection_checksum_and_struct_changes():
+    head = BitStruct([BitField(size=16, name="X"), BitField(size=16, name="Y")], name="Head")
+    tail = BitStruct(
+        [BitField(size=8, name="Z"), ChecksumField(CRC16_CCITT, name="CRC", end=32, scope="collection")],
+        name="Tail"
+    )
+    collection = BitCollection([head, tail], name="Packet")
+    int(collection)
+    tail["Z"].value = 0x7F
+    assert int(collection) >> 16 == 0x7F
+    assert int(collection) & 0xFFFF == CRC16_CCITT.compute(bytes(4))
+    assert collection == BitCollection([head, tail], name="Packet")
+
+
+def test_shared_structs_and_fields_tell_every_owner():
+    shared = BitStruct([BitField(size=8, name="A")], name="Shared")
+    first = BitCollection([shared], name="First")
+    second = BitCollection([shared], name="Second")
+    assert int(first) == int(second) == 0
+    shared["A"].value = 5
+    assert int(first) == int(second) == 5
+    shared.from_int(6)
+    assert int(first) == int(second) == 6
+
+    field = BitField(size=8, name="B")
+    left = BitStruct([field], name="Left")
+    right = BitStruct([field], name="Right")
+    assert int(left) == int(right) == 0
+    field.value = 7
+    assert int(left) == int(right) == 7
+    left.from_int(9)
+    assert int(right) == 9
+
+
+def test_BitRecord_equality_and_hashing():
+    assert BYTE_ALIGNED_32BIT_RECORD(1, 2, 3, 4) == BYTE_ALIGNED_32BIT_RECORD(1, 2, 3, 4)
+    assert BYTE_ALIGNED_32BIT_RECORD(1, 2, 3, 4) != BYTE_ALIGNED_32BIT_RECORD(1, 2, 3, 5)
+    assert len({BYTE_ALIGNED_32BIT_RECORD(1, 2, 3, 4), BYTE_ALIGNED_32BIT_RECORD.unpack(b"\x12\x03\x00\x04")}) == 1
+
+
+def test_dedupe_records():
+    data = BIT_TABLE_BYTES[:8] + BIT_TABLE_BYTES[:4] + BIT_TABLE_BYTES[8:] + BIT_TABLE_BYTES[4:8]
+    unique, duplicates = dedupe_records(BYTE_ALIGNED_32BIT_STRUCT(), data)
+    assert unique == BIT_TABLE_BYTES
+    assert duplicates == [2, 6]
+
+    seen = set()
+    assert dedupe_records(BYTE_ALIGNED_32BIT_RECORD, BIT_TABLE_BYTES[:8], seen=seen) == (BIT_TABLE_BYTES[:8], [])
+    assert dedupe_records(BYTE_ALIGNED_32BIT_RECORD, BIT_TABLE_BYTES[4:12], seen=seen) == (BIT_TABLE_BYTES[8:12], [0])
+
+    # the 27 bit records differ only in the padding bits of their last byte
+    unique, duplicates = dedupe_records(NON_BYTE_ALIGNED_27BIT_STRUCT(), bytes.fromhex("12345660 12345670 12345680"))
+    assert (unique, duplicates) == (bytes.fromhex("12345660 12345680"), [1])
+
+
+# ============================= Decode Cache Tests =============================
+def test_decode_cache_counts_hits_and_evicts():
+    bitstruct = BYTE_ALIGNED_32BIT_STRUCT()
+    cache = bitstruct.layout.enable_cache(maxsize=2)
+    try:
+        assert BYTE_ALIGNED_32BIT_STRUCT().layout.decode_cache is cache
+        for data in (BIT_TABLE_BYTES[:4], BIT_TABLE_BYTES[:4], BIT_TABLE_BYTES[4:8], BIT_TABLE_BYTES[:8]):
+            bitstruct.from_bytes(data)
+            assert bytes(bitstruct) == data[:4]
+        assert (cache.hits, cache.misses, len(cache)) == (2, 2, 2)
+        # the least recently used record is dropped first
+        bitstruct.from_bytes(BIT_TABLE_BYTES[8:12])
+        bitstruct.from_bytes(BIT_TABLE_BYTES[4:8])
+        assert (cache.hits, cache.misses, cache.evictions) == (2, 4, 2)
+        assert cache.to_dict() == {"size": 2, "maxsize": 2, "hits": 2, "misses": 4, "evictions": 2, "hit_rate": 1 / 3}
+        cache.clear()
+        assert cache.hit_rate == 0.0
+    finally:
+        bitstruct.layout.disable_cache()
+    assert bitstruct.layout.decode_cache is None
+
+
+def test_decode_cache_is_shared_with_records_and_skips_failures():
+    cache = BYTE_ALIGNED_32BIT_RECORD.layout.enable_cache()
+    try:
+        first = BYTE_ALIGNED_32BIT_RECORD.unpack(BIT_TABLE_BYTES[:4])
+        second = BYTE_ALIGNED_32BIT_RECORD.unpack(BIT_TABLE_BYTES[:4])
+        assert first == second
+        assert (cache.hits, cache.misses) == (1, 1)
+    finally:
+        BYTE_ALIGNED_32BIT_RECORD.layout.disable_cache()
+
+    bitstruct = CRC16_40BIT_STRUCT()
+    cache = bitstruct.layout.enable_cache()
+    try:
+        for _ in range(2):
+            try:
+                bitstruct.from_bytes(b"12345")
+                assert False
+            except ValueError as err:
+                assert str(err).startswith("CRC does not match its data")
+        assert (cache.hits, cache.misses, len(cache)) == (0, 2, 0)
+    finally:
+        bitstruct.layout.disable_cache()
+
+    try:
+        ADC_136BIT_STRUCT().layout.enable_cache()
+        assert False
+    except ValueError as err:
+        assert str(err) == "ADC 136bit Struct holds arrays or nested structs, whose values cannot be shared"
+    try:
+        DecodeCache(0)
+        assert False
+    except ValueError as err:
+        assert str(err) == "maxsize must be at least 1, was 0"
+
+
+def test_DecodeCache_is_not_shared_with_unchecked_structs():
+    plain = BitStruct([
+        BitField(size=8, name="Type"), BitField(size=16, name="Value"), BitField(size=16, name="CRC")
+    ], name="CRC16 40bit Struct")
+    checked = CRC16_40BIT_STRUCT()
+    assert plain.layout is not checked.layout
+    assert checked.layout.checksums == ((2, CRC16_CCITT, 0, None, "struct"),)
+    corrupt = bytes.fromhex("0100070000")
+    try:
+        plain.layout.enable_cache()
+        checked.layout.enable_cache()
+        plain.from_bytes(corrupt)
+        assert plain["Value"].value == 7
+        try:
+            checked.from_bytes(corrupt)
+            assert False
+        except ValueError as err:
+            assert str(err).startswith("CRC does not match its data")
+        checked["Type"].value = 1
+        checked["Value"].value = 7
+        plain.from_bytes(bytes(checked))
+        assert plain != checked
+        assert pickle.loads(pickle.dumps(checked.layout)) is checked.layout
+    finally:
+        plain.layout.disable_cache()
+        checked.layout.disable_cache()
+
+
+# ============================= Pickling Tests =============================
+def test_BitStruct_pickles_as_class_and_image():
+    bitstruct = ENUM_16BIT_STRUCT()
+    bitstruct.from_bytes(b"\x4A\x2A")
+    data = pickle.dumps(bitstruct)
+    assert b"Payload" not in data
+    copied = pickle.loads(data)
+    assert type(copied) is ENUM_16BIT_STRUCT
+    assert copied == bitstruct
+    assert copied["Mode"].value is MODE.RUN
+
+    crc = CRC16_40BIT_STRUCT()
+    crc["Value"].value = 0x1234
+    assert pickle.loads(pickle.dumps(crc))["CRC"].value == crc["CRC"].value
+
+
+class SIZED_STRUCT(BitStruct):
+    def __init__(self, bitfields: list, name: str = "Sized"):
+        super().__init__(bitfields=bitfields, name=name)
+        self.note = "kept"
+
+
+class SIZED_COLLECTION(BitCollection):
+    def __init__(self, width: int):
+        super().__init__([SIZED_STRUCT([BitField(size=width, name="Word")])], name=f"Sized {width}")
+
+
+def test_BitStruct_subclass_with_arguments_pickles():
+    bitstruct = SIZED_STRUCT([BitField(size=12, name="Level"), BitField(size=4, name="Flags")])
+    bitstruct["Level"].value = 0xABC
+    int(bitstruct)
+    copied = pickle.loads(pickle.dumps(bitstruct))
+    assert type(copied) is SIZED_STRUCT
+    assert copied == bitstruct
+    assert copied.note == "kept"
+    # the fields still tell their struct when they change
+    copied["Flags"].value = 3
+    assert int(copied) == 0xABC3
+
+    collection = SIZED_COLLECTION(8)
+    collection["Sized"]["Word"].value = 0x5A
+    int(collection)
+    copied = pickle.loads(pickle.dumps(collection))
+    assert type(copied) is SIZED_COLLECTION
+    assert copied == collection
+    copied["Sized"]["Word"].value = 0x01
+    assert int(copied) == 0x01
+
+
+class WIDTH_STRUCT(BitStruct):
+    def __init__(self, width: int = 8):
+        super().__init__([BitField(size=width, name="Word"), BitField(size=4, name="Flags")], name="Width")
+
+
+def test_BitStruct_subclass_with_default_arguments_pickles_its_own_shape():
+    for width in (4, 8, 16):
+        bitstruct = WIDTH_STRUCT(width)
+        bitstruct["Word"].value = 3
+        bitstruct["Flags"].value = 5
+        copied = pickle.loads(pickle.dumps(bitstruct))
+        assert type(copied) is WIDTH_STRUCT
+        assert copied.layout is bitstruct.layout
+        assert copied == bitstruct
+
+    structs = [WIDTH_STRUCT(16) for _ in range(2)]
+    structs[1]["Word"].value = 0xBEEF
+    buffer = RecordBuffer.from_records(structs)
+    assert buffer.layout is structs[0].layout
+    assert list(pickle.loads(pickle.dumps(buffer))) == structs
+
+
+def test_plain_BitStruct_pickles_as_layout_and_image():
+    mode = EnumEncoding.of(2, MODE, unknown="raw")
+    bitstruct = BitStruct(
+        [BitField(size=2, name="Mode", encoding=mode), BitField(size=14, name="Offset", value=-3, signed=True)],
+        name="Plain"
+    )
+    bitstruct["Mode"].value = MODE.FAULT
+    copied = pickle.loads(pickle.dumps(bitstruct))
+    assert copied.layout is bitstruct.layout
+    assert copied == bitstruct
+    assert (copied["Mode"].value, copied["Offset"].value) == (MODE.FAULT, -3)
+    # the enum's lookup table is rebuilt rather than carried along
+    assert len(pickle.dumps(bitstruct)) < 600
+
+    # BitField subclasses keep their type
+    bitstruct = BitStruct([EnumField(size=2, table=MODE, name="Mode"), BitField(size=6, name="Rest")], name="Plain")
+    bitstruct["Rest"].value = 9
+    copied = pickle.loads(pickle.dumps(bitstruct))
+    assert type(copied["Mode"]) is EnumField
+    assert copied == bitstruct
+    copied["Rest"].value = 10
+    assert copied != bitstruct
+
+
+def test_BitCollection_and_BitRecord_pickle():
+    collection = BitCollection([BYTE_ALIGNED_32BIT_STRUCT(), EIGHT_BIT_STRUCT()], name="Pair")
+    collection.from_bytes(b"\x12\x34\x56\x78\x9A")
+    copied = pickle.loads(pickle.dumps(collection))
+    assert type(copied) is BitCollection
+    assert copied == collection
+    flit = crc_flit()
+    flit["Body"]["Word 0"].value = 7
+    copied = pickle.loads(pickle.dumps(flit))
+    assert bytes(copied) == bytes(flit)
+
+    record = BYTE_ALIGNED_32BIT_RECORD(1, 2, 3, 4)
+    assert pickle.loads(pickle.dumps(record)) == record
+
+
+def test_RecordBuffer_transfers_records_as_one_buffer():
+    structs = BitTable(BYTE_ALIGNED_32BIT_STRUCT(), BIT_TABLE_BYTES).to_structs(BYTE_ALIGNED_32BIT_STRUCT)
+    buffer = RecordBuffer.from_records(structs)
+    assert len(buffer) == 5
+    assert bytes(buffer) == BIT_TABLE_BYTES
+    data = pickle.dumps(buffer)
+    assert len(data) < len(BIT_TABLE_BYTES) + 200
+    copied = pickle.loads(data)
+    assert list(copied) == structs
+    assert copied[-1] == structs[-1]
+
+    records = [BYTE_ALIGNED_32BIT_RECORD(1, 2, 3, idx) for idx in range(3)]
+    assert list(pickle.loads(pickle.dumps(RecordBuffer.from_records(records)))) == records
+    buffer = RecordBuffer(NON_BYTE_ALIGNED_27BIT_STRUCT().layout, bytes.fromhex("01234567 0789ABCD"))
+    assert [struct.to_bin() for struct in buffer] == [format(0x01234567, "027b"), format(0x0789ABCD, "027b")]
+    try:
+        RecordBuffer(BYTE_ALIGNED_32BIT_STRUCT, b"\x00" * 6)
+        assert False
+    except ValueError as err:
+        assert str(err) == "6 bytes is not a whole number of 4 byte records"
+    try:
+        buffer[2]
+        assert False
+    except IndexError as err:
+        assert str(err) == "record 2 is out of range for 2 records"
+
+
+# ============================= Shared Columns Tests =============================
+def test_SharedColumns_attach_by_name_without_copying():
+    with SharedColumns.create(BYTE_ALIGNED_32BIT_STRUCT(), BIT_TABLE_BYTES) as shared:
+        assert len(shared) == 5
+        assert shared["Durian"].tolist() == [0x1000, 0x0500, 0xFFFF, 0x0001, 0x0800]
+        attached = SharedColumns.attach(shared.name)
+        try:
+            assert attached.layout is shared.layout
+            assert attached["Apple"].tolist() == [1, 3, 1, 2, 1]
+            # both processes see the same memory
+            shared["Apple"][0] = 9
+            assert attached["Apple"][0] == 9
+        finally:
+            attached.close()
+
+
+def test_SharedColumns_shares_between_processes():
+    with SharedColumns.create(BYTE_ALIGNED_32BIT_STRUCT(), BIT_TABLE_BYTES * 100) as shared:
+        results = multiprocessing.Queue()
+        worker = multiprocessing.Process(target=sum_shared_column, args=(shared.name, "Durian", results))
+        worker.start()
+        assert results.get(timeout=30) == (0x1000 + 0x0500 + 0xFFFF + 0x0001 + 0x0800) * 100
+        worker.join(timeout=30)
+        assert worker.exitcode == 0
+
+
+def test_SharedColumns_decodes_raw_code_columns():
+    data = b"\x4A\x2A\x06\x00\xF0\xFF"
+    with SharedColumns.create(ENUM_16BIT_STRUCT(), data) as shared:
+        assert shared["Mode"].tolist() == [1, 0, 3]
+        assert shared.decoded("Mode") == [MODE.RUN, MODE.IDLE, MODE.FAULT]
+        assert shared.decoded("Payload") == [42, 0, 255]
+    with SharedColumns.create(SENSOR_72BIT_STRUCT(), SENSOR_72BIT_BYTES * 2) as shared:
+        assert shared["Altitude"].tolist() == [100.25, 100.25]
+    try:
+        SharedColumns.create(ADC_136BIT_STRUCT(), ADC_136BIT_BYTES)
+        assert False
+    except ValueError as err:
+        assert str(err) == "fields wider than 64 bits cannot be shared, was 96 bits"
+
+
+# ============================= BitWriter Tests =============================
+def test_BitWriter_packs_structs_back_to_back():
+    writer = BitWriter()
+    for idx in range(3):
+        struct = NON_BYTE_ALIGNED_27BIT_STRUCT()
+        struct.from_bytes(bytes.fromhex("FFFFFFE0"))
+        writer.write_struct(struct)
+    assert writer.tell() == 81
+    writer.close()
+    assert writer.tell() == 88
+    assert writer.getvalue() == bins_to_bytes("1" * 81 + "0" * 7)
+    table = BitTable(NON_BYTE_ALIGNED_27BIT_STRUCT().layout, writer.getvalue(), stride=27)
+    assert len(table) == 3
+    assert table["Honeydew"].tolist() == [0x1FFF] * 3
+
+
+def test_BitWriter_writes_rows_and_fields():
+    writer = BitWriter()
+    writer.write_field(BitField(size=3, name="Tag", value=5))
+    writer.write_rows(BYTE_ALIGNED_32BIT_STRUCT(), BIT_TABLE_ROWS)
+    writer.align()
+    assert writer.getvalue() == bins_to_bytes(
+        "101" + "".join(format(byte, "08b") for byte in BIT_TABLE_BYTES) + "00000"
+    )
+    writer = BitWriter()
+    writer.write_rows(BYTE_ALIGNED_32BIT_STRUCT().layout, BIT_TABLE_ROWS)
+    assert writer.getvalue() == BIT_TABLE_BYTES
+
+
+def test_BitWriter_align_and_pad():
+    writer = BitWriter()
+    writer.write(1, 1)
+    writer.align(fill=1)
+    assert writer.getvalue() == b"\xFF"
+    writer.align()
+    assert writer.tell() == 8
+    writer.pad(4, fill=1)
+    writer.align(16)
+    writer.write_bytes(b"\x12\x34")
+    writer.write(0xA, 4)
+    writer.write_bytes(b"\x56")
+    writer.close()
+    assert writer.getvalue() == bytes.fromhex("FFF01234A560")
+
+
+def test_BitWriter_flushes_blocks_to_a_stream():
+    stream = io.BytesIO()
+    writes = []
+    original_write = stream.write
+
+    def counting_write(data):
+        writes.append(len(data))
+        return original_write(data)
+
+    stream.write = counting_write
+    with BitWriter(stream, block_size=64) as writer:
+        for idx in range(100):
+            writer.write(idx, 27)
+        # bits stay buffered until a whole block is ready
+        assert writer.tell() == 2700
+        assert all(size >= 64 for size in writes)
+    assert writer.tell() == 2704
+    assert sum(writes) == 338
+    expected = bins_to_bytes("".join(format(idx, "027b") for idx in range(100)) + "0000")
+    assert stream.getvalue() == expected
+    try:
+        writer.getvalue()
+        assert False
+    except ValueError as err:
+        assert str(err) == "getvalue is only available when writing into a bytearray"
+
+
+@pytest.mark.parametrize("value, size, expected_err", [
+    (8,  3, "8 is too large for the field size: 3 bits"),
+    (-1, 3, "-1 is too small for the field size: 3 bits"),
+])
+def test_BitWriter_throws_invalid_value(value, size, expected_err):
+    writer = BitWriter()
+    try:
+        writer.write(value, size)
+        assert False
+    except ValueError as err:
+        assert str(err) == expected_err
+    assert writer.tell() == 0
+
+
+# ============================= TrafficGenerator Tests =============================
+@pytest.mark.parametrize("source", [
+    BYTE_ALIGNED_32BIT_STRUCT, NON_BYTE_ALIGNED_27BIT_STRUCT, ENUM_16BIT_STRUCT, CRC16_40BIT_STRUCT,
+    CRC16_28BIT_STRUCT, ADC_136BIT_STRUCT, NON_BYTE_ALIGNED_27BIT_RECORD
+])
+def test_TrafficGenerator_generates_valid_records(source):
+    generator = TrafficGenerator(source, seed=7)
+    data = generator.generate(500)
+    width = generator.layout.byte_size
+    assert len(data) == 500 * width
+    assert data == TrafficGenerator(source, seed=7).generate(500)
+    struct = source() if issubclass(source, BitStruct) else None
+    images = set()
+    for start in range(0, len(data), width):
+        record = data[start:start + width]
+        # the bits past the end of each record are left clear
+        assert int.from_bytes(record, 'big') & ((1 << (width * 8 - generator.layout.size)) - 1) == 0
+        if struct is not None:
+            # checksums are verified and enum codes decoded
+            struct.from_bytes(record)
+        images.add(record)
+    assert len(images) > 400
+
+
+def test_TrafficGenerator_fills_collection_checksums():
+    flit = crc_flit()
+    generator = TrafficGenerator(flit, seed=1)
+    assert generator.layout.names[:3] == ("Body[0].Word 0", "Body[0].Word 1", "Body[1].Word 2")
+    data = generator.generate(100)
+    for start in range(0, len(data), 16):
+        flit.from_bytes(data[start:start + 16])
+        assert flit["Trailer"]["CRC"].value == zlib.crc32(data[start:start + 12])
+
+
+def test_TrafficGenerator_follows_distributions():
+    generator = TrafficGenerator(ENUM_16BIT_STRUCT, seed=3, distributions={
+        "Mode": [MODE.FAULT],
+        "Color": ["red", "blue"],
+        "Payload": lambda rng, count: [rng.randrange(10, 20) for _ in range(count)]
+    })
+    table = BitTable(generator.layout, generator.generate(1000))
+    assert table.column("Mode") == [MODE.FAULT] * 1000
+    assert set(table.column("Color")) == {"red", "blue"}
+    assert set(table.column("Payload")) == set(range(10, 20))
+    assert set(table.column("Power")) <= {"off", "low", "high"}
+    generator = TrafficGenerator(NON_BYTE_ALIGNED_27BIT_STRUCT, distributions={"Fig": range(16, 18)})
+    assert set(BitTable(generator.layout, generator.generate(200)).column("Fig")) == {16, 17}
+
+
+def test_TrafficGenerator_writes_chunks():
+    stream = io.BytesIO()
+    generator = TrafficGenerator(CRC16_40BIT_STRUCT, seed=5)
+    assert generator.write(stream, 1000, chunk_records=300) == 5000
+    assert stream.getvalue() == TrafficGenerator(CRC16_40BIT_STRUCT, seed=5).generate(1000)
+
+
+@pytest.mark.parametrize("distributions, expected_err", [
+    ({"Kiwi": [1]},       "Kiwi is not a field of Non Byte Aligned 27bit Struct"),
+    ({"Fig": [32]},       "Fig: 32 is too large for the field size: 5 bits"),
+    ({"Fig": [-1]},       "Fig: -1 is too small for the field size: 5 bits"),
+])
+def test_TrafficGenerator_throws_invalid_distribution(distributions, expected_err):
+    try:
+        TrafficGenerator(NON_BYTE_ALIGNED_27BIT_STRUCT, distributions=distributions).generate(10)
+        assert False
+    except ValueError as err:
+        assert str(err) == expected_err
+
+
+# ============================= Bulk Assignment Tests =============================
+def test_BitStruct_decode_skips_field_validation(monkeypatch):
+    def refuse(field, value):
+        raise AssertionError("decoding should not revalidate field values")
+
+    monkeypatch.setattr(BitField, "value", property(BitField.value.fget, refuse))
+    struct = NON_BYTE_ALIGNED_27BIT_STRUCT()
+    struct.from_bytes(bytes.fromhex("FFFFFFE0"))
+    assert [field.value for field in struct] == [0x7F, 0x1F, 0x3, 0x1FFF]
+    struct.from_int(0)
+    assert int(struct) == 0
+    encoded = ENCODED_48BIT_STRUCT()
+    encoded.from_bytes(ENCODED_48BIT_BYTES)
+    assert tuple(field.value for field in encoded) == ENCODED_48BIT_VALUES
+
+
+def test_BitStruct_set_values_and_update():
+    struct = NON_BYTE_ALIGNED_27BIT_STRUCT()
+    struct.set_values([0x7F, 0x1F, 0x3, 0x1FFF])
+    assert int(struct) == (1 << 27) - 1
+    struct.update(Fig=0, Grapefruit=1)
+    assert [field.value for field in struct] == [0x7F, 0, 1, 0x1FFF]
+    assert int(struct) == (0x7F << 20) | (1 << 13) | 0x1FFF
+    encoded = ENCODED_48BIT_STRUCT()
+    encoded.set_values(ENCODED_48BIT_VALUES)
+    assert bytes(encoded) == ENCODED_48BIT_BYTES
+    crc = CRC16_40BIT_STRUCT()
+    crc.update({"Type": 0x12, "Value": 0x3456})
+    crc.from_bytes(bytes(crc))
+    assert crc["CRC"].value == CRC16_CCITT.compute(bytes.fromhex("123456"))
+
+
+@pytest.mark.parametrize("change, expected_err", [
+    (lambda struct: struct.set_values([1, 2, 3]),           "Non Byte Aligned 27bit Struct has 4 fields, got 3 values"),
+    (lambda struct: struct.set_values([0, 0, 4, 0]),        "4 is too large for the field size: 2 bits"),
+    (lambda struct: struct.update(Honeydew=0x2000),         "8192 is too large for the field size: 13 bits"),
+    (lambda struct: struct.update(Fig=-1),                  "-1 is too large for the field size: 5 bits"),
+    (lambda struct: struct.update(Kiwi=1),                  "Kiwi is not a field of Non Byte Aligned 27bit Struct"),
+])
+def test_BitStruct_bulk_assignment_throws_invalid_values(change, expected_err):
+    struct = NON_BYTE_ALIGNED_27BIT_STRUCT()
+    struct.set_values([1, 2, 3, 4])
+    try:
+        change(struct)
+        assert False
+    except ValueError as err:
+        assert str(err) == expected_err
+    # nothing changes when any value is rejected
+    assert [field.value for field in struct] == [1, 2, 3, 4]
+
+
+def test_BitStruct_bulk_assignment_checks_array_and_nested_fields():
+    class WIDE_HEADER_STRUCT(BYTE_ALIGNED_32BIT_STRUCT):
+        def __init__(self):
+            BitStruct.__init__(self, [BitField(size=40, name="Wide")], name="Wide Header Struct")
+
+    bitstruct = ADC_136BIT_STRUCT()
+    bitstruct.from_bytes(ADC_136BIT_BYTES)
+    header = bitstruct["Header"].value
+    for change, expected_err in [
+        (lambda: bitstruct.update(Samples=[5000] + [0] * 7), "5000 is too large for the field size: 12 bits"),
+        (lambda: bitstruct.set_values([header, 3, [1, 2], 15]), "the field holds 8 values, got 2"),
+        (lambda: bitstruct.update(Header=FOURTY_BIT_STRUCT()), "is not a BYTE_ALIGNED_32BIT_STRUCT"),
+        (
+            lambda: bitstruct.update(Header=WIDE_HEADER_STRUCT()),
+            "40 bit BYTE_ALIGNED_32BIT_STRUCT does not fit the field size: 32 bits"
+        ),
+    ]:
+        try:
+            change()
+            assert False
+        except ValueError as err:
+            assert str(err).endswith(expected_err)
+    assert bytes(bitstruct) == ADC_136BIT_BYTES
+
+
+def test_BitField_rejects_negative_values():
+    field = BitField(size=8, name="Apple")
+    try:
+        field.value = -1
+        assert False
+    except ValueError as err:
+        assert str(err) == "-1 is too large for the field size: 8 bits"
+
+
+# ============================= ResilientDecoder Tests =============================
+def sync_frame_is_valid(frame):
+    return frame[1].value ^ frame[2].value == 0xFF
+
+
+@pytest.mark.parametrize(
+    "binstring, expected_payloads, expected_skipped, expected_errors", [
+        (
+            # clean
+            sync_frame_bins(1) + sync_frame_bins(2) + sync_frame_bins(3),
+            [1, 2, 3], 0, {}
+        ),
+        (
+            # garbage at a non byte aligned length between frames
+            sync_frame_bins(1) + "0" * 13 + sync_frame_bins(2) + "1" * 3 + sync_frame_bins(3),
+            [1, 2, 3], 16, {"sync": 2}
+        ),
+        (
+            # a frame which fails validation
+            sync_frame_bins(1) + sync_frame_bins(2, check=0) + sync_frame_bins(3),
+            [1, 3], 32, {"validation": 1}
+        ),
+        (
+            # truncated final frame
+            sync_frame_bins(1) + sync_frame_bins(2)[:20],
+            [1], 24, {"short": 1}
+        ),
+        (
+            # nothing but noise
+            "0" * 77,
+            [], 80, {"sync": 1}
+        )
+    ]
+)
+def test_ResilientDecoder_resynchronizes(binstring, expected_payloads, expected_skipped, expected_errors):
+    data = bins_to_bytes(binstring)
+    for chunk_size in (None, 1, 3, 64):
+        decoder = ResilientDecoder(SYNC_FRAME_STRUCT, sync=b"\xAA\x55", validator=sync_frame_is_valid)
+        if chunk_size is None:
+            frames = list(decoder.decode(data))
+        else:
+            frames = list(decoder.decode_stream(io.BytesIO(data), chunk_size))
+        assert [frame[1].value for frame in frames] == expected_payloads
+        assert decoder.stats.frames == len(expected_payloads)
+        assert decoder.stats.skipped_bits == expected_skipped
+        assert decoder.stats.skipped_bytes == expected_skipped // 8
+        assert dict(decoder.stats.errors) == expected_errors
+
+
+def test_ResilientDecoder_steps_without_sync():
+    data = bins_to_bytes(sync_frame_bins(1) + "11110000" + sync_frame_bins(2) + "0000")
+    decoder = ResilientDecoder(SYNC_FRAME_STRUCT, validator=sync_frame_is_valid)
+    frames = list(decoder.decode(data))
+    assert [frame[1].value for frame in frames] == [1, 2]
+    assert decoder.stats.to_dict() == {
+        "frames": 2,
+        "skipped_bytes": 2,
+        "skipped_bits": 16,
+        "errors": {"validation": 1, "short": 1}
+    }
+
+
+def test_ResilientDecoder_skips_frames_which_fail_to_decode():
+    frames = []
+    for idx in range(5):
+        frame = CRC16_40BIT_STRUCT()
+        frame["Type"].value = idx
+        frame["Value"].value = 0x1111 * idx
+        frames.append(bytes(frame))
+    # the middle frame's CRC no longer matches
+    frames[2] = frames[2][:-1] + bytes([frames[2][-1] ^ 0x01])
+    data = b"".join(frames)
+    for chunk_size in (None, 1, 7):
+        decoder = ResilientDecoder(CRC16_40BIT_STRUCT, resync_step=40)
+        if chunk_size is None:
+            decoded = list(decoder.decode(data))
+        else:
+            decoded = list(decoder.decode_stream(io.BytesIO(data), chunk_size))
+        assert [frame["Type"].value for frame in decoded] == [0, 1, 3, 4]
+        assert dict(decoder.stats.errors) == {"checksum": 1}
+        assert decoder.stats.skipped_bits == 40
+    try:
+        CRC16_40BIT_STRUCT().from_bytes(frames[2])
+        assert False
+    except ChecksumError as err:
+        assert isinstance(err, ValueError)
+
+    # Mode has no code 2
+    decoder = ResilientDecoder(ENUM_16BIT_STRUCT, resync_step=16)
+    decoded = list(decoder.decode(bytes.fromhex("4A2A8A2A062A")))
+    assert [frame["Mode"].value for frame in decoded] == [MODE.RUN, MODE.IDLE]
+    assert dict(decoder.stats.errors) == {"decode": 1}
+
+
+def test_ResilientDecoder_throws_invalid_frame_size():
+    try:
+        ResilientDecoder(SYNC_FRAME_STRUCT, frame_size=16)
+        assert False
+    except ValueError as err:
+        assert str(err) == "frame_size must hold the 32 bit struct, was 16"
+
+
+# ============================= BitRecord Tests =============================
+@pytest.mark.parametrize(
+    "record_type, bitstruct", [
+        (BYTE_ALIGNED_32BIT_RECORD,     BYTE_ALIGNED_32BIT_STRUCT()),
+        (NON_BYTE_ALIGNED_27BIT_RECORD, NON_BYTE_ALIGNED_27BIT_STRUCT()),
+        (OVERLAPPING_BOUNDARY_RECORD,   OVERLAPPING_BOUNDARY_STRUCT())
+    ]
+)
+def test_BitRecord_matches_BitStruct(record_type, bitstruct):
+    bitstruct.from_bytes(CHECKERBOARD_BYTES)
+    record = record_type.unpack(CHECKERBOARD_BYTES)
+    assert record.size == bitstruct.size
+    assert record.layout.names == tuple(field.name for field in bitstruct)
+    assert [getattr(record, attr) for attr in record.__slots__] == [field.value for field in bitstruct]
+    assert int(record) == int(bitstruct)
+    assert hex(record) == hex(bitstruct)
+    assert bytes(record) == bytes(bitstruct)
+    assert record.to_bin() == bitstruct.to_bin()
+    assert record.to_dict() == bitstruct.to_dict()
+    assert str(record) == str(bitstruct)
+    assert record.to_bitstruct().to_dict() == bitstruct.to_dict()
+
+    populated = record_type()
+    populated.from_bin(CHECKERBOARD_BITS)
+    assert populated.to_dict() == bitstruct.to_dict()
+    populated = record_type()
+    populated.from_int(int(bitstruct))
+    assert populated.to_dict() == bitstruct.to_dict()
+    assert record_type.unpack_int(int(bitstruct)).to_dict() == bitstruct.to_dict()
+
+
+def test_BitRecord_is_slotted():
+    record = BYTE_ALIGNED_32BIT_RECORD(apple=1, durian=2)
+    assert not hasattr(record, "__dict__")
+    assert repr(record) == "BYTE_ALIGNED_32BIT_RECORD(apple=1, banana=0, carrot=0, durian=2)"
+    assert isinstance(record, BitRecord)
+    try:
+        record.Apple = 1
+        assert False
+    except AttributeError:
+        assert True
+
+
+def test_BitRecord_supports_defaults():
+    @bitrecord
+    class Defaulted:
+        apple: Bits[3] = 5
+        banana: Bits[5]
+
+    assert Defaulted.name == "Defaulted"
+    assert Defaulted().to_bin() == "10100000"
+    assert Defaulted(banana=1).to_bin() == "10100001"
+
+
+@pytest.mark.parametrize(
+    "record, expected_err", [
+        (BYTE_ALIGNED_32BIT_RECORD(apple=16),           "16 is too large for the field size: 4 bits"),
+        (NON_BYTE_ALIGNED_27BIT_RECORD(honeydew=8192),  "8192 is too large for the field size: 13 bits"),
+        (OVERLAPPING_BOUNDARY_RECORD(lemon=-1),         "-1 is too large for the field size: 20 bits")
+    ]
+)
+def test_BitRecord_throws_on_encoding_invalid_values(record, expected_err):
+    try:
+        bytes(record)
+        assert False
+    except ValueError as err:
+        assert str(err) == expected_err
+
+
+def test_BitRecord_throws_on_short_data():
+    try:
+        NON_BYTE_ALIGNED_27BIT_RECORD.unpack(b"\xAA\x55\xAA")
+        assert False
+    except ValueError as err:
+        assert str(err) == "Not enough bytes to fill the BitRecord"
+    try:
+        NON_BYTE_ALIGNED_27BIT_RECORD().from_bin("0101")
+        assert False
+    except ValueError as err:
+        assert str(err) == "Not enough bins to fill the BitRecord"
+
+
+def test_bitrecord_throws_on_invalid_annotations():
+    try:
+        @bitrecord
+        class NotBits:
+            apple: int
+        assert False
+    except TypeError as err:
+        assert str(err) == "apple must be annotated with Bits[size], was <class 'int'>"
+    try:
+        @bitrecord
+        class Reserved:
+            size: Bits[4]
+        assert False
+    except ValueError as err:
+        assert str(err) == "size is reserved by BitRecord and cannot be a field name"
+
+
+def test_BitLayout_round_trips():
+    layout = BitLayout([("Apple", 4), ("Banana", 4), ("Carrot", 8), ("Durian", 16)], name="Layout")
+    assert layout.size == 32
+    assert layout.byte_size == 4
+    assert layout.shifts == (28, 24, 16, 0)
+    assert layout.unpack(0xAA55AA55) == (10, 10, 85, 43605)
+    assert layout.pack((10, 10, 85, 43605)) == 0xAA55AA55
+    assert layout.unpack_bytes(CHECKERBOARD_BYTES, 8) == (5, 5, 170, 21930)
+
+
+# ============================= Schema Tests =============================
+TEST_SCHEMA = {
+    "structs": {
+        "Non Byte Aligned 27bit Struct": [
+            {"name": "Elderberry", "size": 7},
+            {"name": "Fig", "size": 5},
+            {"name": "Grapefruit", "size": 2},
+            {"name": "Honeydew", "size": 13}
+        ],
+        "8 bits": [
+            {"name": "OMG", "size": 2},
+            {"name": "OHLAWD", "size": 1},
+            {"name": "HE COMIN'!", "size": 5}
+        ],
+        "40 bits": [
+            {"name": "Mango", "size": 7},
+            {"name": "Nugget", "size": 13},
+            {"name": "Orange", "size": 15},
+            {"name": "Pear", "size": 5}
+        ]
+    },
+    "collections": {
+        "Flit": {"type": "FlitStruct", "structs": ["8 bits", "40 bits", "40 bits", "40 bits"]},
+        "Mixed": {"structs": ["8 bits", "Non Byte Aligned 27bit Struct"]}
+    }
+}
+
+
+def write_schema(tmp_path, schema):
+    path = tmp_path / "schema.json"
+    path.write_text(json.dumps(schema))
+    return str(path)
+
+
+def test_load_schema_builds_structs_and_collections(tmp_path):
+    classes = load_schema(write_schema(tmp_path, TEST_SCHEMA))
+
+    bitstruct = classes["Non Byte Aligned 27bit Struct"]()
+    expected = NON_BYTE_ALIGNED_27BIT_STRUCT()
+    bitstruct.from_bytes(CHECKERBOARD_BYTES)
+    expected.from_bytes(CHECKERBOARD_BYTES)
+    assert isinstance(bitstruct, BitStruct)
+    assert bitstruct.to_dict() == expected.to_dict()
+
+    flit = classes["Flit"]()
+    expected = BitCollection(
+        bitstructs=[EIGHT_BIT_STRUCT(), FOURTY_BIT_STRUCT(), FOURTY_BIT_STRUCT(), FOURTY_BIT_STRUCT()], name="Flit"
+    )
+    flit.from_bytes(CHECKERBOARD_BYTES)
+    expected.from_bytes(CHECKERBOARD_BYTES)
+    assert isinstance(flit, FlitStruct)
+    assert flit.to_dict() == expected.to_dict()
+
+    mixed = classes["Mixed"]()
+    assert type(mixed).__bases__ == (BitCollection,)
+    assert mixed.size == 35
+    # every instantiation is independent
+    assert classes["Mixed"]()[0] is not mixed[0]
+
+
+def test_load_schema_supports_encodings(tmp_path):
+    schema = {
+        "structs": {
+            "Encoded 48bit Struct": [
+                {"name": "Temperature", "size": 12, "signed": True},
+                {"name": "Counter", "size": 16, "byteorder": "little"},
+                {"name": "Flags", "size": 4, "bit_order": "lsb"},
+                {"name": "Offset", "size": 16, "signed": True, "byteorder": "little"}
+            ]
+        }
+    }
+    bitstruct = load_schema(write_schema(tmp_path, schema))["Encoded 48bit Struct"]()
+    bitstruct.from_bytes(ENCODED_48BIT_BYTES)
+    assert tuple(field.value for field in bitstruct) == ENCODED_48BIT_VALUES
+
+
+def test_load_schema_classes_pickle(tmp_path):
+    classes = load_schema(write_schema(tmp_path, TEST_SCHEMA))
+    bitstruct = classes["40 bits"]()
+    bitstruct["Orange"].value = 0x1234
+    copied = pickle.loads(pickle.dumps(bitstruct))
+    assert copied.layout is bitstruct.layout
+    assert copied == bitstruct
+
+    mixed = classes["Mixed"]()
+    mixed.from_bytes(b"\x12\x34\x56\x78\x9A")
+    copied = pickle.loads(pickle.dumps(mixed))
+    assert copied.name == mixed.name
+    assert bytes(copied) == bytes(mixed)
+    flit = classes["Flit"]()
+    flit.from_bytes(CHECKERBOARD_BYTES[:16])
+    copied = pickle.loads(pickle.dumps(flit))
+    assert isinstance(copied, FlitStruct)
+    assert bytes(copied) == bytes(flit)
+
+    buffer = RecordBuffer.from_records([bitstruct, classes["40 bits"]()])
+    assert list(pickle.loads(pickle.dumps(buffer))) == list(buffer)
+
+
+def test_load_schema_uses_compiled_cache(tmp_path, monkeypatch):
+    path = write_schema(tmp_path, TEST_SCHEMA)
+    cache_dir = tmp_path / "cache"
+    first = load_schema(path, cache_dir=str(cache_dir))
+    assert len(list(cache_dir.iterdir())) == 1
+
+    # a cached schema is neither parsed nor validated again, and brings its compiled codecs along
+    def fail(schema):
+        raise AssertionError("schema was recompiled")
+    monkeypatch.setattr(BitS, "_compile_schema", fail)
+    monkeypatch.setattr(BitS, "_CODEC_CODE", {})
+    second = load_schema(path, cache_dir=str(cache_dir))
+    assert second.keys() == first.keys()
+    assert second["40 bits"]().size == 40
+    sources = {first[name]().layout.source for name in TEST_SCHEMA["structs"]}
+    assert BitS._CODEC_CODE.keys() == sources
+
+    # an unreadable entry is compiled again and replaced
+    monkeypatch.undo()
+    (entry,) = cache_dir.iterdir()
+    entry.write_bytes(pickle.dumps({"structs": {}, "collections": {}}))
+    assert load_schema(path, cache_dir=str(cache_dir)).keys() == first.keys()
+    assert entry.read_bytes() != pickle.dumps({"structs": {}, "collections": {}})
+
+    # a changed file gets a new cache entry
+    changed = dict(TEST_SCHEMA, collections={})
+    load_schema(write_schema(tmp_path, changed), cache_dir=str(cache_dir))
+    assert len(list(cache_dir.iterdir())) == 2
+
+
+@pytest.mark.parametrize(
+    "schema, expected_err", [
+        ([], "A schema must be a JSON object"),
+        ({"structs": {"Empty": []}}, "Struct Empty must have a list of fields"),
+        ({"structs": {"Bad": [{"name": "Apple", "size": 0}]}}, "Struct Bad has an invalid field: {'name': 'Apple', 'size': 0}"),
+        ({"collections": {"Lost": {"structs": ["Nowhere"]}}}, "Collection Lost refers to an unknown struct: Nowhere"),
+        ({"collections": {"Odd": {"type": "BitSoup"}}}, "Collection Odd has an unknown type: BitSoup"),
+        ({"structs": []}, "A schema's structs must be a JSON object"),
+        ({"collections": ["Pair"]}, "A schema's collections must be a JSON object"),
+        ({"collections": {"Pair": ["8 bits"]}}, "Collection Pair must be a JSON object"),
+        ({"collections": {"Pair": {"structs": "8 bits"}}}, "Collection Pair must have a list of structs"),
+        ({"collections": {"Pair": {"structs": [{"name": "8 bits"}]}}}, "Collection Pair refers to an unknown struct: {'name': '8 bits'}"),
+        ({"collections": {"Odd": {"type": ["FlitStruct"]}}}, "Collection Odd has an unknown type: ['FlitStruct']"),
+        ({"structs": {"Bad": [{"name": "Apple", "size": 4, "sign": True}]}}, "Struct Bad field Apple has unknown keys: ['sign']"),
+        (
+            {"structs": {"Bad": [{"name": "Apple", "size": 4, "byteorder": "little"}]}},
+            "little endian fields must be a whole number of bytes, was 4 bits"
+        ),
+        (
+            {"structs": TEST_SCHEMA["structs"], "collections": {"Small": {"type": "FlitStruct", "structs": ["8 bits"]}}},
+            "FlitStructs MUST be 128 bits, Small was 8"
+        )
+    ]
+)
+def test_load_schema_throws_invalid_schema(tmp_path, schema, expected_err):
+    try:
+        load_schema(write_schema(tmp_path, schema))
+        assert False
+    except ValueError as err:
+        assert str(err) == expected_err
+
+
+# ============================= Instrumentation Tests =============================
+def test_instrumentation_counts_per_layout():
+    original = BitStruct.from_bytes
+    reset_instrumentation()
+    enable_instrumentation()
+    try:
+        assert instrumentation_enabled()
+        bitstruct = BYTE_ALIGNED_32BIT_STRUCT()
+        bitstruct.from_bytes(CHECKERBOARD_BYTES)
+        bitstruct.from_bytes(CHECKERBOARD_BYTES)
+        bytes(bitstruct)
+        try:
+            bitstruct.from_bytes(b"\xAA")
+            assert False
+        except ValueError:
+            assert True
+        BYTE_ALIGNED_32BIT_RECORD.unpack(CHECKERBOARD_BYTES)
+        test_collection = BitCollection(bitstructs=[EIGHT_BIT_STRUCT(), FOURTY_BIT_STRUCT()], name="TEST")
+        test_collection.from_bin(CHECKERBOARD_BITS)
+    finally:
+        disable_instrumentation()
+
+    assert not instrumentation_enabled()
+    assert BitStruct.from_bytes is original
+    snapshot = instrumentation_snapshot()
+    from_bytes = snapshot["BYTE_ALIGNED_32BIT_STRUCT"]["from_bytes"]
+    assert from_bytes["calls"] == 3
+    assert from_bytes["bytes"] == 12
+    assert from_bytes["failures"] == 1
+    assert from_bytes["seconds"] > 0
+    assert snapshot["BYTE_ALIGNED_32BIT_STRUCT"]["bytes"]["calls"] == 1
+    assert snapshot["BYTE_ALIGNED_32BIT_RECORD"]["unpack"]["calls"] == 1
+    assert snapshot["BitCollection:TEST"]["from_bin"] == dict(snapshot["BitCollection:TEST"]["from_bin"], calls=1, bytes=6)
+    assert snapshot["FOURTY_BIT_STRUCT"]["from_bin"]["calls"] == 1
+
+    # disabled instrumentation records nothing
+    BYTE_ALIGNED_32BIT_STRUCT().from_bytes(CHECKERBOARD_BYTES)
+    assert instrumentation_snapshot() == snapshot
+    reset_instrumentation()
+    assert instrumentation_snapshot() == {}
+
+
+# ============================= Memory Footprint Tests =============================
+def test_memory_footprint_counts_each_object_once():
+    bitstruct = BYTE_ALIGNED_32BIT_STRUCT()
+    bitstruct.from_bytes(CHECKERBOARD_BYTES)
+    footprint = memory_footprint(bitstruct)
+    assert footprint["bytes"] == sum(footprint["by_type"].values())
+    assert footprint["by_type"]["BitField"] > 0
+    assert footprint["by_type"]["str"] > 0
+    # the shared layout is only counted on request
+    assert memory_footprint(bitstruct, include_shared=True)["bytes"] > footprint["bytes"]
+
+    record = BYTE_ALIGNED_32BIT_RECORD.unpack(CHECKERBOARD_BYTES)
+    assert memory_footprint(record)["bytes"] < footprint["bytes"]
+
+    # a batch pays for its shared field names once
+    batch = [BYTE_ALIGNED_32BIT_STRUCT() for _ in range(10)]
+    assert memory_footprint(batch)["by_type"]["str"] == memory_footprint(batch[0])["by_type"]["str"]
+
+    test_collection = BitCollection(bitstructs=[EIGHT_BIT_STRUCT(), FOURTY_BIT_STRUCT()], name="TEST")
+    collection_footprint = memory_footprint(test_collection)
+    assert collection_footprint["by_type"]["EIGHT_BIT_STRUCT"] > 0
+    assert collection_footprint["by_type"]["FOURTY_BIT_STRUCT"] > 0
+
+
+def test_memory_footprint_shares_encoding_tables():
+    sensor = SENSOR_72BIT_STRUCT()
+    crc = CRC16_40BIT_STRUCT()
+    enum = BitStruct([EnumField(size=16, table={1: "on"}, name="State", unknown="raw", value="on")], name="Wide")
+    for bitstruct in (sensor, crc, enum):
+        # the half float, CRC and enum lookup tables are shared, not owned by the struct
+        assert memory_footprint(bitstruct)["bytes"] < 10000
+        assert memory_footprint(bitstruct, include_shared=True)["bytes"] > memory_footprint(bitstruct)["bytes"]
+    assert memory_footprint(sensor, include_shared=True)["bytes"] > 1000000